@@ -0,0 +1,66 @@
+"""
+bench_import.py
+
+Measures the cold start cost of importing the scoring modules of Shifterator,
+and checks that they can be imported without loading matplotlib. The cost of
+also importing matplotlib.pyplot, as every import did before plotting was
+loaded lazily, is reported for comparison
+
+Usage:
+    python benchmarks/bench_import.py [--repeat N]
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCORING_IMPORTS = ('import shifterator.shifterator, shifterator.relative_shift, '
+                   'shifterator.symmetric_shift')
+PROBE = '''
+import sys, time, resource
+t = time.perf_counter()
+{imports}
+t = time.perf_counter() - t
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(t, rss, int('matplotlib' in sys.modules))
+'''
+
+def time_import(imports, repeat):
+    """
+    Imports modules in fresh interpreters and returns the median import time
+    (s), the median peak RSS (KiB on Linux), and whether matplotlib was loaded
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([ROOT, env.get('PYTHONPATH', '')])
+    env['MPLBACKEND'] = 'Agg'
+    times = []
+    rss = []
+    for _ in range(repeat):
+        out = subprocess.check_output([sys.executable, '-c',
+                                       PROBE.format(imports=imports)], env=env)
+        t,r,mpl = out.split()
+        times.append(float(t))
+        rss.append(int(r))
+    return {'seconds': statistics.median(times), 'max_rss': statistics.median(rss),
+            'matplotlib_loaded': bool(int(mpl))}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    results = {
+        'scoring': time_import(SCORING_IMPORTS, args.repeat),
+        'scoring_with_pyplot': time_import(SCORING_IMPORTS
+                                           + '\nimport matplotlib.pyplot',
+                                           args.repeat),
+    }
+    print(json.dumps(results, indent=2))
+    if results['scoring']['matplotlib_loaded']:
+        sys.exit('matplotlib was loaded by the scoring modules')
+
+if __name__ == '__main__':
+    main()
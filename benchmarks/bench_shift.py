@@ -0,0 +1,281 @@
+"""
+bench_shift.py
+
+Benchmarks the construction, scoring and plotting of every shift class, the
+entropy and filtering helpers, and lexicon loading. Corpora are synthetic pairs
+of Zipf-distributed systems at several vocabulary sizes, plus corpora drawn
+over the words of a bundled lexicon. The time (median of repeats) and peak
+traced memory of each case are written as JSON, so results can be compared
+across releases
+
+Usage:
+    python benchmarks/bench_shift.py [--sizes N [N ...]] [--repeat N]
+                                     [--cases REGEX] [--output FILE]
+"""
+import os
+import re
+import sys
+import gc
+import json
+import time
+import platform
+import argparse
+import datetime
+import statistics
+import subprocess
+import tempfile
+import tracemalloc
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import shifterator.shifterator as sh
+import shifterator.relative_shift as rs
+import shifterator.symmetric_shift as ss
+from shifterator import helper
+from shifterator import compiled_lexicon
+from shifterator.lexicon_cache import lexicon_cache
+
+DEFAULT_SIZES = [10000, 100000, 1000000]
+LEXICON = 'labMT_English'
+STOP_LENS = [(4, 6), (0, 1), (8, 9)]
+
+# ------------------------------------------------------------------------------
+# ---------------------------------- Corpora -----------------------------------
+# ------------------------------------------------------------------------------
+def get_zipf_systems(types, n_tokens=None, exponent=1.1, seed=0):
+    """
+    Draws two systems of Zipf-distributed frequencies over the same types. The
+    second system swaps the ranks of a tenth of the types, so the systems
+    share a vocabulary but differ in which types are common
+
+    Parameters
+    ----------
+    types: list
+        the types of the systems, ordered by rank in the first system
+    n_tokens: int, optional
+        number of tokens drawn for each system. Defaults to 10 per type
+    exponent: float
+        exponent of the Zipf distribution
+    seed: int
+        seed of the random number generator
+
+    Returns
+    -------
+    type2freq_1, type2freq_2: dict
+        keys are types and values are frequencies. Types that are not drawn
+        are left out
+    """
+    rng = np.random.RandomState(seed)
+    n_types = len(types)
+    if n_tokens is None:
+        n_tokens = 10 * n_types
+    probs = 1 / np.arange(1, n_types+1) ** exponent
+    probs /= probs.sum()
+    ranks_2 = np.arange(n_types)
+    swapped = rng.choice(n_types, n_types // 10, replace=False)
+    ranks_2[swapped] = rng.permutation(swapped)
+    systems = []
+    for p in [probs, probs[ranks_2]]:
+        counts = rng.multinomial(n_tokens, p)
+        nonzero = np.flatnonzero(counts)
+        systems.append(dict(zip([types[i] for i in nonzero],
+                                counts[nonzero].tolist())))
+    return systems[0],systems[1]
+
+def get_synthetic_lexicon(types, coverage=0.5, seed=0):
+    """
+    Scores a random fraction of types uniformly between 1 and 9, like the
+    labMT lexicon
+    """
+    rng = np.random.RandomState(seed)
+    scored = rng.random_sample(len(types)) < coverage
+    scores = rng.uniform(1, 9, scored.sum())
+    return dict(zip([t for t,s in zip(types, scored) if s], scores.tolist()))
+
+def get_smoothed_systems(type2freq_1, type2freq_2):
+    """
+    Adds one to the frequency of every type of either system, so both systems
+    have the same types as the KLD requires
+    """
+    types = set(type2freq_1).union(type2freq_2)
+    return ({t : type2freq_1.get(t, 0) + 1 for t in types},
+            {t : type2freq_2.get(t, 0) + 1 for t in types})
+
+# ------------------------------------------------------------------------------
+# ----------------------------------- Cases ------------------------------------
+# ------------------------------------------------------------------------------
+def get_shift_cases(label, type2freq_1, type2freq_2, type2score, plot):
+    """
+    Returns the benchmark cases of one corpus as (name, setup, run) tuples,
+    where setup returns the arguments of run and is not timed
+    """
+    def build(shift_class, *args, **kwargs):
+        return lambda: shift_class(*args, **kwargs)
+
+    def score(shift_class, *args, **kwargs):
+        return lambda: shift_class(*args, **kwargs).get_shift_scores()
+
+    smoothed = get_smoothed_systems(type2freq_1, type2freq_2)
+    shifts = [
+        ('Shift', sh.Shift, (type2freq_1, type2freq_2, type2score),
+         {'stop_lens': STOP_LENS}),
+        ('ProportionShift', ss.ProportionShift, (type2freq_1, type2freq_2), {}),
+        ('EntropyShift', rs.EntropyShift, (type2freq_1, type2freq_2), {}),
+        ('KLDivergenceShift', rs.KLDivergenceShift, smoothed, {}),
+        ('JSDivergenceShift', ss.JSDivergenceShift, (type2freq_1, type2freq_2),
+         {}),
+    ]
+    cases = []
+    for name,shift_class,args,kwargs in shifts:
+        cases.append(('{}/{}/init'.format(label, name), None,
+                      build(shift_class, *args, **kwargs)))
+        cases.append(('{}/{}/init+get_shift_scores'.format(label, name), None,
+                      score(shift_class, *args, **kwargs)))
+    cases.append(('{}/get_jsd_scores'.format(label), None,
+                  lambda: helper.get_jsd_scores(type2freq_1, type2freq_2)))
+    cases.append(('{}/filter_by_scores'.format(label), None,
+                  lambda: helper.filter_by_scores(type2freq_1, type2score,
+                                                  STOP_LENS)))
+    if plot:
+        def setup_graph():
+            shift = sh.Shift(type2freq_1, type2freq_2, type2score)
+            shift.get_shift_scores()
+            return (shift,)
+        cases.append(('{}/get_shift_graph'.format(label), setup_graph,
+                      render_shift_graph))
+    return cases
+
+def render_shift_graph(shift):
+    import matplotlib.pyplot as plt
+    with tempfile.NamedTemporaryFile(suffix='.png') as f:
+        shift.get_shift_graph(show_plot=False, filename=f.name)
+    plt.close('all')
+
+def get_lexicon_cases(lexicon):
+    """
+    Returns the benchmark cases of loading a bundled lexicon by parsing its
+    TSV, by decoding its compiled form, and from the lexicon cache
+    """
+    cases = [('lexicon/{}/tsv'.format(lexicon), None,
+              lambda: helper.load_score_dictionary(lexicon, compiled=False))]
+    compiled = compiled_lexicon.load_compiled_lexicon(lexicon)
+    if compiled is not None:
+        compiled.close()
+        cases.append(('lexicon/{}/compiled'.format(lexicon), None,
+                      lambda: helper.load_score_dictionary(lexicon)))
+    def setup_cached():
+        helper.get_score_dictionary(lexicon)
+        return ()
+    cases.append(('lexicon/{}/cached'.format(lexicon), setup_cached,
+                  lambda: helper.get_score_dictionary(lexicon)))
+    return cases
+
+# ------------------------------------------------------------------------------
+# ---------------------------------- Running -----------------------------------
+# ------------------------------------------------------------------------------
+def run_case(setup, run, repeat):
+    """
+    Times a case and measures its peak traced memory
+
+    Returns
+    -------
+    result: dict
+        'seconds' (median), 'min_seconds', 'repeat' and 'peak_bytes' (peak
+        memory allocated while running the case once under tracemalloc)
+    """
+    times = []
+    for _ in range(repeat):
+        args = setup() if setup is not None else ()
+        gc.collect()
+        start = time.perf_counter()
+        run(*args)
+        times.append(time.perf_counter() - start)
+    # Trace memory in a separate run, tracing slows the timed runs
+    args = setup() if setup is not None else ()
+    gc.collect()
+    tracemalloc.start()
+    run(*args)
+    _,peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'seconds': statistics.median(times), 'min_seconds': min(times),
+            'repeat': repeat, 'peak_bytes': peak}
+
+def get_metadata():
+    """
+    Describes the environment of a benchmark run
+    """
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT,
+                                         stderr=subprocess.DEVNULL)
+        commit = commit.decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {'commit': commit,
+            'date': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'processor': platform.processor()}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='vocabulary sizes of the synthetic corpora, e.g. '
+                             '10000 100000 1000000 5000000')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--cases', default=None,
+                        help='only run cases whose name matches this regex')
+    parser.add_argument('--no-plot', action='store_true',
+                        help='skip rendering shift graphs')
+    parser.add_argument('--output', default=None,
+                        help='file to write the JSON results to (default: '
+                             'stdout)')
+    args = parser.parse_args()
+    if not args.no_plot:
+        import matplotlib
+        matplotlib.use('Agg')
+    pattern = re.compile(args.cases) if args.cases is not None else None
+
+    results = {'metadata': get_metadata(), 'cases': []}
+    def run_cases(cases, corpus):
+        for name,setup,run in cases:
+            if pattern is not None and not pattern.search(name):
+                continue
+            result = run_case(setup, run, args.repeat)
+            result.update({'name': name}, **corpus)
+            results['cases'].append(result)
+            print('{:<60} {:>10.4f}s {:>12,d}B'.format(name, result['seconds'],
+                                                       result['peak_bytes']),
+                  file=sys.stderr)
+
+    # Lexicon loading, then corpora over the words of the bundled lexicon
+    lexicon_cache.clear()
+    run_cases(get_lexicon_cases(LEXICON), {'lexicon': LEXICON})
+    type2score = helper.get_score_dictionary(LEXICON)
+    types = list(type2score.keys())
+    type2freq_1,type2freq_2 = get_zipf_systems(types)
+    run_cases(get_shift_cases(LEXICON, type2freq_1, type2freq_2, type2score,
+                              not args.no_plot),
+              {'lexicon': LEXICON, 'n_types': len(types)})
+    # Synthetic corpora and lexicons at each vocabulary size
+    for n_types in args.sizes:
+        types = ['w{}'.format(i) for i in range(n_types)]
+        type2freq_1,type2freq_2 = get_zipf_systems(types)
+        type2score = get_synthetic_lexicon(types)
+        del types
+        run_cases(get_shift_cases('zipf_{}'.format(n_types), type2freq_1,
+                                  type2freq_2, type2score, not args.no_plot),
+                  {'lexicon': 'synthetic', 'n_types': n_types})
+
+    output = json.dumps(results, indent=2)
+    if args.output is None:
+        print(output)
+    else:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,291 @@
+"""
+batch_graph.py
+
+Renders many shift graphs to files across a pool of worker processes. Each
+shift is reduced to the compact data drawn in its graph, and workers draw and
+save the graphs with the non-interactive Agg backend
+"""
+import io
+import collections.abc
+import inspect
+import time
+import traceback
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+from .instrumentation import record_stage
+
+# Figure templates of a worker process, set by _init_worker
+_worker_renderer = None
+
+# Parameters of get_shift_graph that change the data drawn in a graph
+GRAPH_DATA_PARAMS = ['normalize', 'text_size_inset', 'cumulative_inset']
+
+# ------------------------------------------------------------------------------
+# -------------------------------- Batch rendering -----------------------------
+# ------------------------------------------------------------------------------
+def render_shift_graphs(shifts, filenames, top_n=50, n_jobs=None,
+                        reuse_figures=False, **kwargs):
+    """
+    Renders the shift graph of each shift to a file, as get_shift_graph with
+    show_plot=False would
+
+    Parameters
+    ----------
+    shifts: list
+        Shift objects, or graph data dicts as given by get_shift_graph_data
+    filenames: list of str
+        names of the files for saving the graph of each shift
+    top_n: int
+        number of top contributing types displayed in each graph
+    n_jobs: int, optional
+        if not None, the number of worker processes that draw the graphs. If
+        None, graphs are drawn in the current process
+    reuse_figures: bool
+        if True, each process draws its graphs on reused figure templates, see
+        ShiftGraphRenderer. The layout of the first graph drawn on a template
+        is kept for the following graphs
+    kwargs:
+        parameters of get_shift_graph (normalize, text_size_inset,
+        cumulative_inset) and plotting parameters shared by all graphs. Unset
+        parameters default to those of each shift's get_shift_graph
+
+    Returns
+    -------
+    reports: list of dicts
+        one per graph, in the order of shifts: 'filename', 'data_time' and
+        'render_time' (seconds spent collecting and drawing the graph data) and
+        'error' (None if the graph was saved, otherwise the traceback)
+    """
+    shifts = list(shifts)
+    filenames = list(filenames)
+    if len(shifts) != len(filenames):
+        raise ValueError('shifts and filenames are not the same length')
+    # Collect the graph data of every shift before fanning out
+    tasks = []
+    reports = []
+    for shift,filename in zip(shifts, filenames):
+        report = {'filename': filename, 'data_time': 0.0, 'render_time': 0.0,
+                  'error': None}
+        start = time.perf_counter()
+        try:
+            graph_data,plot_params = get_graph_task(shift, top_n, kwargs)
+            tasks.append((graph_data, plot_params, filename))
+        except Exception:
+            report['error'] = traceback.format_exc()
+            tasks.append(None)
+        report['data_time'] = time.perf_counter() - start
+        reports.append(report)
+
+    if n_jobs is None:
+        renderer = ShiftGraphRenderer() if reuse_figures else None
+        results = [render_shift_graph(task, renderer) if task is not None
+                   else None for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                                 initargs=(reuse_figures,)) as executor:
+            futures = [executor.submit(_render_worker_shift_graph, task)
+                       if task is not None else None for task in tasks]
+            results = [_get_result(future) for future in futures]
+    for report,result in zip(reports, results):
+        if result is not None:
+            report['render_time'],report['error'] = result
+    return reports
+
+def get_graph_task(shift, top_n, kwargs):
+    """
+    Collects the graph data of a shift and the plotting parameters of its graph
+
+    Parameters
+    ----------
+    shift: Shift or dict
+        a Shift object, or graph data as given by get_shift_graph_data
+    top_n: int
+        number of top contributing types displayed in the graph
+    kwargs: dict
+        parameters of get_shift_graph and plotting parameters
+
+    Returns
+    -------
+    graph_data, plot_params: dict, dict
+        the data drawn in the graph and the plotting parameters to draw it with
+    """
+    plot_params = {k : v for k,v in kwargs.items()
+                   if k not in GRAPH_DATA_PARAMS}
+    if isinstance(shift, collections.abc.Mapping):
+        return shift,plot_params
+    # Use the graph defaults of the type of shift, e.g. ProportionShift graphs
+    # are not normalized and JSDivergenceShift graphs show all contributions
+    # as positive
+    defaults = inspect.signature(shift.get_shift_graph).parameters
+    data_params = {p : kwargs.get(p, defaults[p].default)
+                   for p in GRAPH_DATA_PARAMS}
+    graph_data = shift.get_shift_graph_data(top_n=top_n, **data_params)
+    return graph_data,shift.get_graph_plot_params(plot_params)
+
+def render_shift_graph(task, renderer=None):
+    """
+    Draws one shift graph and saves it to its file
+
+    Parameters
+    ----------
+    task: tuple
+        (graph_data, plot_params, filename), as collected by get_graph_task
+    renderer: ShiftGraphRenderer, optional
+        if not None, draws the graph on a reused figure template of renderer
+
+    Returns
+    -------
+    render_time: float
+        seconds spent drawing and saving the graph
+    error: str or None
+        the traceback if the graph could not be rendered
+    """
+    import matplotlib.pyplot as plt
+    from . import plotting
+
+    graph_data,plot_params,filename = task
+    start = time.perf_counter()
+    f = None
+    error = None
+    if renderer is not None:
+        try:
+            renderer.save_graph(graph_data, plot_params, filename)
+        except Exception:
+            error = traceback.format_exc()
+        return time.perf_counter() - start,error
+    try:
+        plot_params = plotting.get_plot_params(dict(plot_params),
+                                               graph_data['show_score_diffs'])
+        with record_stage('build_figure'):
+            f,ax = plotting.plot_shift_graph(graph_data, plot_params)
+            if plot_params['tight']:
+                with warnings.catch_warnings():
+                    warnings.simplefilter('ignore')
+                    f.tight_layout()
+        with record_stage('savefig'):
+            f.savefig(filename, dpi=plot_params['dpi'])
+    except Exception:
+        error = traceback.format_exc()
+    finally:
+        # Free the figure, workers draw many graphs
+        if f is not None:
+            plt.close(f)
+    return time.perf_counter() - start,error
+
+# ------------------------------------------------------------------------------
+# ------------------------------ Template rendering ----------------------------
+# ------------------------------------------------------------------------------
+class ShiftGraphRenderer:
+    def __init__(self, top_n=50, **kwargs):
+        """
+        Renders many shift graphs with the same top_n and plotting parameters.
+        The static layout of the graphs is built once in a figure template,
+        see plotting.ShiftGraphTemplate, and each graph only updates its bars,
+        labels, insets and title. Templates are built as needed for graphs
+        that differ in their insets, detail, contribution bars or score
+        differences
+
+        The layout of the first graph drawn on a template is kept for the
+        following graphs, so graphs may differ slightly from those drawn by
+        get_shift_graph
+
+        Parameters
+        ----------
+        top_n: int
+            number of top contributing types displayed in each graph
+        kwargs:
+            parameters of get_shift_graph (normalize, text_size_inset,
+            cumulative_inset) and plotting parameters shared by all graphs.
+            Unset parameters default to those of each shift's get_shift_graph
+        """
+        self.top_n = top_n
+        self.kwargs = kwargs
+        self.templates = dict()
+
+    def render(self, shift, filename=None, format='png'):
+        """
+        Renders the shift graph of a shift
+
+        Parameters
+        ----------
+        shift: Shift or dict
+            a Shift object, or graph data as given by get_shift_graph_data
+        filename: str, optional
+            name of the file for saving the graph. If None, the graph is
+            returned as bytes
+        format: str
+            image format of the graph if it is returned as bytes, e.g. 'png'
+            or 'svg'
+
+        Returns
+        -------
+        graph: bytes or None
+            the rendered shift graph if filename is None
+        """
+        graph_data,plot_params = get_graph_task(shift, self.top_n, self.kwargs)
+        if filename is not None:
+            self.save_graph(graph_data, plot_params, filename)
+            return
+        buffer = io.BytesIO()
+        self.save_graph(graph_data, plot_params, buffer, format)
+        return buffer.getvalue()
+
+    def save_graph(self, graph_data, plot_params, filename, format=None):
+        """
+        Draws a shift graph from its graph data on a template and saves it
+
+        Parameters
+        ----------
+        graph_data, plot_params: dict, dict
+            the data drawn in the graph and the plotting parameters to draw it
+            with, as collected by get_graph_task
+        filename: str or file-like
+            where to save the graph
+        format: str, optional
+            image format of the graph. If None, it is inferred from filename
+        """
+        template = self.get_template(graph_data, plot_params)
+        with record_stage('build_figure'):
+            f,ax = template.draw(graph_data)
+        with record_stage('savefig'):
+            f.savefig(filename, format=format, dpi=template.plot_params['dpi'])
+
+    def get_template(self, graph_data, plot_params):
+        """
+        Returns the figure template a graph is drawn on, building it if needed
+        """
+        from . import plotting
+
+        key = (graph_data['top_n'], plot_params.get('detailed', True),
+               plot_params.get('show_total', True),
+               plot_params.get('all_pos_contributions', False),
+               graph_data['show_score_diffs'], graph_data['cumulative'] is None,
+               graph_data['text_sizes'] is None)
+        if key not in self.templates:
+            plot_params = plotting.get_plot_params(dict(plot_params),
+                                                   graph_data['show_score_diffs'])
+            template = plotting.ShiftGraphTemplate(graph_data['top_n'],
+                                                   plot_params,
+                                                   graph_data['cumulative'] is not None,
+                                                   graph_data['text_sizes'] is not None)
+            self.templates[key] = template
+        return self.templates[key]
+
+
+def _get_result(future):
+    try:
+        return future.result()
+    except Exception:
+        # e.g. a worker process died or the task could not be pickled
+        return 0.0,traceback.format_exc()
+
+def _init_worker(reuse_figures=False):
+    global _worker_renderer
+    import matplotlib
+    matplotlib.use('Agg')
+    if reuse_figures:
+        _worker_renderer = ShiftGraphRenderer()
+
+def _render_worker_shift_graph(task):
+    return render_shift_graph(task, _worker_renderer)
@@ -0,0 +1,192 @@
+"""
+batch_shift.py
+
+Shifts of many comparison systems against one shared reference system,
+computed together over a (types x systems) matrix
+"""
+import collections.abc
+import numpy as np
+
+from .helper import *
+
+# ------------------------------------------------------------------------------
+# ----------------------------- Batch shift classes ----------------------------
+# ------------------------------------------------------------------------------
+class BatchShift:
+    def __init__(self, reference, comparisons, type2score_ref=None,
+                 type2score_comp=None, reference_value=None, stop_lens=None,
+                 encoding='utf-8'):
+        """
+        Shift object for calculating the relative shifts of many comparison
+        systems from one reference system. The reference is filtered,
+        normalized and scored once, and all comparisons are then scored against
+        it with vectorized arithmetic over a (types x systems) matrix
+
+        Parameters
+        ----------
+        reference: dict
+            keys are types of the reference and values are frequencies of those
+            types. May also be a pandas Series or a (types, freqs) pair of
+            arrays, see helper.get_type_mapping
+        comparisons: dict or list of dicts
+            if dict, keys are names of comparison systems and values are their
+            type2freq dicts. If list, comparisons are named by their position
+        type2score_ref, type2score_comp: dict or str, optional
+            if dict, types are keys and values are "scores" associated with each
+            type (e.g., sentiment). If str, the name of a score dict. If None
+            and other type2score is None, defaults to uniform scores across
+            types. Otherwise defaults to the other type2score dict
+        reference_value: float, optional
+            the reference score from which to calculate the deviation. If None,
+            defaults to the weighted score of reference
+        stop_lens: iterable of 2-tuples, optional
+            denotes intervals that should be excluded when calculating shift
+            scores. Types whose score falls in any interval under either score
+            dict are excluded from all systems
+        encoding: str, optional
+            encoding for reading in a lexicon included in Shifterator
+        """
+        if isinstance(comparisons, collections.abc.Mapping):
+            self.names = list(comparisons.keys())
+            comparisons = list(comparisons.values())
+        else:
+            comparisons = list(comparisons)
+            self.names = list(range(len(comparisons)))
+        self.comparisons = [get_type_mapping(c) for c in comparisons]
+        self.type2freq_ref = get_type_mapping(reference)
+        # Set type2score dictionaries
+        if type2score_ref is None and type2score_comp is None:
+            self.type2score_ref = None
+            self.type2score_comp = None
+        elif type2score_comp is None:
+            self.type2score_ref = get_score_dictionary(type2score_ref, encoding)
+            self.type2score_comp = self.type2score_ref
+        elif type2score_ref is None:
+            self.type2score_comp = get_score_dictionary(type2score_comp, encoding)
+            self.type2score_ref = self.type2score_comp
+        else:
+            self.type2score_ref = get_score_dictionary(type2score_ref, encoding)
+            self.type2score_comp = get_score_dictionary(type2score_comp, encoding)
+        self.stop_lens = stop_lens
+
+        # Align the reference and the score dicts to the common vocabulary
+        self.types,self.score_ref,self.score_comp = self.get_vocabulary()
+        self.type2index = get_type_index(self.types)
+        self.freq_ref = get_aligned_array(reference, self.type2index, fill=0)
+        # Set reference value
+        if reference_value is not None:
+            self.reference_value = reference_value
+        else:
+            self.reference_value = float(np.dot(self.freq_ref, self.score_ref)
+                                         / self.freq_ref.sum())
+        self.result_table = None
+
+    def get_vocabulary(self):
+        """
+        Returns the types that are observed in any system and scored in either
+        score dict, along with their aligned scores, excluding stopped types
+
+        Returns
+        -------
+        types: list
+            the common vocabulary of all systems
+        score_ref, score_comp: np.ndarray
+            scores of the types for the reference and the comparisons. Types
+            missing from one score dict borrow the score of the other
+        """
+        observed = set(self.type2freq_ref.keys())
+        for type2freq in self.comparisons:
+            observed.update(type2freq.keys())
+        return get_scored_vocabulary(observed, self.type2score_ref,
+                                     self.type2score_comp, self.stop_lens)
+
+    def get_shift_arrays(self, start=0, stop=None):
+        """
+        Calculates the shift components of a block of comparison systems
+
+        Parameters
+        ----------
+        start, stop: int
+            positions of the first and one past the last comparison in the block
+
+        Returns
+        -------
+        freq_comp: np.ndarray
+            (types x systems) frequencies of the comparisons in the block
+        p_diff, s_diff, p_avg, s_ref_diff, shift_score: np.ndarray
+            per-type components of the (unnormalized) shift scores, with one
+            column per comparison in the block
+        """
+        freq_comp = get_system_matrix(self.comparisons[start:stop],
+                                      self.type2index)
+        components = get_shift_component_arrays(self.freq_ref.reshape(-1, 1),
+                                                freq_comp, self.score_ref,
+                                                self.score_comp,
+                                                self.reference_value)
+        return (freq_comp,) + components
+
+    def get_shift_scores(self, normalize=True, chunk_size=64):
+        """
+        Calculates the type shift scores of every comparison
+
+        Parameters
+        ----------
+        normalize: bool
+            if True normalizes shift scores so they sum to 1 or -1 within each
+            comparison
+        chunk_size: int
+            number of comparisons scored at once, which bounds the memory of
+            intermediate arrays
+
+        Returns
+        -------
+        shift_scores: np.ndarray
+            (types x comparisons) shift scores. Rows are ordered by self.types
+            and columns by self.names
+        """
+        shift_scores = np.empty((len(self.types), len(self.comparisons)))
+        for start in range(0, len(self.comparisons), chunk_size):
+            stop = start + chunk_size
+            block_scores = self.get_shift_arrays(start, stop)[-1]
+            if normalize:
+                block_scores /= np.abs(block_scores.sum(axis=0))
+            shift_scores[:,start:stop] = block_scores
+        return shift_scores
+
+    def get_result_table(self, chunk_size=64):
+        """
+        Calculates the total shift, weighted score and sums of each type of
+        contribution for every comparison
+
+        Parameters
+        ----------
+        chunk_size: int
+            number of comparisons scored at once, which bounds the memory of
+            intermediate arrays
+
+        Returns
+        -------
+        result_table: dict
+            keys are column names and values are arrays with one entry per
+            comparison: 'name', 'diff' (total shift), 'weighted_score', and the
+            contribution sums 'pos_s_pos_p', 'pos_s_neg_p', 'neg_s_pos_p',
+            'neg_s_neg_p', 'pos_s' and 'neg_s'
+        """
+        n = len(self.comparisons)
+        columns = ['diff', 'weighted_score', 'pos_s_pos_p', 'pos_s_neg_p',
+                   'neg_s_pos_p', 'neg_s_neg_p', 'pos_s', 'neg_s']
+        result_table = {c : np.empty(n) for c in columns}
+        for start in range(0, n, chunk_size):
+            stop = min(start + chunk_size, n)
+            freq_comp,p_diff,s_diff,p_avg,s_ref_diff,shift_score = self.get_shift_arrays(start,
+                                                                                          stop)
+            result_table['diff'][start:stop] = shift_score.sum(axis=0)
+            result_table['weighted_score'][start:stop] = np.dot(self.score_comp,
+                                                                freq_comp)\
+                                                         / freq_comp.sum(axis=0)
+            comp_sums = get_component_sums(p_diff, s_diff, p_avg, s_ref_diff)
+            for comp,comp_sum in comp_sums.items():
+                result_table[comp][start:stop] = comp_sum
+        result_table['name'] = np.array(self.names, dtype=object)
+        self.result_table = result_table
+        return result_table
@@ -0,0 +1,207 @@
+"""
+bootstrap.py
+
+Bootstrap confidence intervals of shift scores. Both systems are resampled
+from multinomial distributions, and all replicates are scored at once as
+(types x replicates) matrices, one block of types at a time
+"""
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from .helper import *
+
+# State shared with worker processes, set once per worker by _init_worker
+_worker_state = None
+
+# ------------------------------------------------------------------------------
+# ------------------------------- Bootstrap Funcs ------------------------------
+# ------------------------------------------------------------------------------
+def get_bootstrap_intervals(freq_1, freq_2, score_1, score_2,
+                            reference_value=None, n_samples=1000,
+                            confidence=0.95, chunk_size=1000, n_jobs=None,
+                            seed=None, per_type=True):
+    """
+    Calculates bootstrap percentile intervals of the total shift and of the
+    (unnormalized) shift score of each type
+
+    Each replicate draws as many tokens as each system holds from the relative
+    frequencies of the system. A replicate is drawn block by block over the
+    types: the tokens of each block are drawn first, then the tokens of each
+    type within the block, which is an exact multinomial draw. Blocks are
+    seeded on their own, so blocks can be drawn twice, and in any process,
+    with the same result. Memory is bounded by chunk_size x n_samples
+
+    Parameters
+    ----------
+    freq_1, freq_2: np.ndarray
+        integer token counts of the types of each system, aligned to the same
+        index. Raises ValueError if they are not integers or sum to zero
+    score_1, score_2: np.ndarray
+        scores of the types of each system, aligned to the same index
+    reference_value: float, optional
+        the reference score from which to calculate the deviation. If None,
+        each replicate uses the weighted score of its resample of system 1
+    n_samples: int
+        number of bootstrap replicates
+    confidence: float
+        confidence level of the percentile intervals
+    chunk_size: int
+        number of types resampled and scored at once
+    n_jobs: int, optional
+        if not None, the number of worker processes to split blocks across
+    seed: int, optional
+        seed of the random number generator, for reproducible intervals
+    per_type: bool
+        if False, only calculates the interval of the total shift
+
+    Returns
+    -------
+    intervals: dict
+        'diff' ((lower, upper) of the total shift), 'diff_samples' (total
+        shift of each replicate), and 'lower' and 'upper' (arrays of the
+        per-type bounds, aligned to the types of freq_1, or None if per_type is
+        False)
+    """
+    freq_1 = np.asarray(freq_1, dtype=np.float64)
+    freq_2 = np.asarray(freq_2, dtype=np.float64)
+    # Resamples draw as many tokens as each system holds, so relative
+    # frequencies would be resampled as a corpus of a handful of tokens
+    for system,freq in [(1, freq_1), (2, freq_2)]:
+        if not np.array_equal(freq, np.round(freq)):
+            raise ValueError('Bootstrap resampling requires integer token '
+                             'counts, but the frequencies of system {} are not '
+                             'integers'.format(system))
+        if freq.sum() <= 0:
+            raise ValueError('System {} has no tokens to resample'.format(system))
+    n_types = len(freq_1)
+    starts = list(range(0, n_types, chunk_size))
+    seeds = np.random.SeedSequence(seed).spawn(len(starts) + 1)
+    # Draw the number of tokens of each block of types in each replicate
+    rng = np.random.default_rng(seeds[0])
+    block_counts = []
+    for freq in [freq_1, freq_2]:
+        total = int(freq.sum())
+        block_freqs = np.add.reduceat(freq, starts) if n_types > 0 else freq
+        block_counts.append(rng.multinomial(total, block_freqs / freq.sum(),
+                                            size=n_samples))
+    state = {'freq_1': freq_1, 'freq_2': freq_2, 'score_1': score_1,
+             'score_2': score_2, 'starts': starts, 'chunk_size': chunk_size,
+             'seeds': seeds[1:], 'block_counts_1': block_counts[0],
+             'block_counts_2': block_counts[1], 'confidence': confidence}
+    totals = (block_counts[0].sum(axis=1), block_counts[1].sum(axis=1))
+
+    if n_jobs is None:
+        executor = None
+        map_blocks = lambda func, *args: map(func, *args)
+    else:
+        executor = ProcessPoolExecutor(max_workers=n_jobs,
+                                       initializer=_init_worker,
+                                       initargs=(state,))
+        map_blocks = lambda func, *args: executor.map(func, *args)
+    try:
+        # Sum the weighted scores of each replicate over all blocks
+        weighted_1 = np.zeros(n_samples)
+        weighted_2 = np.zeros(n_samples)
+        func = _get_worker_block_weights if executor else _get_block_weights
+        blocks = range(len(starts))
+        args = (blocks,) if executor else ([state]*len(starts), blocks)
+        for w_1,w_2 in map_blocks(func, *args):
+            weighted_1 += w_1
+            weighted_2 += w_2
+        weighted_1 /= totals[0]
+        weighted_2 /= totals[1]
+        # The total shift does not depend on the reference value
+        diff_samples = weighted_2 - weighted_1
+        lower = None
+        upper = None
+        if per_type:
+            if reference_value is None:
+                references = weighted_1
+            else:
+                references = np.full(n_samples, reference_value)
+            lower = np.empty(n_types)
+            upper = np.empty(n_types)
+            func = _get_worker_block_intervals if executor\
+                   else _get_block_intervals
+            args = (blocks, [references]*len(starts))
+            if not executor:
+                args = ([state]*len(starts),) + args
+            for b,(lower_b,upper_b) in enumerate(map_blocks(func, *args)):
+                lower[starts[b]:starts[b]+chunk_size] = lower_b
+                upper[starts[b]:starts[b]+chunk_size] = upper_b
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    diff_lower,diff_upper = np.percentile(diff_samples,
+                                          get_percentiles(confidence))
+    return {'diff': (float(diff_lower), float(diff_upper)),
+            'diff_samples': diff_samples, 'lower': lower, 'upper': upper}
+
+def get_percentiles(confidence):
+    """
+    Returns the lower and upper percentiles of a two-sided interval
+    """
+    alpha = 100 * (1 - confidence) / 2
+    return [alpha, 100 - alpha]
+
+def get_block_draws(state, b):
+    """
+    Draws the resampled frequencies of block b of the types of both systems
+
+    Returns
+    -------
+    draws_1, draws_2: np.ndarray
+        (types x replicates) resampled frequencies of the block
+    """
+    start = state['starts'][b]
+    stop = start + state['chunk_size']
+    rng = np.random.default_rng(state['seeds'][b])
+    draws = []
+    for system in [1, 2]:
+        freq = state['freq_{}'.format(system)][start:stop]
+        block_counts = state['block_counts_{}'.format(system)][:,b]
+        block_total = freq.sum()
+        if block_total > 0:
+            draws.append(rng.multinomial(block_counts, freq / block_total).T)
+        else:
+            draws.append(np.zeros((len(freq), len(block_counts))))
+    return draws[0],draws[1]
+
+def _get_block_weights(state, b):
+    """
+    Returns the weighted scores of block b in each replicate of both systems
+    """
+    start = state['starts'][b]
+    stop = start + state['chunk_size']
+    draws_1,draws_2 = get_block_draws(state, b)
+    return (np.dot(state['score_1'][start:stop], draws_1),
+            np.dot(state['score_2'][start:stop], draws_2))
+
+def _get_block_intervals(state, b, references):
+    """
+    Returns the percentile intervals of the shift scores of the types in block
+    b, given the reference value of each replicate
+    """
+    start = state['starts'][b]
+    stop = start + state['chunk_size']
+    draws_1,draws_2 = get_block_draws(state, b)
+    totals = (state['block_counts_1'].sum(axis=1),
+              state['block_counts_2'].sum(axis=1))
+    shift_score = get_shift_component_arrays(draws_1, draws_2,
+                                             state['score_1'][start:stop],
+                                             state['score_2'][start:stop],
+                                             references.reshape(1, -1),
+                                             totals=totals)[-1]
+    return np.percentile(shift_score, get_percentiles(state['confidence']),
+                         axis=1)
+
+def _init_worker(state):
+    global _worker_state
+    _worker_state = state
+
+def _get_worker_block_weights(b):
+    return _get_block_weights(_worker_state, b)
+
+def _get_worker_block_intervals(b, references):
+    return _get_block_intervals(_worker_state, b, references)
@@ -0,0 +1,395 @@
+"""
+compiled_lexicon.py
+
+Precompiled binary format for the lexicons included in Shifterator. A compiled
+lexicon holds a sorted table of types and an aligned array of float64 scores,
+and is opened with mmap so that several processes share the same pages.
+Lexicons loaded by name through helper.load_score_dictionary are decoded from
+the compiled format into a dict, which skips parsing the scores
+
+File layout (little-endian):
+    magic           8 bytes, b'SHFTLEX2'
+    n_types         uint64
+    blob_nbytes     uint64
+    source_mtime_ns int64, modification time of the TSV file, -1 if unknown
+    source_size     int64, size of the TSV file, -1 if unknown
+    encoding        16 bytes, encoding the TSV file was read with
+    offsets         uint64[n_types + 1], start of each type in the blob
+    scores          float64[n_types]
+    blob            utf-8 types, sorted and separated by newlines
+
+A compiled lexicon is only used while its TSV file is unchanged and for the
+encoding it was compiled with. Otherwise the TSV file is read instead
+
+Compile the bundled lexicons with:
+    python -m shifterator.compiled_lexicon [--out-dir DIR] [names ...]
+"""
+import os
+import sys
+import mmap
+import codecs
+import struct
+import warnings
+import argparse
+import collections.abc
+import numpy as np
+
+MAGIC = b'SHFTLEX2'
+HEADER = struct.Struct('<8sQQqq16s')
+EXTENSION = '.shl'
+LEXICON_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lexicons')
+# Compiled lexicons are looked up here, next to the TSVs unless overridden
+COMPILED_DIR = os.environ.get('SHIFTERATOR_COMPILED_LEXICONS', LEXICON_DIR)
+
+# ------------------------------------------------------------------------------
+# ------------------------------ Compiled Lexicon ------------------------------
+# ------------------------------------------------------------------------------
+class CompiledLexicon(collections.abc.Mapping):
+    def __init__(self, path):
+        """
+        Read-only, memory-mapped lexicon. The scores are read from the mapped
+        pages without parsing, and the type table is decoded into a lookup dict
+        once, on the first lookup. Use as a context manager, or call close
+        when done
+
+        Parameters
+        ----------
+        path: str
+            path to a lexicon compiled with write_compiled_lexicon
+        """
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mm) < HEADER.size:
+            raise ValueError('Not a compiled Shifterator lexicon: {}'.format(path))
+        header = HEADER.unpack_from(self._mm, 0)
+        magic,n_types,blob_nbytes,source_mtime_ns,source_size,encoding = header
+        if magic != MAGIC:
+            raise ValueError('Not a compiled Shifterator lexicon: {}'.format(path))
+        self.source_mtime_ns = source_mtime_ns
+        self.source_size = source_size
+        self.encoding = encoding.rstrip(b'\0').decode('ascii')
+        offset = HEADER.size
+        self.offsets = np.frombuffer(self._mm, dtype='<u8', count=n_types+1,
+                                     offset=offset)
+        offset += 8 * (n_types + 1)
+        self.scores = np.frombuffer(self._mm, dtype='<f8', count=n_types,
+                                    offset=offset)
+        self._blob_start = offset + 8 * n_types
+        self._blob_nbytes = blob_nbytes
+        self.n_types = n_types
+        self.nbytes = len(self._mm)
+        # Lookup indexes, built once on first use
+        self._type2score = None
+        self._type_table = None
+
+    def _get_type2score(self):
+        """
+        Returns a dict of the scores of all types, decoded from the type table
+        on first use. Lookups then hash the type instead of searching the
+        table, so scoring a shift is as fast as with a parsed lexicon
+        """
+        if self._type2score is None:
+            self._type2score = dict(zip(self.get_types(), self.scores.tolist()))
+        return self._type2score
+
+    def _get_type_table(self):
+        """
+        Returns the sorted types of the lexicon as a NumPy str array, decoded
+        on first use
+        """
+        if self._type_table is None:
+            self._type_table = np.array(self.get_types(), dtype=str)
+        return self._type_table
+
+    def get_index(self, t):
+        """
+        Returns the position of type t in the type table, or -1 if it is not in
+        the lexicon
+        """
+        if not isinstance(t, str) or self.n_types == 0:
+            return -1
+        table = self._get_type_table()
+        i = int(np.searchsorted(table, t))
+        if i < self.n_types and table[i] == t:
+            return i
+        return -1
+
+    def __getitem__(self, t):
+        return self._get_type2score()[t]
+
+    def __contains__(self, t):
+        return t in self._get_type2score()
+
+    def __iter__(self):
+        return iter(self._get_type2score())
+
+    def __len__(self):
+        return self.n_types
+
+    def __reduce__(self):
+        # Reopen the mapping in other processes instead of pickling its pages
+        return (CompiledLexicon, (self.path,))
+
+    def get_types(self):
+        """
+        Returns all types of the lexicon, in sorted order
+        """
+        if self.n_types == 0:
+            return []
+        blob = self._mm[self._blob_start:self._blob_start+self._blob_nbytes]
+        return blob.decode('utf-8').split('\n')
+
+    def get_vocabulary_scores(self, types):
+        """
+        Looks up the scores of only the given types, in one vectorized binary
+        search of the sorted type table
+
+        Parameters
+        ----------
+        types: iterable
+            the types to look up, e.g. the observed vocabulary of a corpus
+
+        Returns
+        -------
+        type2score: dict
+            keys are the types that are in the lexicon and values are their
+            scores
+        """
+        if self._type2score is not None:
+            type2score = self._type2score
+            return {t : type2score[t] for t in types if t in type2score}
+        types = [t for t in types if isinstance(t, str)]
+        if len(types) == 0 or self.n_types == 0:
+            return dict()
+        table = self._get_type_table()
+        query = np.array(types, dtype=str)
+        positions = np.searchsorted(table, query)
+        positions[positions == self.n_types] = 0
+        found = np.flatnonzero(table[positions] == query)
+        scores = self.scores[positions[found]].tolist()
+        return {types[i] : s for i,s in zip(found.tolist(), scores)}
+
+    def is_stale(self, source_path):
+        """
+        Returns whether the TSV file the lexicon was compiled from has changed
+        since, or is missing. Lexicons compiled without a source file are
+        never stale
+
+        Parameters
+        ----------
+        source_path: str
+            path of the TSV file of the lexicon
+        """
+        if self.source_mtime_ns < 0:
+            return False
+        try:
+            stat = os.stat(source_path)
+        except OSError:
+            return True
+        return stat.st_mtime_ns != self.source_mtime_ns\
+               or stat.st_size != self.source_size
+
+    def items(self):
+        return self._get_type2score().items()
+
+    def values(self):
+        return self._get_type2score().values()
+
+    def copy(self):
+        return dict(self._get_type2score())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self.offsets = None
+        self.scores = None
+        self._type2score = None
+        self._type_table = None
+        self._mm.close()
+
+# ------------------------------------------------------------------------------
+# ------------------------------- Compiling Funcs ------------------------------
+# ------------------------------------------------------------------------------
+def write_compiled_lexicon(type2score, path, source_path=None,
+                           encoding='utf-8'):
+    """
+    Writes a lexicon in the compiled binary format
+
+    Parameters
+    ----------
+    type2score: dict
+        keys are types and values are scores of those types. Types may not
+        contain newlines
+    path: str
+        path of the compiled lexicon
+    source_path: str, optional
+        path of the TSV file type2score was read from. Its modification time
+        and size are recorded, so the compiled lexicon is not used once the
+        TSV file changes
+    encoding: str
+        encoding the TSV file was read with
+    """
+    if source_path is not None:
+        stat = os.stat(source_path)
+        source_mtime_ns,source_size = stat.st_mtime_ns,stat.st_size
+    else:
+        source_mtime_ns,source_size = -1,-1
+    encoding = get_encoding_name(encoding).encode('ascii')
+    types = sorted(type2score)
+    type_bytes = [t.encode('utf-8') for t in types]
+    lengths = np.fromiter((len(b) + 1 for b in type_bytes), dtype='<u8',
+                          count=len(types))
+    offsets = np.zeros(len(types) + 1, dtype='<u8')
+    np.cumsum(lengths, out=offsets[1:])
+    scores = np.fromiter((type2score[t] for t in types), dtype='<f8',
+                         count=len(types))
+    blob = b'\n'.join(type_bytes)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    # Write to a temporary file first so readers never see a partial lexicon
+    tmp_path = '{}.{}.tmp'.format(path, os.getpid())
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(types), len(blob), source_mtime_ns,
+                            source_size, encoding))
+        f.write(offsets.tobytes())
+        f.write(scores.tobytes())
+        f.write(blob)
+    os.replace(tmp_path, path)
+
+def get_lexicon_names(lexicon_dir=LEXICON_DIR):
+    """
+    Returns the names of all TSV lexicons included in Shifterator
+    """
+    names = []
+    for lexicon in sorted(os.listdir(lexicon_dir)):
+        sub_dir = os.path.join(lexicon_dir, lexicon)
+        if not os.path.isdir(sub_dir):
+            continue
+        names += [f[:-len('.tsv')] for f in sorted(os.listdir(sub_dir))
+                  if f.endswith('.tsv')]
+    return names
+
+def get_compiled_path(scores, compiled_dir=None):
+    """
+    Returns the path of the compiled version of a lexicon
+
+    Parameters
+    ----------
+    scores: str
+        the name of a lexicon included in Shifterator
+    compiled_dir: str, optional
+        directory of compiled lexicons. Defaults to COMPILED_DIR
+    """
+    if compiled_dir is None:
+        compiled_dir = COMPILED_DIR
+    lexicon = scores.split('_')[0]
+    return os.path.join(compiled_dir, lexicon, scores + EXTENSION)
+
+def get_source_path(scores):
+    """
+    Returns the path of the TSV file of a lexicon included in Shifterator
+
+    Parameters
+    ----------
+    scores: str
+        the name of a lexicon included in Shifterator
+    """
+    lexicon = scores.split('_')[0]
+    return os.path.join(LEXICON_DIR, lexicon, scores + '.tsv')
+
+def get_encoding_name(encoding):
+    """
+    Returns the canonical name of an encoding, e.g. 'utf-8' for 'UTF8'
+    """
+    return codecs.lookup(encoding).name
+
+def compile_lexicons(names=None, compiled_dir=None, encoding='utf-8',
+                     verbose=False):
+    """
+    Converts lexicons included in Shifterator from TSV to the compiled format
+
+    Parameters
+    ----------
+    names: iterable of str, optional
+        names of the lexicons to compile. If None, compiles all lexicons
+    compiled_dir: str, optional
+        directory to write the compiled lexicons to. Defaults to COMPILED_DIR
+    encoding: str
+        encoding of the TSV lexicon files
+
+    Returns
+    -------
+    paths: list of str
+        paths of the compiled lexicons
+    """
+    # Imported here because helper loads compiled lexicons through this module
+    from .helper import load_score_dictionary
+    if names is None:
+        names = get_lexicon_names()
+    paths = []
+    for name in names:
+        type2score = load_score_dictionary(name, encoding, compiled=False)
+        path = get_compiled_path(name, compiled_dir)
+        write_compiled_lexicon(type2score, path, get_source_path(name),
+                               encoding)
+        paths.append(path)
+        if verbose:
+            print(path)
+    return paths
+
+def load_compiled_lexicon(scores, compiled_dir=None, encoding='utf-8'):
+    """
+    Opens the compiled version of a lexicon included in Shifterator
+
+    Parameters
+    ----------
+    scores: str
+        the name of a lexicon included in Shifterator
+    compiled_dir: str, optional
+        directory of compiled lexicons. Defaults to COMPILED_DIR
+    encoding: str
+        encoding the TSV file is read with. A lexicon compiled with another
+        encoding is not used
+
+    Returns
+    -------
+    type2score: CompiledLexicon or None
+        the memory-mapped lexicon, or None if it has not been compiled, was
+        compiled with another encoding, or is out of date with its TSV file
+    """
+    path = get_compiled_path(scores, compiled_dir)
+    if not os.path.isfile(path):
+        return None
+    try:
+        lexicon = CompiledLexicon(path)
+    except ValueError:
+        # e.g. compiled in an earlier version of the format
+        warnings.warn('Cannot read compiled lexicon {}, reading the TSV file '
+                      'instead. Recompile it with python -m '
+                      'shifterator.compiled_lexicon'.format(path))
+        return None
+    if lexicon.encoding != get_encoding_name(encoding):
+        lexicon.close()
+        return None
+    if lexicon.is_stale(get_source_path(scores)):
+        lexicon.close()
+        warnings.warn('Compiled lexicon {} is out of date with its TSV file, '
+                      'reading the TSV file instead. Recompile it with python '
+                      '-m shifterator.compiled_lexicon'.format(path))
+        return None
+    return lexicon
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compile the lexicons '
+                                     'included in Shifterator to a binary format')
+    parser.add_argument('names', nargs='*',
+                        help='names of lexicons to compile, defaults to all')
+    parser.add_argument('--out-dir', default=None,
+                        help='output directory, defaults to {}'.format(COMPILED_DIR))
+    args = parser.parse_args()
+    compile_lexicons(args.names or None, args.out_dir, verbose=True)
+    sys.exit(0)
@@ -0,0 +1,174 @@
+"""
+graph_service.py
+
+Asynchronous scoring and rendering of shift graphs for services built on
+asyncio. Shifts are scored in a thread pool, and graphs are drawn on explicit
+Agg figures that pyplot does not manage and returned as PNG or SVG bytes, so
+awaiting a graph never blocks the event loop
+"""
+import asyncio
+import contextvars
+import io
+import threading
+import warnings
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from .batch_graph import get_graph_task, _init_worker
+from .instrumentation import record_stage
+
+# Matplotlib keeps process-wide state, e.g. rcParams and its font and mathtext
+# caches, so threads of one process draw their graphs one at a time
+_render_lock = threading.Lock()
+
+# ------------------------------------------------------------------------------
+# -------------------------------- Graph service -------------------------------
+# ------------------------------------------------------------------------------
+class ShiftGraphService:
+    def __init__(self, max_pending=8, max_workers=None, n_jobs=None):
+        """
+        Scores shifts and renders their graphs to bytes in managed executors,
+        for use from coroutines. Use as an async context manager, or call
+        close when done
+
+        Parameters
+        ----------
+        max_pending: int
+            maximum number of graphs scored or rendered at once. Further
+            requests wait for a slot, so the graph data and figures held in
+            memory are bounded by max_pending graphs
+        max_workers: int, optional
+            number of threads that score shifts, and draw graphs if n_jobs is
+            None. Defaults to the ThreadPoolExecutor default
+        n_jobs: int, optional
+            if not None, the number of worker processes that draw graphs, so
+            graphs are drawn in parallel. If None, graphs are drawn one at a
+            time by the threads of the current process
+        """
+        if max_pending < 1:
+            raise ValueError('max_pending must be at least 1')
+        self.max_pending = max_pending
+        self._slots = asyncio.Semaphore(max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        if n_jobs is None:
+            self._render_executor = self._executor
+        else:
+            self._render_executor = ProcessPoolExecutor(max_workers=n_jobs,
+                                                        initializer=_init_worker)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.close(wait=False)
+
+    async def get_shift_graph(self, shift, format='png', top_n=50, **kwargs):
+        """
+        Scores a shift and renders its shift graph. Unset parameters take the
+        graph defaults of the type of shift and its fixed plotting parameters
+        apply, see Shift.get_graph_plot_params, so the graph is drawn as
+        get_shift_graph draws it
+
+        A shift object is scored in place, so the same shift object should not
+        be passed to concurrent requests. Stages scored or drawn by the threads
+        of the service are reported to the StageRecorders active in the calling
+        task, but not to those of other requests
+
+        Parameters
+        ----------
+        shift: Shift, dict or callable
+            a Shift object, graph data as given by get_shift_graph_data, or a
+            callable without arguments that builds the shift, e.g.
+            functools.partial(SentimentShift, reference, comparison), so that
+            the shift is also built outside of the event loop
+        format: str
+            image format of the graph, e.g. 'png' or 'svg'
+        top_n: int
+            number of top contributing types displayed in the graph
+        kwargs:
+            parameters of get_shift_graph (normalize, text_size_inset,
+            cumulative_inset) and plotting parameters, see
+            batch_graph.render_shift_graphs
+
+        Returns
+        -------
+        graph: bytes
+            the rendered shift graph
+        """
+        loop = asyncio.get_running_loop()
+        async with self._slots:
+            # Threads run in a copy of the context of the request, so they
+            # report stages to the recorders of the request
+            run = contextvars.copy_context().run
+            graph_data,plot_params = await loop.run_in_executor(self._executor,
+                                                                run,
+                                                                _get_graph_task,
+                                                                shift, top_n,
+                                                                kwargs)
+            if self._render_executor is self._executor:
+                render = (contextvars.copy_context().run, get_shift_graph_bytes)
+            else:
+                render = (get_shift_graph_bytes,)
+            return await loop.run_in_executor(self._render_executor, *render,
+                                              graph_data, plot_params, format)
+
+    def close(self, wait=True):
+        """
+        Shuts down the executors of the service
+
+        Parameters
+        ----------
+        wait: bool
+            if True, blocks until running requests are scored and rendered
+        """
+        self._executor.shutdown(wait=wait)
+        if self._render_executor is not self._executor:
+            self._render_executor.shutdown(wait=wait)
+
+def get_shift_graph_bytes(graph_data, plot_params, format='png'):
+    """
+    Draws a shift graph on an explicit Agg figure and returns the encoded image.
+    Global matplotlib settings changed while drawing, e.g. by the serif
+    parameter, are restored afterwards
+
+    Parameters
+    ----------
+    graph_data: dict
+        data of the graph, see Shift.get_shift_graph_data
+    plot_params: dict
+        plotting parameters, unset parameters take their defaults
+    format: str
+        image format of the graph, e.g. 'png' or 'svg'
+
+    Returns
+    -------
+    graph: bytes
+        the rendered shift graph
+    """
+    import matplotlib
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from . import plotting
+
+    buffer = io.BytesIO()
+    with _render_lock, matplotlib.rc_context():
+        plot_params = plotting.get_plot_params(dict(plot_params),
+                                               graph_data['show_score_diffs'])
+        with record_stage('build_figure'):
+            f = Figure()
+            FigureCanvasAgg(f)
+            f,ax = plotting.plot_shift_graph(graph_data, plot_params, figure=f)
+            if plot_params['tight']:
+                with warnings.catch_warnings():
+                    warnings.simplefilter('ignore')
+                    f.tight_layout()
+        with record_stage('savefig'):
+            f.savefig(buffer, format=format, dpi=plot_params['dpi'])
+    return buffer.getvalue()
+
+def _get_graph_task(shift, top_n, kwargs):
+    """
+    Builds the shift if needed and collects its graph data
+    """
+    if callable(shift):
+        shift = shift()
+    return get_graph_task(shift, top_n, kwargs)
@@ -3,11 +3,15 @@ helper.py
 
 Author: Ryan J. Gallagher, Network Science Institute, Northeastern University
 """
+import io
 import os
 import pkgutil
-import collections
+import collections.abc
 import numpy as np
-from math import log
+
+from .lexicon_cache import lexicon_cache
+from .instrumentation import instrumented
+from .compiled_lexicon import load_compiled_lexicon
 
 # ------------------------------------------------------------------------------
 # -------------------------- Relative Frequency Funcs --------------------------
@@ -19,12 +23,17 @@ def get_relative_freqs(type2freq):
 
     Parameters
     ----------
-    type2freq: dict
-        keys are types of a system and values are frequencies of those types
+    type2freq: dict, pandas.Series or tuple
+        keys are types of a system and values are frequencies of those types,
+        see get_type_mapping
+
+    Returns
+    -------
+    type2p: TypeArrayView
+        dict view where keys are types and values are relative frequencies
     """
-    n = sum(type2freq.values())
-    type2p = {t:s/n for t,s in type2freq.items()}
-    return type2p
+    type2index,freq = get_index_array(get_type_mapping(type2freq))
+    return TypeArrayView(type2index, freq / freq.sum())
 
 def get_mixed_distribution(type2p, type2q, p=0.5, q=0.5):
     """
@@ -37,24 +46,552 @@ def get_mixed_distribution(type2p, type2q, p=0.5, q=0.5):
     p, q: float
         relative weights of each distribution in the mixed distribution. Should
         sum to 1.
+
+    Returns
+    -------
+    type2m: TypeArrayView
+        dict view over the types of both distributions
+    """
+    type2index,_,_,probs_p,probs_q = get_aligned_probs(type2p, type2q,
+                                                       normalize=False)
+    return TypeArrayView(type2index, p*probs_p + q*probs_q)
+
+def get_aligned_probs(type2freq_1, type2freq_2, normalize=True):
+    """
+    Aligns the relative frequencies of two systems to the union of their types.
+    The types of system 1 come first, so they keep their positions
+
+    Parameters
+    ----------
+    type2freq_1, type2freq_2: dict
+        keys are types of a system and values are frequencies of those types
+    normalize: bool
+        if True, normalizes the frequencies of each system to sum to 1
+
+    Returns
+    -------
+    type2index: dict
+        keys are the types of both systems and values are their positions
+    type2index_1, type2index_2: dict
+        the positions of the types of each system, a subset of type2index
+    p_1, p_2: np.ndarray
+        relative frequencies of each system aligned to type2index, with 0 for
+        types that are not in the system
+    """
+    type2index_1,freq_1 = get_index_array(type2freq_1)
+    type2index = dict(type2index_1)
+    new_types = [t for t in type2freq_2 if t not in type2index_1]
+    type2index.update(zip(new_types, range(len(type2index_1), len(type2index_1)
+                                                               + len(new_types))))
+    type2index_2 = {t : type2index[t] for t in type2freq_2}
+    positions_2 = np.fromiter(type2index_2.values(), dtype=np.int64,
+                              count=len(type2index_2))
+    p_1 = np.zeros(len(type2index))
+    p_2 = np.zeros(len(type2index))
+    p_1[:len(freq_1)] = freq_1
+    p_2[positions_2] = get_aligned_array(type2freq_2, type2index_2)
+    if normalize:
+        p_1 /= p_1.sum()
+        p_2 /= p_2.sum()
+    return type2index, type2index_1, type2index_2, p_1, p_2
+
+# ------------------------------------------------------------------------------
+# --------------------------------- Array Funcs --------------------------------
+# ------------------------------------------------------------------------------
+class TypeArrayView(collections.abc.Mapping):
+    """
+    Read-only dict view of per-type values stored in an array that is aligned
+    to a shared vocabulary index
+
+    Parameters
+    ----------
+    type2index: dict
+        keys are types and values are the positions of those types in array
+    array: np.ndarray
+        per-type values, aligned to type2index
+    """
+    __slots__ = ('type2index', 'array')
+
+    def __init__(self, type2index, array):
+        self.type2index = type2index
+        self.array = array
+
+    def __getitem__(self, t):
+        return float(self.array[self.type2index[t]])
+
+    def __contains__(self, t):
+        return t in self.type2index
+
+    def __iter__(self):
+        return iter(self.type2index)
+
+    def __len__(self):
+        return len(self.type2index)
+
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__, self.copy())
+
+    def __eq__(self, other):
+        # Views over the same index compare their arrays instead of each type
+        if isinstance(other, TypeArrayView) and other.type2index is self.type2index:
+            return np.array_equal(self.array, other.array)
+        return collections.abc.Mapping.__eq__(self, other)
+
+    __hash__ = None
+
+    def items(self):
+        return zip(self, self.get_values().tolist())
+
+    def values(self):
+        return self.get_values().tolist()
+
+    def copy(self):
+        return dict(self.items())
+
+    def get_values(self):
+        """
+        Returns the values of the view as an array, in the order of its types
+        """
+        positions = np.fromiter(self.type2index.values(), dtype=np.int64,
+                                count=len(self.type2index))
+        return self.array[positions]
+
+def get_type_keys(type2value):
+    """
+    Returns a container of the types of a mapping that supports fast iteration
+    and membership tests, i.e. the dict index of a TypeArrayView
+    """
+    if isinstance(type2value, TypeArrayView):
+        return type2value.type2index
+    return type2value
+
+def get_type_mapping(type2value):
+    """
+    Wraps per-type values given as a pandas Series or a (types, values) pair of
+    aligned arrays as a read-only dict view, without copying the values.
+    Mappings, such as dicts and Counters, are returned as they are
+
+    Parameters
+    ----------
+    type2value: dict, pandas.Series or tuple
+        if a Series, its index holds the types. If a tuple, (types, values)
+        where values is an array aligned to types. Types must be unique
+
+    Returns
+    -------
+    type2value: Mapping
+        keys are types and values are their values
+    """
+    if isinstance(type2value, collections.abc.Mapping):
+        return type2value
+    if hasattr(type2value, 'index') and hasattr(type2value, 'to_numpy'):
+        # pandas Series, whose numeric values are viewed without a copy
+        types = type2value.index
+        values = type2value.to_numpy()
+    elif isinstance(type2value, tuple) and len(type2value) == 2:
+        types,values = type2value
+        values = np.asarray(values)
+    else:
+        raise TypeError('Expected a dict, a pandas Series or a (types, values) '
+                        'tuple, not {}'.format(type(type2value).__name__))
+    type2index = get_type_index(types)
+    if len(type2index) != len(values):
+        raise ValueError('Types are not unique or not aligned to values')
+    return TypeArrayView(type2index, values)
+
+def get_type_index(types):
+    """
+    Assigns each type a position in a shared vocabulary index
+
+    Parameters
+    ----------
+    types: iterable
+        types of the vocabulary
+
+    Returns
+    -------
+    type2index: dict
+        keys are types and values are their positions in aligned arrays
+    """
+    return {t:i for i,t in enumerate(types)}
+
+def get_index_array(type2value):
+    """
+    Returns the values of a dict as an array, along with the positions of its
+    types in the array. The index and array of a TypeArrayView are reused when
+    the view covers its whole array
+
+    Parameters
+    ----------
+    type2value: dict
+        keys are types and values are numbers associated with those types
+
+    Returns
+    -------
+    type2index: dict
+        keys are types and values are their positions in values
+    values: np.ndarray
+        float64 values of the types
+    """
+    if isinstance(type2value, TypeArrayView):
+        if len(type2value.array) == len(type2value.type2index):
+            return type2value.type2index, np.asarray(type2value.array,
+                                                     dtype=np.float64)
+        values = type2value.get_values().astype(np.float64)
+    else:
+        values = np.fromiter(type2value.values(), dtype=np.float64,
+                             count=len(type2value))
+    return get_type_index(type2value.keys()), values
+
+def get_aligned_array(type2value, type2index, fill=None):
     """
-    types = set(type2p.keys()).union(set(type2q.keys()))
-    type2m = dict()
-    for t in types:
-        if t in type2p and t in type2q:
-            type2m[t] = p*type2p[t] + q*type2q[t]
-        elif t in type2p:
-            type2m[t] = p*type2p[t]
+    Aligns the values of a dict to a vocabulary index as a float64 array
+
+    Parameters
+    ----------
+    type2value: dict
+        keys are types and values are numbers associated with those types
+    type2index: dict
+        keys are types and values are their positions in the aligned array
+    fill: float, optional
+        value for types of the index that are missing from type2value. If None,
+        every type of the index must be in type2value
+
+    Returns
+    -------
+    values: np.ndarray
+        values of type2value ordered by type2index
+    """
+    if isinstance(type2value, TypeArrayView) and len(type2value) > 0:
+        # Take values straight from the array of the view
+        if type2value.type2index is type2index:
+            return np.asarray(type2value.array, dtype=np.float64)
+        positions = np.fromiter((type2value.type2index.get(t, -1)
+                                 for t in type2index),
+                                dtype=np.int64, count=len(type2index))
+        values = type2value.array[positions].astype(np.float64)
+        missing = positions < 0
+        if missing.any():
+            if fill is None:
+                raise KeyError(next(t for t,m in zip(type2index, missing) if m))
+            values[missing] = fill
+        return values
+    if fill is None:
+        values = (type2value[t] for t in type2index)
+    else:
+        values = (type2value.get(t, fill) for t in type2index)
+    return np.fromiter(values, dtype=np.float64, count=len(type2index))
+
+def get_shift_component_arrays(freq_1, freq_2, score_1, score_2, reference_value,
+                               totals=None):
+    """
+    Calculates the components of the shift scores of aligned systems with
+    vectorized arithmetic
+
+    Parameters
+    ----------
+    freq_1, freq_2: np.ndarray
+        frequencies of the types of each system, aligned to the same index.
+        May be 2d (types x systems), in which case each column is normalized
+    score_1, score_2: np.ndarray
+        scores of the types of each system, aligned to the same index
+    reference_value: float or np.ndarray
+        the reference score from which to calculate the deviation. May be a
+        (1 x systems) array with one reference value per column
+    totals: tuple, optional
+        (total_1, total_2), the totals that freq_1 and freq_2 are normalized
+        by, e.g. when the arrays only hold a block of the types. If None,
+        defaults to the sums of freq_1 and freq_2
+
+    Returns
+    -------
+    p_diff, s_diff, p_avg, s_ref_diff, shift_score: np.ndarray
+        per-type components of the (unnormalized) shift scores
+    """
+    # Broadcast shared scores across the columns of 2d frequencies
+    if np.ndim(freq_1) == 2 or np.ndim(freq_2) == 2:
+        score_1 = score_1.reshape(-1, 1) if score_1.ndim == 1 else score_1
+        score_2 = score_2.reshape(-1, 1) if score_2.ndim == 1 else score_2
+    if totals is None:
+        totals = (freq_1.sum(axis=0), freq_2.sum(axis=0))
+    p_1 = freq_1 / totals[0]
+    p_2 = freq_2 / totals[1]
+    p_diff = p_2 - p_1
+    p_avg = 0.5 * (p_1 + p_2)
+    s_diff = score_2 - score_1
+    s_ref_diff = 0.5 * (score_2 + score_1) - reference_value
+    shift_score = p_diff * s_ref_diff + s_diff * p_avg
+    return p_diff, s_diff, p_avg, s_ref_diff, shift_score
+
+def get_system_matrix(systems, type2index):
+    """
+    Aligns the frequencies of several systems into a (types x systems) matrix
+
+    Parameters
+    ----------
+    systems: list of dict
+        keys are types of a system and values are frequencies of those types
+    type2index: dict
+        keys are types and values are their rows in the matrix. Types of a
+        system that are not in type2index are ignored
+
+    Returns
+    -------
+    freqs: np.ndarray
+        float64 matrix where column j holds the frequencies of systems[j]
+    """
+    freqs = np.zeros((len(type2index), len(systems)), dtype=np.float64)
+    for j,type2freq in enumerate(systems):
+        rows = np.fromiter((type2index.get(t, -1) for t in type2freq),
+                           dtype=np.int64, count=len(type2freq))
+        if isinstance(type2freq, TypeArrayView):
+            values = type2freq.get_values()
+        else:
+            values = np.fromiter(type2freq.values(), dtype=np.float64,
+                                 count=len(type2freq))
+        in_index = rows >= 0
+        freqs[rows[in_index], j] = values[in_index]
+    return freqs
+
+def get_group_counts(matrix, row_groups, columns=None):
+    """
+    Sums groups of rows of a document-term matrix into count vectors, without
+    densifying the matrix
+
+    Parameters
+    ----------
+    matrix: scipy.sparse matrix or np.ndarray
+        (documents x types) counts, e.g. a CSR document-term matrix
+    row_groups: list
+        the rows of each group, as boolean masks or arrays of row positions
+    columns: np.ndarray, optional
+        if not None, positions of the only columns to keep
+
+    Returns
+    -------
+    counts: np.ndarray
+        (types x groups) counts of each group, one column per group
+    """
+    if columns is None:
+        n_types = matrix.shape[1]
+    else:
+        n_types = len(columns)
+    counts = np.zeros((n_types, len(row_groups)))
+    for g,rows in enumerate(row_groups):
+        # Sparse row sums come back as (1 x types) dense matrices
+        group_counts = np.asarray(matrix[rows].sum(axis=0)).ravel()
+        if columns is None:
+            counts[:,g] = group_counts
         else:
-            type2m[t] = q*type2q[t]
-    return type2m
+            counts[:,g] = group_counts[columns]
+    return counts
+
+def get_count_dict(types, counts):
+    """
+    Returns the type2freq dict of the nonzero counts of a count vector
+
+    Parameters
+    ----------
+    types: list or np.ndarray
+        the type of each entry of counts
+    counts: np.ndarray
+        frequencies of the types
+
+    Returns
+    -------
+    type2freq: dict
+        keys are the types with nonzero counts and values are their counts
+    """
+    nonzero = np.flatnonzero(counts)
+    types = np.asarray(types, dtype=object)[nonzero].tolist()
+    return dict(zip(types, counts[nonzero].tolist()))
+
+def get_component_sums(p_diff, s_diff, p_avg, s_ref_diff):
+    """
+    Sums the contributions of aligned shift components into the six types of
+    contributions shown in shift graphs, using masked vectorized reductions
+
+    Parameters
+    ----------
+    p_diff, s_diff, p_avg, s_ref_diff: np.ndarray
+        per-type components of the shift scores, see get_shift_component_arrays.
+        If 2d (types x systems), sums are taken per system
+
+    Returns
+    -------
+    comp_sums: dict
+        keys are the types of contributions and values are their sums
+    """
+    c_p = p_diff * s_ref_diff
+    c_s = p_avg * s_diff
+    pos_s_ref = s_ref_diff > 0
+    pos_p = p_diff > 0
+    pos_s = s_diff > 0
+    return {'pos_s_pos_p': np.sum(c_p, axis=0, where=pos_s_ref & pos_p),
+            'pos_s_neg_p': np.sum(c_p, axis=0, where=pos_s_ref & ~pos_p),
+            'neg_s_pos_p': np.sum(c_p, axis=0, where=~pos_s_ref & pos_p),
+            'neg_s_neg_p': np.sum(c_p, axis=0, where=~pos_s_ref & ~pos_p),
+            'pos_s': np.sum(c_s, axis=0, where=pos_s),
+            'neg_s': np.sum(c_s, axis=0, where=~pos_s)}
+
+def get_top_n_indices(shift_scores, top_n):
+    """
+    Finds the positions of the top_n shift scores by absolute value with a
+    partial selection, without sorting the whole vocabulary
+
+    Parameters
+    ----------
+    shift_scores: np.ndarray
+        shift scores of types
+    top_n: int
+        number of positions to return
+
+    Returns
+    -------
+    top_indices: np.ndarray
+        positions of the top_n scores, sorted by descending absolute score
+    """
+    abs_scores = np.abs(shift_scores)
+    top_n = min(top_n, len(abs_scores))
+    if top_n <= 0:
+        return np.array([], dtype=np.int64)
+    top_indices = np.argpartition(-abs_scores, top_n - 1)[:top_n]
+    return top_indices[np.argsort(-abs_scores[top_indices], kind='stable')]
+
+def get_cumulative_scores(shift_scores, top_indices, n_tail=200):
+    """
+    Calculates the cumulative shift score of types ranked by their absolute
+    shift scores. Ranks within the top indices are exact, while the tail is
+    evaluated at log-spaced ranks with one multi-rank partial selection, which
+    avoids sorting the whole vocabulary. The ranks where the curve reaches its
+    maximum and minimum are always evaluated, see get_cumulative_extremes
+
+    Parameters
+    ----------
+    shift_scores: np.ndarray
+        shift scores of types
+    top_indices: np.ndarray
+        positions of the top scores, sorted by descending absolute score (see
+        get_top_n_indices)
+    n_tail: int
+        maximum number of log-spaced ranks to evaluate beyond the top indices
+
+    Returns
+    -------
+    ranks: np.ndarray
+        ranks (starting at 1) at which the cumulative score is evaluated
+    cum_scores: np.ndarray
+        cumulative sums of the shift scores up to each rank
+    """
+    n = len(shift_scores)
+    k = len(top_indices)
+    ranks = np.arange(1, k + 1)
+    cum_scores = np.cumsum(shift_scores[top_indices])
+    if k >= n:
+        return ranks, cum_scores
+    tail_ranks = np.unique(np.geomspace(k + 1, n, num=n_tail).astype(np.int64))
+    tail_ranks = tail_ranks[tail_ranks > k]
+    # Every rank r is a partition point, so the first r entries are the top r
+    order = np.argpartition(-np.abs(shift_scores), tail_ranks - 1)
+    ranked_scores = shift_scores[order]
+    tail_cum_scores = np.cumsum(ranked_scores)[tail_ranks - 1]
+    # Keep the peaks of the curve that fall between sampled ranks
+    if k > 0:
+        sampled_ranks = np.concatenate([ranks, tail_ranks])
+        sampled_cum_scores = np.concatenate([cum_scores, tail_cum_scores])
+    else:
+        sampled_ranks = np.concatenate([[0], tail_ranks])
+        sampled_cum_scores = np.concatenate([[0], tail_cum_scores])
+    extreme_ranks,extreme_cum_scores = get_cumulative_extremes(ranked_scores,
+                                                               sampled_ranks,
+                                                               sampled_cum_scores)
+    ranks = np.concatenate([ranks, tail_ranks, extreme_ranks])
+    cum_scores = np.concatenate([cum_scores, tail_cum_scores,
+                                 extreme_cum_scores])
+    order = np.argsort(ranks, kind='stable')
+    return ranks[order], cum_scores[order]
+
+def get_cumulative_extremes(ranked_scores, ranks, cum_scores):
+    """
+    Finds the ranks between sampled ranks where the cumulative shift score is
+    higher or lower than at every sampled rank. A gap between sampled ranks is
+    only sorted if the sums of its positive or negative scores could take the
+    curve past the current extreme
+
+    Parameters
+    ----------
+    ranked_scores: np.ndarray
+        shift scores partitioned by absolute score at each of ranks, i.e. the
+        first r scores are the top r scores for every rank r of ranks
+    ranks: np.ndarray
+        increasing sampled ranks, where 0 stands for the start of the curve
+    cum_scores: np.ndarray
+        cumulative scores at ranks
+
+    Returns
+    -------
+    extreme_ranks: np.ndarray
+        at most two ranks, where the curve reaches its maximum and its minimum
+        if they are not sampled
+    extreme_cum_scores: np.ndarray
+        cumulative scores at extreme_ranks
+    """
+    gaps = np.flatnonzero(np.diff(ranks) > 1)
+    extreme_ranks = []
+    extreme_cum_scores = []
+    for sign in [1, -1]:
+        # Sum of the scores of one sign within the gap after each sampled rank
+        sums = np.concatenate([[0], np.cumsum(np.maximum(sign * ranked_scores, 0))])
+        bounds = sign * cum_scores[gaps]\
+                 + sums[ranks[gaps + 1] - 1] - sums[ranks[gaps]]
+        best = np.max(sign * cum_scores)
+        best_rank = None
+        for j in np.argsort(-bounds, kind='stable'):
+            if bounds[j] <= best:
+                break
+            start = ranks[gaps[j]]
+            gap_scores = ranked_scores[start:ranks[gaps[j] + 1] - 1]
+            gap_scores = gap_scores[np.argsort(-np.abs(gap_scores))]
+            gap_cum_scores = cum_scores[gaps[j]] + np.cumsum(gap_scores)
+            i = np.argmax(sign * gap_cum_scores)
+            if sign * gap_cum_scores[i] > best:
+                best = sign * gap_cum_scores[i]
+                best_rank = start + i + 1
+                best_cum_score = gap_cum_scores[i]
+        if best_rank is not None:
+            extreme_ranks.append(best_rank)
+            extreme_cum_scores.append(best_cum_score)
+    return (np.array(extreme_ranks, dtype=np.int64),
+            np.array(extreme_cum_scores, dtype=np.float64))
+
+def get_stop_mask(scores, stop_lens):
+    """
+    Finds the scores that fall within any interval of a stop lens
+
+    Parameters
+    ----------
+    scores: np.ndarray
+        scores of types. NaN scores are never stopped
+    stop_lens: iterable of 2-tuples
+        denotes intervals that should be excluded when calculating shift scores
+
+    Returns
+    -------
+    stopped: np.ndarray
+        boolean mask that is True where a score is within a stop interval
+    """
+    stopped = np.zeros(np.shape(scores), dtype=bool)
+    for lower_stop,upper_stop in stop_lens:
+        stopped |= (scores >= lower_stop) & (scores <= upper_stop)
+    return stopped
 
 # ------------------------------------------------------------------------------
 # -------------------------------- Score Funcs ---------------------------------
 # ------------------------------------------------------------------------------
-def filter_by_scores(type2freq, type2score, stop_lens):
+def filter_by_scores(type2freq, type2score, stop_lens, stop_words=None):
     """
-    Loads a dictionary of type scores
+    Filters a system of types by the scores of its score dict, removing types
+    whose score falls within any interval of the stop lens
 
     Parameters
     ----------
@@ -64,49 +601,184 @@ def filter_by_scores(type2freq, type2score, stop_lens):
         keys are types, values are scores associated with those types
     stop_lens: iteratble of 2-tuples
         denotes intervals that should be excluded when calculating shift scores
+    stop_words: set, optional
+        stopped types of type2score, if already found by get_stop_words
 
     Returns
     -------
     type2freq_new,type2score_new: dict,dict
         Frequency and score dicts filtered of words whose score fall within stop
-        window
+        window. The score dict is a read-only view of type2score, not a copy
+    stop_words: set
+        types of type2score whose score falls within the stop window
     """
+    filtered = split_by_scores(type2freq, type2score, stop_lens, stop_words)
+    return (filtered['type2freq'], filtered['type2score'], filtered['stop_words'])
+
+@instrumented('filter_by_scores')
+def split_by_scores(type2freq, type2score, stop_lens, stop_words=None):
+    """
+    Splits a system of types into the types that are kept and the types that
+    are stopped by the stop lens. A type is stopped if its score falls within
+    any interval of the stop lens, and kept if it is scored and not stopped
+
+    Parameters
+    ----------
+    type2freq: dict
+        keys are types, values are frequencies of those types
+    type2score: dict
+        keys are types, values are scores associated with those types
+    stop_lens: iteratble of 2-tuples
+        denotes intervals that should be excluded when calculating shift scores
+    stop_words: set, optional
+        stopped types of type2score, if already found by get_stop_words
+
+    Returns
+    -------
+    filtered: dict
+        'type2freq' (frequencies of kept types), 'type2score' (read-only view
+        of type2score without the stopped types), 'stop_words' (stopped types
+        of type2score), and 'type2freq_stopped' and 'type2score_stopped'
+        (frequencies and scores of the stopped types observed in the system)
+    """
+    if stop_words is None:
+        stop_words = get_stop_words(type2score, stop_lens)
     type2freq_new = dict()
-    type2score_new = dict()
-    stop_words = set()
-    for lower_stop,upper_stop in stop_lens:
-        for t in type2score:
-            if ((type2score[t] < lower_stop) or (type2score[t] > upper_stop))\
-            and t not in stop_words:
-                try:
-                    type2freq_new[t] = type2freq[t]
-                except KeyError:
-                    pass
-                type2score_new[t] = type2score[t]
-            else:
-                stop_words.add(t)
+    type2freq_stopped = dict()
+    for t,f in type2freq.items():
+        if t in stop_words:
+            type2freq_stopped[t] = f
+        elif t in type2score:
+            type2freq_new[t] = f
+    type2score_stopped = {t : type2score[t] for t in type2freq_stopped}
+    return {'type2freq': type2freq_new,
+            'type2score': StopFilteredScores(type2score, stop_words),
+            'stop_words': stop_words,
+            'type2freq_stopped': type2freq_stopped,
+            'type2score_stopped': type2score_stopped}
+
+def get_stop_words(type2score, stop_lens):
+    """
+    Finds the types of a score dict whose score falls within any interval of
+    the stop lens, evaluating all intervals over the array of scores at once
+
+    Parameters
+    ----------
+    type2score: dict
+        keys are types, values are scores associated with those types
+    stop_lens: iteratble of 2-tuples
+        denotes intervals that should be excluded when calculating shift scores
 
-    return (type2freq_new, type2score_new, stop_words)
+    Returns
+    -------
+    stop_words: set
+        types whose score falls within the stop window
+    """
+    types = list(type2score.keys())
+    scores = np.fromiter(type2score.values(), dtype=float, count=len(types))
+    stopped = get_stop_mask(scores, stop_lens)
+    return {types[i] for i in np.flatnonzero(stopped)}
 
-def get_score_dictionary(scores, encoding='utf-8'):
+class StopFilteredScores(collections.abc.Mapping):
+    """
+    Read-only view of a score dict without its stopped types, so that filtering
+    a system does not copy the full lexicon
+    """
+    __slots__ = ('type2score', 'stop_words')
+
+    def __init__(self, type2score, stop_words):
+        self.type2score = type2score
+        self.stop_words = stop_words
+
+    def __getitem__(self, t):
+        if t in self.stop_words:
+            raise KeyError(t)
+        return self.type2score[t]
+
+    def __contains__(self, t):
+        return t not in self.stop_words and t in self.type2score
+
+    def __iter__(self):
+        return (t for t in self.type2score if t not in self.stop_words)
+
+    def __len__(self):
+        return len(self.type2score) - len(self.stop_words)
+
+    def items(self):
+        return ((t,s) for t,s in self.type2score.items()
+                if t not in self.stop_words)
+
+    def copy(self):
+        return dict(self.items())
+
+@instrumented('get_score_dictionary')
+def get_score_dictionary(scores, encoding='utf-8', vocabulary=None):
     """
     Loads a dictionary of type scores
 
     Parameters
     ----------
-    scores: dict or str
-        if dict, then returns the dict automatically. If str, then it is either
-        the name of a lexicon included in Shifterator
+    scores: dict, str, pandas.Series or tuple
+        if dict, then returns a copy of the dict. If str, then it is either
+        the name of a lexicon included in Shifterator. If a Series or a
+        (types, scores) pair of aligned arrays, returns a read-only view of the
+        scores, see get_type_mapping
+    encoding: str
+        encoding of the lexicon file
+    vocabulary: iterable, optional
+        if not None, only the scores of these types are loaded, e.g. the
+        observed types of both systems. See load_vocabulary_scores
 
     Returns
     -------
     type2score, dict
-        dictionary where keys are types and values are scores of those types
+        dictionary where keys are types and values are scores of those types.
+        Lexicons included in Shifterator are shared through a process-wide
+        cache and returned as read-only views
     """
-    if isinstance(scores, collections.Mapping):
+    if vocabulary is not None:
+        if isinstance(scores, str):
+            return load_vocabulary_scores(scores, vocabulary, encoding)
+        scores = get_type_mapping(scores)
+        return {t : scores[t] for t in vocabulary if t in scores}
+    if isinstance(scores, str):
+        # Load scores from predefined score file in shifterator
+        return lexicon_cache.get((scores, encoding),
+                                 lambda: load_score_dictionary(scores, encoding))
+    if isinstance(scores, collections.abc.MutableMapping):
+        # Copy dicts so later changes to them do not change the shift
         return scores.copy()
+    # Read-only mappings, Series and array pairs are used without a copy
+    return get_type_mapping(scores)
 
-    # Else, load scores from predefined score file in shifterator
+def load_score_dictionary(scores, encoding='utf-8', compiled=True):
+    """
+    Reads and parses a lexicon included in Shifterator, bypassing the cache
+
+    Parameters
+    ----------
+    scores: str
+        the name of a lexicon included in Shifterator
+    encoding: str
+        encoding of the lexicon file
+    compiled: bool
+        if True and the lexicon has been compiled with the same encoding (see
+        compiled_lexicon.py), decodes the compiled lexicon instead of parsing
+        the TSV file. Compiled lexicons that are out of date with their TSV
+        file are not used
+
+    Returns
+    -------
+    type2score, dict
+        dictionary where keys are types and values are scores of those types
+    """
+    if compiled:
+        lexicon = load_compiled_lexicon(scores, encoding=encoding)
+        if lexicon is not None:
+            # Scores are read without parsing, and lookups while scoring stay
+            # plain dict lookups
+            with lexicon:
+                return lexicon.copy()
     try:
         lexicon = scores.split('_')[0]
         score_f = 'lexicons/{}/{}.tsv'.format(lexicon, scores)
@@ -125,10 +797,66 @@ def get_score_dictionary(scores, encoding='utf-8'):
 
     return type2score
 
+def load_vocabulary_scores(scores, vocabulary, encoding='utf-8'):
+    """
+    Loads only the scores of the given types from a lexicon included in
+    Shifterator, so that memory scales with the vocabulary of a corpus rather
+    than the size of the lexicon. Restricted lexicons are not cached
+
+    A cached lexicon is filtered in memory. The vocabulary is looked up in a
+    compiled lexicon with one vectorized binary search over its sorted type
+    table, without parsing any scores. Otherwise the TSV file is read as a package resource,
+    as in load_score_dictionary, and decoded line by line, only parsing the
+    scores of matching types
+
+    Parameters
+    ----------
+    scores: str
+        the name of a lexicon included in Shifterator
+    vocabulary: iterable
+        the types to load scores for
+    encoding: str
+        encoding of the lexicon file
+
+    Returns
+    -------
+    type2score: dict
+        keys are the types of the vocabulary that are in the lexicon and values
+        are their scores
+    """
+    if (scores, encoding) in lexicon_cache:
+        type2score = get_score_dictionary(scores, encoding)
+        return {t : type2score[t] for t in vocabulary if t in type2score}
+    lexicon = load_compiled_lexicon(scores, encoding=encoding)
+    if lexicon is not None:
+        try:
+            return lexicon.get_vocabulary_scores(vocabulary)
+        finally:
+            lexicon.close()
+    if not isinstance(vocabulary, (set, frozenset, dict)):
+        vocabulary = set(vocabulary)
+    try:
+        lexicon = scores.split('_')[0]
+        score_f = 'lexicons/{}/{}.tsv'.format(lexicon, scores)
+        all_scores = pkgutil.get_data(__name__, score_f)
+    except FileNotFoundError:
+        raise FileNotFoundError('Lexicon does not exit in Shifterator: {}'.format(scores))
+    # Decode the lines one at a time, so the whole lexicon is never held as
+    # str or dict
+    type2score = dict()
+    with io.TextIOWrapper(io.BytesIO(all_scores), encoding=encoding) as f:
+        for t_s in f:
+            t,_,s = t_s.partition('\t')
+            if t in vocabulary:
+                type2score[t] = float(s)
+    return type2score
+
+@instrumented('get_missing_scores')
 def get_missing_scores(type2score_1, type2score_2):
     """
     Get missing scores between systems by setting the score in one system with
-    the score in the other system
+    the score in the other system. The input dicts are not modified, missing
+    scores are layered on top of them so that read-only lexicons can be shared
 
     Parameters
     ----------
@@ -141,20 +869,101 @@ def get_missing_scores(type2score_1, type2score_2):
         keys are types and values are scores, updated to have scores across all
         types between the two score dictionaries
     """
-    missing_types = set()
-    types = set(type2score_1.keys()).union(set(type2score_2.keys()))
-    for t in types:
-        if t not in type2score_1:
-            type2score_1[t] = type2score_2[t]
-            missing_types.add(t)
-        elif t not in type2score_2:
-            type2score_2[t] = type2score_1[t]
-            missing_types.add(t)
+    if type2score_1 is type2score_2:
+        return (type2score_1, type2score_2, set())
+    # Only look up the scores of missing types
+    types_1 = get_type_keys(type2score_1)
+    types_2 = get_type_keys(type2score_2)
+    missing_1 = {t:type2score_2[t] for t in types_2 if t not in types_1}
+    missing_2 = {t:type2score_1[t] for t in types_1 if t not in types_2}
+    missing_types = set(missing_1).union(missing_2)
+    if len(missing_1) > 0:
+        type2score_1 = collections.ChainMap(missing_1, type2score_1)
+    if len(missing_2) > 0:
+        type2score_2 = collections.ChainMap(missing_2, type2score_2)
     return (type2score_1, type2score_2, missing_types)
 
+def get_scored_vocabulary(types, type2score_1, type2score_2, stop_lens=None):
+    """
+    Finds the observed types that are scored by either score dict and not
+    stopped, along with their aligned scores
+
+    Parameters
+    ----------
+    types: iterable
+        the observed types of all systems
+    type2score_1, type2score_2: dict or None
+        keys are types and values are scores. If both are None, all types have
+        a uniform score of 1
+    stop_lens: iterable of 2-tuples, optional
+        denotes intervals that should be excluded when calculating shift
+        scores. Types whose score falls in any interval under either score
+        dict are excluded
+
+    Returns
+    -------
+    types: list
+        the scored vocabulary
+    score_1, score_2: np.ndarray
+        scores of the types under each score dict. Types missing from one
+        score dict borrow the score of the other
+    """
+    if type2score_1 is None and type2score_2 is None:
+        types = list(types)
+        score_1 = np.ones(len(types))
+        return types,score_1,score_1
+    type2score_1,type2score_2,_ = get_missing_scores(type2score_1, type2score_2)
+    types = [t for t in types if t in type2score_1]
+    type2index = get_type_index(types)
+    score_1 = get_aligned_array(type2score_1, type2index)
+    if type2score_2 is type2score_1:
+        score_2 = score_1
+    else:
+        score_2 = get_aligned_array(type2score_2, type2index)
+    # Filter types by stop lens
+    if stop_lens is not None:
+        stopped = get_stop_mask(score_1, stop_lens)\
+                  | get_stop_mask(score_2, stop_lens)
+        types = [t for t,s in zip(types, stopped) if not s]
+        if score_2 is score_1:
+            score_1 = score_2 = score_1[~stopped]
+        else:
+            score_1 = score_1[~stopped]
+            score_2 = score_2[~stopped]
+    return types,score_1,score_2
+
 # ------------------------------------------------------------------------------
 # -------------------------------- Entropy Funcs -------------------------------
 # ------------------------------------------------------------------------------
+def get_log_array(probs, base=2, force_zero=False):
+    """
+    Calculates the logarithm of an array of probabilities with a masked log,
+    i.e. without evaluating the log of zeros
+
+    Parameters
+    ----------
+    probs: np.ndarray
+        relative frequencies
+    base: int
+        the base of the logarithm
+    force_zero: boolean
+        if True, zero probabilities have a log of 0, see get_type_logs.
+        Otherwise zero probabilities raise a ValueError
+
+    Returns
+    -------
+    logs: np.ndarray
+        log(p_i) of each probability
+    """
+    nonzero = probs > 0
+    if not force_zero and not nonzero.all():
+        raise ValueError('math domain error: log of a zero probability')
+    logs = np.log(probs, out=np.zeros_like(probs, dtype=np.float64),
+                  where=nonzero)
+    if base != np.e:
+        logs /= np.log(base)
+    return logs
+
 def get_type_surprisals(type2p, base=2, alpha=1):
     """
     Calculates the surprisal of each type in a system, i.e. log(1/p_i). Does not
@@ -168,9 +977,14 @@ def get_type_surprisals(type2p, base=2, alpha=1):
         the base of the logarithm
     alpha: float
         currently not implemented, but left for later updates
+
+    Returns
+    -------
+    type2surprise: TypeArrayView
+        dict view where keys are types and values are surprisals
     """
-    type2surprise = {t : -1*log(p, base) for t,p in type2p.items()}
-    return type2surprise
+    type2index,probs = get_index_array(type2p)
+    return TypeArrayView(type2index, -get_log_array(probs, base))
 
 def get_type_logs(type2p, base=2, alpha=1, force_zero=False):
     """
@@ -190,17 +1004,14 @@ def get_type_logs(type2p, base=2, alpha=1, force_zero=False):
         the JSD, where even though we calculate log(p) here individually, it is
         recombined with other scores to get p * log(p), which should be 0 if
         both p and log(p) are zero.
+
+    Returns
+    -------
+    type2log: TypeArrayView
+        dict view where keys are types and values are logs
     """
-    type2log = dict()
-    for t,p in type2p.items():
-        try:
-            type2log[t] = log(p, base)
-        except ValueError:
-            if force_zero:
-                type2log[t] = 0
-            else:
-                raise
-    return type2log
+    type2index,probs = get_index_array(type2p)
+    return TypeArrayView(type2index, get_log_array(probs, base, force_zero))
 
 def get_surprisal_scores(system_1, system_2, base=2, alpha=1):
     """
@@ -215,6 +1026,12 @@ def get_surprisal_scores(system_1, system_2, base=2, alpha=1):
         the base for the logarithm when computing entropy for the JSD
     alpha: float
         currently not implemented, but left for later updates
+
+    Returns
+    -------
+    type2p_1, type2p_2, type2surprisal_1, type2surprisal_2: TypeArrayView
+        dict views of the relative frequencies and surprisals of the types of
+        each system
     """
     # Normalize reference and comparison frequencies
     type2p_1 = get_relative_freqs(system_1)
@@ -241,21 +1058,64 @@ def get_jsd_scores(type2freq_1, type2freq_2, base=2, alpha=1, weight_1=0.5,
         distribution. Should sum to 1
     alpha: float
         currently not implemented, but left for later updates
+
+    Returns
+    -------
+    type2p, type2q: TypeArrayView
+        dict views of the relative frequencies of the types of each system
+    type2m, type2score_1, type2score_2: TypeArrayView
+        dict views over the types of both systems of the mixed distribution and
+        of the scores of each system. All views share their arrays' index
     """
-    # Normalize reference and comparison frequencies
-    type2p = get_relative_freqs(type2freq_1)
-    type2q = get_relative_freqs(type2freq_2)
+    # Align reference and comparison frequencies to the types of both systems
+    type2index,type2index_1,type2index_2,p,q = get_aligned_probs(get_type_mapping(type2freq_1),
+                                                                 get_type_mapping(type2freq_2))
     # Get mixed distribution
-    type2m = get_mixed_distribution(type2p, type2q, p=weight_1, q=weight_2)
+    m = weight_1 * p + weight_2 * q
     # Get surprisal of each type
     # Forcing zero should be OK, by formula anything that has a 0 should be 0
     #   in the end when multiplied against its 0 frequency, i.e. 0 * log 0 = 0
-    type2log_p = get_type_logs(type2p, base=base, alpha=alpha, force_zero=True)
-    type2log_q = get_type_logs(type2q, base=base, alpha=alpha, force_zero=True)
-    type2log_m = get_type_logs(type2m, base=base, alpha=alpha)
+    log_p = get_log_array(p, base, force_zero=True)
+    log_q = get_log_array(q, base, force_zero=True)
+    log_m = get_log_array(m, base)
     # Get scores (handle missing types)
-    type2score_1 = {t : 0.5*(type2log_m[t] - type2log_p[t])
-                    if t in type2log_p else 0 for t in type2log_m}
-    type2score_2 = {t : 0.5*(type2log_q[t] - type2log_m[t])
-                    if t in type2log_q else 0 for t in type2log_m}
-    return type2p,type2q,type2m,type2score_1,type2score_2
+    in_1 = np.zeros(len(type2index), dtype=bool)
+    in_1[:len(type2index_1)] = True
+    in_2 = np.zeros(len(type2index), dtype=bool)
+    in_2[np.fromiter(type2index_2.values(), dtype=np.int64,
+                     count=len(type2index_2))] = True
+    score_1 = np.where(in_1, 0.5 * (log_m - log_p), 0)
+    score_2 = np.where(in_2, 0.5 * (log_q - log_m), 0)
+    return (TypeArrayView(type2index_1, p), TypeArrayView(type2index_2, q),
+            TypeArrayView(type2index, m), TypeArrayView(type2index, score_1),
+            TypeArrayView(type2index, score_2))
+
+def get_column_jsds(freq_1, freq_2, base=2, weight_1=0.5, weight_2=0.5):
+    """
+    Calculates the JSD between each pair of aligned columns of two frequency
+    matrices, following the per-type scores of get_jsd_scores
+
+    Parameters
+    ----------
+    freq_1, freq_2: np.ndarray
+        (types x pairs) frequencies, where column j of freq_1 is compared to
+        column j of freq_2
+    base: int
+        the base for the logarithm when computing entropy for the JSD
+    weight_1, weight_2: float
+        relative weights of freq_1 and freq_2 when constructing their mixed
+        distributions. Should sum to 1
+
+    Returns
+    -------
+    jsd: np.ndarray
+        the JSD of each pair of columns
+    """
+    p = freq_1 / freq_1.sum(axis=0)
+    q = freq_2 / freq_2.sum(axis=0)
+    m = weight_1 * p + weight_2 * q
+    # Types missing from a system contribute 0 * log 0 = 0
+    log_m = get_log_array(m, base, force_zero=True)
+    p_log_p = p * get_log_array(p, base, force_zero=True)
+    q_log_q = q * get_log_array(q, base, force_zero=True)
+    return 0.5 * np.sum(p_log_p + q_log_q - (p + q) * log_m, axis=0)
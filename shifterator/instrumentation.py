@@ -0,0 +1,184 @@
+"""
+instrumentation.py
+
+Opt-in timing and memory instrumentation of the stages of a shift, such as
+loading lexicons, filtering, scoring and rendering. Stages are only measured
+while a StageRecorder is active, otherwise they run without overhead beyond a
+check for active recorders
+
+Active recorders are held in a context variable, so a recorder only sees the
+stages of the thread, or asyncio task, that started it
+"""
+import time
+import logging
+import functools
+import contextlib
+import contextvars
+import tracemalloc
+
+# Recorders that stages of the current context are reported to, as a tuple so
+# that contexts copied from this one never share a list with it
+_active_recorders = contextvars.ContextVar('shifterator_active_recorders',
+                                           default=())
+
+# ------------------------------------------------------------------------------
+# --------------------------------- Recorders ----------------------------------
+# ------------------------------------------------------------------------------
+class StageRecorder:
+    def __init__(self, callback=None, trace_memory=False):
+        """
+        Records the wall time, call count and allocated bytes of each stage
+        run while the recorder is active. Use as a context manager, or call
+        start and stop
+
+        A recorder is active in the thread or asyncio task that started it, and
+        in the tasks it creates afterwards. Stages run by other threads are not
+        recorded, so concurrent threads can each record their own stages
+
+        Stage times are inclusive, e.g. the time of get_shift_component_sums
+        includes the time of get_shift_scores if the scores are calculated
+        within it
+
+        Parameters
+        ----------
+        callback: callable, optional
+            called as callback(stage, seconds, allocated_bytes) after each
+            stage, e.g. the callback of get_logging_callback
+        trace_memory: bool
+            if True, traces memory allocations with tracemalloc while the
+            recorder is active and records the net bytes allocated by each
+            stage. Tracing slows down allocation heavy stages
+        """
+        self.callback = callback
+        self.trace_memory = trace_memory
+        self.stages = dict()
+        self._started_tracing = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        """
+        Starts reporting stages to the recorder
+        """
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        _active_recorders.set(_active_recorders.get() + (self,))
+
+    def stop(self):
+        """
+        Stops reporting stages to the recorder
+        """
+        recorders = _active_recorders.get()
+        if self in recorders:
+            _active_recorders.set(tuple(r for r in recorders if r is not self))
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def record(self, stage, seconds, allocated_bytes=0):
+        """
+        Adds one run of a stage to the recorded stats
+
+        Parameters
+        ----------
+        stage: str
+            name of the stage
+        seconds: float
+            wall time of the run
+        allocated_bytes: int
+            net bytes allocated by the run, 0 if memory is not traced
+        """
+        stats = self.stages.setdefault(stage, {'calls': 0, 'seconds': 0.0,
+                                               'allocated_bytes': 0})
+        stats['calls'] += 1
+        stats['seconds'] += seconds
+        stats['allocated_bytes'] += allocated_bytes
+        if self.callback is not None:
+            self.callback(stage, seconds, allocated_bytes)
+
+    def get_stats(self):
+        """
+        Returns
+        -------
+        stats: dict
+            keys are stages and values are dicts of their total 'calls',
+            'seconds' and 'allocated_bytes'
+        """
+        return {stage : dict(stats) for stage,stats in self.stages.items()}
+
+    def reset(self):
+        """
+        Clears the recorded stats
+        """
+        self.stages = dict()
+
+def get_logging_callback(logger=None, level=logging.DEBUG):
+    """
+    Returns a StageRecorder callback that logs each stage
+
+    Parameters
+    ----------
+    logger: logging.Logger, optional
+        the logger to log to. Defaults to the logger of this module
+    level: int
+        the level to log stages at
+    """
+    if logger is None:
+        logger = logging.getLogger(__name__)
+    def log_stage(stage, seconds, allocated_bytes):
+        logger.log(level, 'shifterator stage %s: %.6f s, %d bytes', stage,
+                   seconds, allocated_bytes)
+    return log_stage
+
+# ------------------------------------------------------------------------------
+# ---------------------------------- Stages ------------------------------------
+# ------------------------------------------------------------------------------
+@contextlib.contextmanager
+def record_stage(stage):
+    """
+    Measures the code run within the context as one run of a stage, and
+    reports it to the active recorders
+
+    Parameters
+    ----------
+    stage: str
+        name of the stage
+    """
+    recorders = _active_recorders.get()
+    if len(recorders) == 0:
+        yield
+        return
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        memory_start = tracemalloc.get_traced_memory()[0]
+    time_start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - time_start
+        if tracing and tracemalloc.is_tracing():
+            allocated_bytes = tracemalloc.get_traced_memory()[0] - memory_start
+        else:
+            allocated_bytes = 0
+        for recorder in recorders:
+            recorder.record(stage, seconds, allocated_bytes)
+
+def instrumented(stage):
+    """
+    Decorates a function so that each call is recorded as a run of a stage
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if len(_active_recorders.get()) == 0:
+                return func(*args, **kwargs)
+            with record_stage(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
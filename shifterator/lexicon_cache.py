@@ -0,0 +1,155 @@
+"""
+lexicon_cache.py
+
+Process-wide, bounded LRU cache of the lexicons that are loaded by
+helper.get_score_dictionary, so that repeated shift constructions do not
+re-read and re-parse the same lexicon files
+"""
+import sys
+import threading
+from collections import OrderedDict
+from types import MappingProxyType
+
+# ------------------------------------------------------------------------------
+# ------------------------------- Lexicon Cache --------------------------------
+# ------------------------------------------------------------------------------
+class LexiconCache:
+    def __init__(self, max_entries=32, max_bytes=None):
+        """
+        Thread-safe least recently used cache of parsed lexicons. Cached
+        lexicons are handed out as read-only views, so callers cannot corrupt
+        the cached copy
+
+        Parameters
+        ----------
+        max_entries: int, optional
+            maximum number of lexicons to hold. If None, the number of lexicons
+            is unbounded
+        max_bytes: int, optional
+            maximum estimated memory held by cached lexicons, in bytes. If None,
+            memory is unbounded. A lexicon larger than max_bytes is returned but
+            not cached
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.nbytes = 0
+
+    def get(self, key, load_lexicon):
+        """
+        Returns the cached lexicon for key, loading and caching it on a miss
+
+        Parameters
+        ----------
+        key: hashable
+            identifies the lexicon, e.g. its name and encoding
+        load_lexicon: callable
+            called with no arguments on a miss. Returns a dict where keys are
+            types and values are scores of those types
+
+        Returns
+        -------
+        type2score: Mapping
+            read-only view of the cached lexicon
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+        # Load outside of the lock so cache hits are not blocked by file reads
+        type2score = load_lexicon()
+        nbytes = get_lexicon_nbytes(type2score)
+        if isinstance(type2score, dict):
+            type2score = MappingProxyType(type2score)
+        with self._lock:
+            # Another thread may have loaded the same lexicon in the meantime
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key][0]
+            if self.max_bytes is not None and nbytes > self.max_bytes:
+                return type2score
+            self._entries[key] = (type2score, nbytes)
+            self.nbytes += nbytes
+            self._evict()
+        return type2score
+
+    def _evict(self):
+        """
+        Drops least recently used lexicons until the cache is within its bounds
+        """
+        while self._entries and (
+            (self.max_entries is not None and len(self._entries) > self.max_entries)
+            or (self.max_bytes is not None and self.nbytes > self.max_bytes)
+        ):
+            _,(_,nbytes) = self._entries.popitem(last=False)
+            self.nbytes -= nbytes
+            self.evictions += 1
+
+    def set_limits(self, max_entries=None, max_bytes=None):
+        """
+        Changes the bounds of the cache, evicting lexicons if necessary
+        """
+        with self._lock:
+            self.max_entries = max_entries
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        """
+        Drops all cached lexicons and resets the cache statistics
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.nbytes = 0
+
+    def stats(self):
+        """
+        Returns
+        -------
+        stats: dict
+            hits, misses, evictions, number of cached lexicons, estimated bytes
+            held, and the bounds of the cache
+        """
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'evictions': self.evictions, 'entries': len(self._entries),
+                    'bytes': self.nbytes, 'max_entries': self.max_entries,
+                    'max_bytes': self.max_bytes}
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+def get_lexicon_nbytes(type2score):
+    """
+    Estimates the memory held by a lexicon, in bytes
+
+    Parameters
+    ----------
+    type2score: Mapping
+        keys are types and values are scores. If it has an nbytes attribute,
+        that is used as the estimate
+    """
+    nbytes = getattr(type2score, 'nbytes', None)
+    if nbytes is not None:
+        return nbytes
+    nbytes = sys.getsizeof(type2score)
+    for t,s in type2score.items():
+        nbytes += sys.getsizeof(t) + sys.getsizeof(s)
+    return nbytes
+
+# Cache shared by every shift in the process
+lexicon_cache = LexiconCache()
@@ -0,0 +1,202 @@
+"""
+matrix_shift.py
+
+Shifts between groups of documents of a document-term matrix, e.g. a scipy CSR
+matrix, computed on the summed count vectors of the groups instead of type2freq
+dicts
+"""
+import collections.abc
+import numpy as np
+
+import shifterator.shifterator as shifterator
+from .helper import *
+from .pairwise_shift import get_count_jsd_matrix
+
+# ------------------------------------------------------------------------------
+# ----------------------------- Group shift classes ----------------------------
+# ------------------------------------------------------------------------------
+class GroupShift:
+    def __init__(self, matrix, vocabulary, labels=None, rows=None,
+                 type2score_1=None, type2score_2=None, reference_value=None,
+                 stop_lens=None, encoding='utf-8'):
+        """
+        Shift object for calculating the shifts between every pair of groups of
+        documents. Rows of each group are summed into count vectors once, and
+        all pairs are scored with vectorized arithmetic over the vectors
+
+        Parameters
+        ----------
+        matrix: scipy.sparse matrix or np.ndarray
+            (documents x types) counts, e.g. a CSR document-term matrix
+        vocabulary: list or np.ndarray
+            the type of each column of matrix
+        labels: list or np.ndarray, optional
+            the group label of each row of matrix. Groups are named by their
+            sorted labels. Either labels or rows must be given
+        rows: dict or list, optional
+            if dict, keys are names of groups and values are boolean row masks
+            or arrays of row positions. If list, groups of rows named by their
+            position
+        type2score_1, type2score_2: dict or str, optional
+            if dict, types are keys and values are "scores" associated with each
+            type (e.g., sentiment). If str, the name of a score dict. If None
+            and other type2score is None, defaults to uniform scores across
+            types. Otherwise defaults to the other type2score dict.
+            type2score_1 scores the first group of each pair and type2score_2
+            the second
+        reference_value: float, optional
+            the reference score from which to calculate the deviation. If None,
+            defaults to the weighted score of the first group of each pair
+        stop_lens: iterable of 2-tuples, optional
+            denotes intervals that should be excluded when calculating shift
+            scores. Types whose score falls in any interval under either score
+            dict are excluded from all groups
+        encoding: str, optional
+            encoding for reading in a lexicon included in Shifterator
+        """
+        if (labels is None) == (rows is None):
+            raise ValueError('Exactly one of labels and rows must be given')
+        if labels is not None:
+            labels = np.asarray(labels)
+            self.names = np.unique(labels).tolist()
+            row_groups = [labels == name for name in self.names]
+        elif isinstance(rows, collections.abc.Mapping):
+            self.names = list(rows.keys())
+            row_groups = list(rows.values())
+        else:
+            row_groups = list(rows)
+            self.names = list(range(len(row_groups)))
+        # Only load the scores of types observed in the matrix
+        observed = np.flatnonzero(np.asarray(matrix.sum(axis=0)).ravel())
+        vocabulary = np.asarray(vocabulary, dtype=object)
+        observed_types = set(vocabulary[observed])
+        # Set type2score dictionaries
+        if type2score_1 is None and type2score_2 is None:
+            self.type2score_1 = None
+            self.type2score_2 = None
+        elif type2score_2 is None:
+            self.type2score_1 = get_score_dictionary(type2score_1, encoding,
+                                                     observed_types)
+            self.type2score_2 = self.type2score_1
+        elif type2score_1 is None:
+            self.type2score_2 = get_score_dictionary(type2score_2, encoding,
+                                                     observed_types)
+            self.type2score_1 = self.type2score_2
+        else:
+            self.type2score_1 = get_score_dictionary(type2score_1, encoding,
+                                                     observed_types)
+            self.type2score_2 = get_score_dictionary(type2score_2, encoding,
+                                                     observed_types)
+        self.reference_value = reference_value
+        self.stop_lens = stop_lens
+
+        # Only keep columns observed in the matrix and scored
+        types,self.score_1,self.score_2 = get_scored_vocabulary(vocabulary[observed],
+                                                                self.type2score_1,
+                                                                self.type2score_2,
+                                                                stop_lens)
+        column_index = get_type_index(vocabulary[observed])
+        columns = observed[[column_index[t] for t in types]]
+        self.types = types
+        self.type2index = get_type_index(types)
+        self.counts = get_group_counts(matrix, row_groups, columns)
+
+    def get_shift(self, group_1, group_2, shift_class=None, **kwargs):
+        """
+        Builds a shift object between two groups from their count vectors
+
+        Parameters
+        ----------
+        group_1, group_2:
+            names of the groups
+        shift_class: class, optional
+            the class of shift to build, e.g. JSDivergenceShift. Defaults to
+            Shift with the score dicts of the group shift
+        kwargs:
+            passed to the shift constructor
+
+        Returns
+        -------
+        shift: Shift
+        """
+        i = self.names.index(group_1)
+        j = self.names.index(group_2)
+        system_1 = get_count_dict(self.types, self.counts[:,i])
+        system_2 = get_count_dict(self.types, self.counts[:,j])
+        if shift_class is None:
+            kwargs.setdefault('type2score_1', self.type2score_1)
+            kwargs.setdefault('type2score_2', self.type2score_2)
+            kwargs.setdefault('reference_value', self.reference_value)
+            kwargs.setdefault('stop_lens', self.stop_lens)
+            shift_class = shifterator.Shift
+        return shift_class(system_1, system_2, **kwargs)
+
+    def get_pair_table(self, chunk_size=64):
+        """
+        Calculates the total shift and sums of each type of contribution for
+        every ordered pair of groups
+
+        Parameters
+        ----------
+        chunk_size: int
+            number of second groups scored at once, which bounds the memory of
+            intermediate arrays
+
+        Returns
+        -------
+        pair_table: dict
+            keys are 'name', 'diff' (total shift), 'weighted_score' (of each
+            group under type2score_2) and the contribution sums 'pos_s_pos_p',
+            'pos_s_neg_p', 'neg_s_pos_p', 'neg_s_neg_p', 'pos_s' and 'neg_s'.
+            Values are (groups x groups) arrays where [i,j] is the shift from
+            group i to group j, except for 'name' and 'weighted_score', which
+            have one entry per group
+        """
+        n = len(self.names)
+        columns = ['diff', 'pos_s_pos_p', 'pos_s_neg_p', 'neg_s_pos_p',
+                   'neg_s_neg_p', 'pos_s', 'neg_s']
+        pair_table = {c : np.zeros((n, n)) for c in columns}
+        totals = self.counts.sum(axis=0)
+        weighted_1 = np.dot(self.score_1, self.counts) / totals
+        for i in range(n):
+            freq_1 = self.counts[:,i:i+1]
+            if self.reference_value is not None:
+                reference_value = self.reference_value
+            else:
+                reference_value = weighted_1[i]
+            for start in range(0, n, chunk_size):
+                stop = min(start + chunk_size, n)
+                components = get_shift_component_arrays(freq_1,
+                                                        self.counts[:,start:stop],
+                                                        self.score_1,
+                                                        self.score_2,
+                                                        reference_value)
+                p_diff,s_diff,p_avg,s_ref_diff,shift_score = components
+                pair_table['diff'][i,start:stop] = shift_score.sum(axis=0)
+                comp_sums = get_component_sums(p_diff, s_diff, p_avg, s_ref_diff)
+                for comp,comp_sum in comp_sums.items():
+                    pair_table[comp][i,start:stop] = comp_sum
+        pair_table['weighted_score'] = np.dot(self.score_2, self.counts) / totals
+        pair_table['name'] = np.array(self.names, dtype=object)
+        return pair_table
+
+    def get_jsd_matrix(self, **kwargs):
+        """
+        Calculates the Jensen-Shannon divergence between every pair of groups,
+        over the types of the group shift
+
+        Parameters
+        ----------
+        kwargs:
+            base, weight_1, weight_2, top_n, chunk_size and n_jobs, see
+            pairwise_shift.get_jsd_matrix
+
+        Returns
+        -------
+        jsd: np.ndarray
+            (groups x groups) matrix of JSDs
+        pair2top_types: dict
+            only returned if top_n is given, see pairwise_shift.get_jsd_matrix
+        """
+        return get_count_jsd_matrix(self.counts, self.types, self.names,
+                                    **kwargs)
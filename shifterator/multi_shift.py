@@ -0,0 +1,198 @@
+"""
+multi_shift.py
+
+Shifts between one pair of systems under many lexicons at once, e.g. every
+NRC-emotion category, computed over a shared (types x lexicons) score matrix
+"""
+import collections.abc
+import numpy as np
+
+import shifterator.shifterator as shifterator
+from .helper import *
+
+# ------------------------------------------------------------------------------
+# ----------------------------- Multi shift classes ----------------------------
+# ------------------------------------------------------------------------------
+class MultiShift:
+    def __init__(self, system_1, system_2, lexicons, reference_value=None,
+                 stop_lens=None, encoding='utf-8'):
+        """
+        Shift object for calculating the shifts between two systems under each
+        of several lexicons. Both systems are aligned once against a (types x
+        lexicons) score matrix, and every lexicon is then scored with
+        vectorized arithmetic over its columns
+
+        Each lexicon is treated as in a Shift where it scores both systems:
+        relative frequencies, weighted scores and shift scores only consider
+        the types scored by the lexicon
+
+        Parameters
+        ----------
+        system_1, system_2: dict
+            keys are types of a system and values are frequencies of those
+            types. May also be pandas Series or (types, freqs) pairs of arrays,
+            see helper.get_type_mapping
+        lexicons: dict or list
+            if dict, keys are names of lexicons and values are their type2score
+            dicts or the names of lexicons included in Shifterator. If list,
+            the names of included lexicons or type2score dicts, which are then
+            named by their position
+        reference_value: float, dict or list, optional
+            the reference score from which to calculate the deviation, either
+            one value for all lexicons or one per lexicon. If None, defaults to
+            the weighted score of system_1 under each lexicon
+        stop_lens: iterable of 2-tuples, optional
+            denotes intervals that should be excluded when calculating shift
+            scores. Types are only excluded under the lexicons that score them
+            within a stop lens
+        encoding: str, optional
+            encoding for reading in a lexicon included in Shifterator
+        """
+        if isinstance(lexicons, collections.abc.Mapping):
+            self.names = list(lexicons.keys())
+            lexicons = list(lexicons.values())
+        else:
+            lexicons = list(lexicons)
+            self.names = [l if isinstance(l, str) else i
+                          for i,l in enumerate(lexicons)]
+        self.type2freq_1 = get_type_mapping(system_1)
+        self.type2freq_2 = get_type_mapping(system_2)
+        self.stop_lens = stop_lens
+        # Only load the scores of observed types
+        observed = list(self.type2freq_1.keys())
+        observed += [t for t in self.type2freq_2 if t not in self.type2freq_1]
+        self.type2scores = [get_score_dictionary(l, encoding, observed)
+                            for l in lexicons]
+
+        # Align both systems and all lexicons to the types scored by any lexicon
+        self.types = [t for t in observed
+                      if any(t in type2score for type2score in self.type2scores)]
+        self.type2index = get_type_index(self.types)
+        self.freq_1 = get_aligned_array(self.type2freq_1, self.type2index, fill=0)
+        self.freq_2 = get_aligned_array(self.type2freq_2, self.type2index, fill=0)
+        self.scores = np.empty((len(self.types), len(self.names)))
+        for j,type2score in enumerate(self.type2scores):
+            self.scores[:,j] = get_aligned_array(type2score, self.type2index,
+                                                 fill=np.nan)
+        # Mask the types each lexicon does not score or stops
+        self.scored = ~np.isnan(self.scores)
+        if stop_lens is not None:
+            self.scored &= ~get_stop_mask(self.scores, stop_lens)
+        self.scores[~self.scored] = 0
+
+        # Set reference values
+        self.totals_1 = np.dot(self.freq_1, self.scored)
+        self.totals_2 = np.dot(self.freq_2, self.scored)
+        self.weighted_1 = np.dot(self.freq_1, self.scores) / self.totals_1
+        self.weighted_2 = np.dot(self.freq_2, self.scores) / self.totals_2
+        if reference_value is None:
+            self.reference_value = self.weighted_1.copy()
+        elif isinstance(reference_value, collections.abc.Mapping):
+            self.reference_value = np.array([reference_value[n]
+                                             for n in self.names], dtype=float)
+        else:
+            self.reference_value = np.broadcast_to(np.asarray(reference_value,
+                                                              dtype=float),
+                                                   (len(self.names),)).copy()
+        self.shift_arrays = None
+        self.result_table = None
+
+    def get_shift_arrays(self):
+        """
+        Calculates the shift components of every lexicon in one pass. Types a
+        lexicon does not score have zero frequency under it, so they do not
+        contribute to its shift
+
+        Returns
+        -------
+        shift_arrays: dict
+            'p_diff', 's_diff', 'p_avg', 's_ref_diff' and 'shift_score',
+            (types x lexicons) per-type components of the (unnormalized) shift
+            scores. Rows are ordered by self.types and columns by self.names
+        """
+        if self.shift_arrays is None:
+            freq_1 = self.freq_1.reshape(-1, 1) * self.scored
+            freq_2 = self.freq_2.reshape(-1, 1) * self.scored
+            components = get_shift_component_arrays(freq_1, freq_2, self.scores,
+                                                    self.scores,
+                                                    self.reference_value.reshape(1, -1),
+                                                    totals=(self.totals_1,
+                                                            self.totals_2))
+            keys = ['p_diff', 's_diff', 'p_avg', 's_ref_diff', 'shift_score']
+            self.shift_arrays = dict(zip(keys, components))
+        return self.shift_arrays
+
+    def get_shift_scores(self, normalize=True):
+        """
+        Calculates the type shift scores under every lexicon
+
+        Parameters
+        ----------
+        normalize: bool
+            if True normalizes shift scores so they sum to 1 or -1 within each
+            lexicon
+
+        Returns
+        -------
+        shift_scores: np.ndarray
+            (types x lexicons) shift scores. Rows are ordered by self.types and
+            columns by self.names
+        """
+        shift_scores = self.get_shift_arrays()['shift_score']
+        if normalize:
+            shift_scores = shift_scores / np.abs(shift_scores.sum(axis=0))
+        return shift_scores
+
+    def get_result_table(self):
+        """
+        Calculates the total shift, weighted scores and sums of each type of
+        contribution under every lexicon
+
+        Returns
+        -------
+        result_table: dict
+            keys are column names and values are arrays with one entry per
+            lexicon: 'name', 'diff' (total shift), 'weighted_score_1',
+            'weighted_score_2', 'reference_value', and the contribution sums
+            'pos_s_pos_p', 'pos_s_neg_p', 'neg_s_pos_p', 'neg_s_neg_p', 'pos_s'
+            and 'neg_s'
+        """
+        if self.result_table is None:
+            arrays = self.get_shift_arrays()
+            result_table = {'name': np.array(self.names, dtype=object),
+                            'diff': arrays['shift_score'].sum(axis=0),
+                            'weighted_score_1': self.weighted_1,
+                            'weighted_score_2': self.weighted_2,
+                            'reference_value': self.reference_value}
+            result_table.update(get_component_sums(arrays['p_diff'],
+                                                   arrays['s_diff'],
+                                                   arrays['p_avg'],
+                                                   arrays['s_ref_diff']))
+            self.result_table = result_table
+        return {c : v.copy() for c,v in self.result_table.items()}
+
+    def get_shift(self, name, shift_class=None, **kwargs):
+        """
+        Builds a shift object between the systems under one lexicon, e.g. to
+        plot its word shift graph
+
+        Parameters
+        ----------
+        name:
+            name of the lexicon
+        shift_class: class, optional
+            the class of shift to build. Defaults to Shift
+        kwargs:
+            passed to the shift constructor
+
+        Returns
+        -------
+        shift: Shift
+        """
+        j = self.names.index(name)
+        if shift_class is None:
+            shift_class = shifterator.Shift
+        kwargs.setdefault('type2score_1', self.type2scores[j])
+        kwargs.setdefault('reference_value', float(self.reference_value[j]))
+        kwargs.setdefault('stop_lens', self.stop_lens)
+        return shift_class(self.type2freq_1, self.type2freq_2, **kwargs)
@@ -0,0 +1,240 @@
+"""
+pairwise_shift.py
+
+Jensen-Shannon divergences between every pair of many systems, computed over a
+shared (types x systems) matrix instead of one JSDivergenceShift per pair
+"""
+import os
+import tempfile
+import collections.abc
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from .helper import *
+
+# State shared with worker processes, set once per worker by _init_worker
+_worker_state = None
+
+# ------------------------------------------------------------------------------
+# -------------------------------- Pairwise Funcs ------------------------------
+# ------------------------------------------------------------------------------
+def get_jsd_matrix(systems, base=2, weight_1=0.5, weight_2=0.5, top_n=None,
+                   chunk_size=64, n_jobs=None):
+    """
+    Calculates the Jensen-Shannon divergence (JSD) between every pair of
+    systems, following the per-type scores of get_jsd_scores
+
+    Parameters
+    ----------
+    systems: dict or list of dicts
+        if dict, keys are names of systems and values are their type2freq dicts.
+        If list, systems are named by their position
+    base: int
+        the base for the logarithm when computing entropy for the JSD
+    weight_1, weight_2: float
+        relative weights of the row and column system of each pair when
+        constructing their mixed distribution. Should be positive and sum to 1
+    top_n: int, optional
+        if not None, also returns the top_n types contributing to each JSD
+    chunk_size: int
+        number of column systems compared against a row system at once, which
+        bounds the memory of intermediate arrays
+    n_jobs: int, optional
+        if not None, the number of worker processes to split rows across.
+        Workers memory-map the relative frequencies from a temporary file, so
+        they share one copy of them instead of each holding their own
+
+    Returns
+    -------
+    jsd: np.ndarray
+        (systems x systems) matrix where jsd[i,j] is the JSD between system i
+        (weighted by weight_1) and system j (weighted by weight_2)
+    pair2top_types: dict
+        only returned if top_n is not None. Keys are (name_i, name_j) pairs and
+        values are lists of (type, contribution) tuples, sorted by absolute
+        contribution. Contributions are unnormalized, so they sum to jsd[i,j]
+    """
+    if isinstance(systems, collections.abc.Mapping):
+        names = list(systems.keys())
+        systems = list(systems.values())
+    else:
+        systems = list(systems)
+        names = list(range(len(systems)))
+    # Align all systems to one shared vocabulary
+    types = set()
+    for type2freq in systems:
+        types.update(type2freq.keys())
+    types = list(types)
+    freqs = get_system_matrix(systems, get_type_index(types))
+    return get_count_jsd_matrix(freqs, types, names, base=base,
+                                weight_1=weight_1, weight_2=weight_2,
+                                top_n=top_n, chunk_size=chunk_size,
+                                n_jobs=n_jobs)
+
+def get_count_jsd_matrix(freqs, types=None, names=None, base=2, weight_1=0.5,
+                         weight_2=0.5, top_n=None, chunk_size=64, n_jobs=None):
+    """
+    Calculates the JSD between every pair of systems given as aligned count
+    vectors, see get_jsd_matrix
+
+    Parameters
+    ----------
+    freqs: np.ndarray
+        (types x systems) frequencies, one column per system
+    types: list, optional
+        the type of each row of freqs. Required if top_n is not None
+    names: list, optional
+        the name of each system. Defaults to the positions of the systems
+    base, weight_1, weight_2, top_n, chunk_size, n_jobs:
+        see get_jsd_matrix
+
+    Returns
+    -------
+    jsd: np.ndarray
+        (systems x systems) matrix of JSDs, see get_jsd_matrix
+    pair2top_types: dict
+        only returned if top_n is not None, see get_jsd_matrix
+    """
+    if weight_1 + weight_2 != 1:
+        raise ValueError('weight_1 and weight_2 do not sum to 1')
+    if weight_1 <= 0 or weight_2 <= 0:
+        raise ValueError('weight_1 and weight_2 must be positive')
+    if names is None:
+        names = list(range(freqs.shape[1]))
+    probs = freqs / freqs.sum(axis=0)
+    plogp = np.zeros_like(probs)
+    np.multiply(probs, np.log(probs, out=plogp, where=probs > 0), out=plogp)
+    entropies = plogp.sum(axis=0)
+    del plogp
+
+    n = probs.shape[1]
+    symmetric = weight_1 == weight_2
+    state = {'probs': probs, 'entropies': entropies, 'weight_1': weight_1,
+             'weight_2': weight_2, 'symmetric': symmetric,
+             'chunk_size': chunk_size, 'top_n': top_n}
+    jsd = np.zeros((n, n))
+    pair2top_types = dict()
+    if n_jobs is None:
+        rows = (_get_jsd_row(state, i) for i in range(n))
+        for i,(row,row_tops) in enumerate(rows):
+            _set_jsd_row(jsd, pair2top_types, i, row, row_tops, symmetric)
+    else:
+        # Every row is compared against the columns of all later systems, so
+        # workers share the whole matrix through a memory-mapped file instead
+        # of each receiving a copy of it
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            probs_path = os.path.join(tmp_dir, 'probs.npy')
+            np.save(probs_path, probs)
+            worker_state = dict(state, probs=probs_path)
+            with ProcessPoolExecutor(max_workers=n_jobs,
+                                     initializer=_init_worker,
+                                     initargs=(worker_state,)) as executor:
+                rows = executor.map(_get_worker_jsd_row, range(n))
+                for i,(row,row_tops) in enumerate(rows):
+                    _set_jsd_row(jsd, pair2top_types, i, row, row_tops,
+                                 symmetric)
+    # Convert from nats
+    jsd /= np.log(base)
+    if top_n is None:
+        return jsd
+    pair2top_types = {(names[i], names[j]) : [(types[t], c / np.log(base))
+                                              for t,c in top_types]
+                      for (i,j),top_types in pair2top_types.items()}
+    return jsd, pair2top_types
+
+def _set_jsd_row(jsd, pair2top_types, i, row, row_tops, symmetric):
+    """
+    Fills the divergences and top types of row system i
+    """
+    if symmetric:
+        jsd[i,i+1:] = row[i+1:]
+        jsd[i+1:,i] = row[i+1:]
+    else:
+        jsd[i,:] = row
+    for j,top_types in row_tops.items():
+        pair2top_types[(i, j)] = top_types
+        if symmetric:
+            pair2top_types[(j, i)] = top_types
+
+def _get_jsd_row(state, i):
+    """
+    Calculates the JSD, in nats, between system i and each later system (every
+    other system if the weights are unequal)
+
+    The cross-entropy term only needs the types observed in system i. For the
+    other types, the mixed distribution is weight_2*q, so their term reduces to
+    sum(q*log(weight_2*q)), which is known from the entropy of q
+    """
+    probs = state['probs']
+    entropies = state['entropies']
+    w_1 = state['weight_1']
+    w_2 = state['weight_2']
+    chunk_size = state['chunk_size']
+    top_n = state['top_n']
+    n = probs.shape[1]
+    start = i + 1 if state['symmetric'] else 0
+    columns = [j for j in range(start, n) if j != i]
+
+    rows = np.flatnonzero(probs[:,i])
+    p = probs[rows,i].reshape(-1, 1)
+    row = np.zeros(n)
+    row_tops = dict()
+    for c in range(0, len(columns), chunk_size):
+        cols = columns[c:c+chunk_size]
+        q = probs[np.ix_(rows, cols)]
+        m = w_1 * p + w_2 * q
+        cross = np.sum((p + q) * np.log(m), axis=0)
+        # Add the terms of types only observed in the column systems
+        q_log_q = np.zeros_like(q)
+        np.multiply(q, np.log(w_2 * q, out=q_log_q, where=q > 0), out=q_log_q)
+        cross += entropies[cols] + np.log(w_2) - q_log_q.sum(axis=0)
+        row[cols] = 0.5 * (entropies[i] + entropies[cols] - cross)
+        if top_n is not None:
+            row_tops.update(get_top_jsd_types(probs[:,i], probs[:,cols], w_1,
+                                              w_2, cols, top_n))
+    return row, row_tops
+
+def get_top_jsd_types(p, q, weight_1, weight_2, cols, top_n):
+    """
+    Finds the types with the largest contributions to the JSD between one
+    system and a block of other systems
+
+    Parameters
+    ----------
+    p: np.ndarray
+        relative frequencies of the row system
+    q: np.ndarray
+        (types x systems) relative frequencies of the column systems
+    weight_1, weight_2: float
+        weights of the row and column systems in the mixed distribution
+    cols: list of int
+        positions of the column systems
+    top_n: int
+        number of types to return per pair
+
+    Returns
+    -------
+    col2top_types: dict
+        keys are column positions and values are lists of (type index,
+        contribution) tuples, sorted by absolute contribution
+    """
+    p = p.reshape(-1, 1)
+    m = weight_1 * p + weight_2 * q
+    log_m = np.log(m, out=np.zeros_like(m), where=m > 0)
+    log_p = np.log(p, out=np.zeros_like(p), where=p > 0)
+    log_q = np.log(q, out=np.zeros_like(q), where=q > 0)
+    contributions = 0.5 * (p * (log_p - log_m) + q * (log_q - log_m))
+    col2top_types = dict()
+    for b,j in enumerate(cols):
+        c = contributions[:,b]
+        top = get_top_n_indices(c, top_n)
+        col2top_types[j] = list(zip(top.tolist(), c[top].tolist()))
+    return col2top_types
+
+def _init_worker(state):
+    global _worker_state
+    probs = np.load(state['probs'], mmap_mode='r')
+    _worker_state = dict(state, probs=probs)
+
+def _get_worker_jsd_row(i):
+    return _get_jsd_row(_worker_state, i)
@@ -0,0 +1,215 @@
+"""
+permutation_test.py
+
+Label-permutation tests of whether two groups of documents differ in their
+weighted score or their Jensen-Shannon divergence. Documents are reshuffled
+between the groups, and the group totals of many permutations are recomputed
+at once with matrix products over a (documents x types) count matrix
+"""
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from .helper import *
+
+# State shared with worker processes, set once per worker by _init_worker
+_worker_state = None
+
+# ------------------------------------------------------------------------------
+# ------------------------------ Permutation Funcs -----------------------------
+# ------------------------------------------------------------------------------
+def get_permutation_test(matrix, labels, group_1=None, group_2=None,
+                         statistic='diff', vocabulary=None, type2score_1=None,
+                         type2score_2=None, stop_lens=None, base=2,
+                         weight_1=0.5, weight_2=0.5, n_permutations=1000,
+                         alternative='two-sided', chunk_size=100, n_jobs=None,
+                         seed=None, encoding='utf-8'):
+    """
+    Tests whether the total shift or the JSD between two groups of documents
+    is larger than expected if the documents were assigned to the groups at
+    random. Each permutation shuffles the group labels, keeping the group sizes
+
+    Parameters
+    ----------
+    matrix: scipy.sparse matrix or np.ndarray
+        (documents x types) counts, e.g. a CSR document-term matrix
+    labels: list or np.ndarray
+        the group label of each row of matrix. Rows labeled neither group_1
+        nor group_2 are ignored
+    group_1, group_2: optional
+        labels of the groups to compare. If None, labels must hold exactly two
+        distinct labels, which are compared in sorted order
+    statistic: str
+        'diff' for the total shift, i.e. the weighted score of group_2 minus
+        the weighted score of group_1, which does not depend on the reference
+        value. 'jsd' for the Jensen-Shannon divergence between the groups
+    vocabulary: list or np.ndarray, optional
+        the type of each column of matrix. Required if scores are given
+    type2score_1, type2score_2: dict or str, optional
+        if dict, types are keys and values are "scores" associated with each
+        type (e.g., sentiment). If str, the name of a score dict. If only one
+        is given, it scores both groups. Required for 'diff'. For 'jsd', only
+        restricts the types to the scored vocabulary
+    stop_lens: iterable of 2-tuples, optional
+        denotes intervals that should be excluded when calculating shift
+        scores
+    base, weight_1, weight_2:
+        see get_jsd_scores. Only used for 'jsd'
+    n_permutations: int
+        number of label permutations
+    alternative: str
+        'two-sided', 'greater' or 'less', the direction of the test
+    chunk_size: int
+        number of permutations computed at once, which bounds the memory of
+        intermediate (documents x permutations) and, for 'jsd', (types x
+        permutations) arrays
+    n_jobs: int, optional
+        if not None, the number of worker processes to split chunks across
+    seed: int, optional
+        seed of the random number generator. Results do not depend on n_jobs
+    encoding: str, optional
+        encoding for reading in a lexicon included in Shifterator
+
+    Returns
+    -------
+    result: dict
+        'statistic' (of the observed labels), 'null_distribution' (statistic of
+        each permutation), 'p_value' and 'groups' ((group_1, group_2))
+    """
+    if statistic not in ('diff', 'jsd'):
+        raise ValueError("statistic must be 'diff' or 'jsd'")
+    if alternative not in ('two-sided', 'greater', 'less'):
+        raise ValueError("alternative must be 'two-sided', 'greater' or 'less'")
+    labels = np.asarray(labels)
+    if group_1 is None and group_2 is None:
+        names = np.unique(labels).tolist()
+        if len(names) != 2:
+            raise ValueError('labels must hold exactly two groups if group_1 '
+                             'and group_2 are not given')
+        group_1,group_2 = names
+    rows = np.flatnonzero((labels == group_1) | (labels == group_2))
+    is_1 = (labels[rows] == group_1).astype(np.float64)
+
+    if type2score_1 is None and type2score_2 is None:
+        if statistic == 'diff':
+            raise ValueError("statistic 'diff' requires type2score_1 or "
+                             "type2score_2")
+    elif vocabulary is None:
+        raise ValueError('vocabulary is required to look up scores')
+
+    # Only keep columns observed in the groups and scored
+    matrix = matrix[rows]
+    observed = np.flatnonzero(np.asarray(matrix.sum(axis=0)).ravel())
+    if type2score_1 is None and type2score_2 is None:
+        columns = observed
+        score_1 = score_2 = None
+    else:
+        # Only load the scores of observed types
+        vocabulary = np.asarray(vocabulary, dtype=object)
+        observed_types = set(vocabulary[observed])
+        if type2score_1 is not None:
+            type2score_1 = get_score_dictionary(type2score_1, encoding,
+                                                observed_types)
+        if type2score_2 is not None:
+            type2score_2 = get_score_dictionary(type2score_2, encoding,
+                                                observed_types)
+        if type2score_1 is None:
+            type2score_1 = type2score_2
+        elif type2score_2 is None:
+            type2score_2 = type2score_1
+        types,score_1,score_2 = get_scored_vocabulary(vocabulary[observed],
+                                                      type2score_1,
+                                                      type2score_2, stop_lens)
+        column_index = get_type_index(vocabulary[observed])
+        columns = observed[[column_index[t] for t in types]]
+    matrix = matrix[:,columns]
+
+    state = {'statistic': statistic, 'is_1': is_1, 'base': base,
+             'weight_1': weight_1, 'weight_2': weight_2}
+    if statistic == 'diff':
+        # Each group total is a sum of per-document totals, so permutations
+        # only need the documents' frequency and score totals
+        state['doc_totals'] = get_row_sums(matrix, None)
+        state['doc_weighted_1'] = get_row_sums(matrix, score_1)
+        state['doc_weighted_2'] = get_row_sums(matrix, score_2)
+    else:
+        state['matrix_t'] = matrix.T
+        state['totals'] = np.asarray(matrix.sum(axis=0)).ravel()
+    observed_statistic = float(get_permutation_statistics(state,
+                                                          is_1.reshape(1, -1))[0])
+
+    # Split the permutations into chunks, each with its own random stream
+    sizes = [min(chunk_size, n_permutations - start)
+             for start in range(0, n_permutations, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    if n_jobs is None:
+        null = [_get_chunk_statistics(state, s, size)
+                for s,size in zip(seeds, sizes)]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                                 initargs=(state,)) as executor:
+            null = list(executor.map(_get_worker_chunk_statistics, seeds,
+                                     sizes))
+    null = np.concatenate(null) if len(null) > 0 else np.zeros(0)
+
+    # Count permutations at least as extreme, counting the observed labels
+    if alternative == 'two-sided':
+        extreme = np.abs(null) >= abs(observed_statistic)
+    elif alternative == 'greater':
+        extreme = null >= observed_statistic
+    else:
+        extreme = null <= observed_statistic
+    p_value = (extreme.sum() + 1) / (len(null) + 1)
+    return {'statistic': observed_statistic, 'null_distribution': null,
+            'p_value': float(p_value), 'groups': (group_1, group_2)}
+
+def get_row_sums(matrix, weights):
+    """
+    Returns the (weighted) sum of each row of a dense or sparse matrix
+    """
+    if weights is None:
+        return np.asarray(matrix.sum(axis=1), dtype=np.float64).ravel()
+    return np.asarray(matrix.dot(weights), dtype=np.float64).ravel()
+
+def get_permutation_statistics(state, in_1):
+    """
+    Calculates the statistic of several label permutations at once
+
+    Parameters
+    ----------
+    state: dict
+        the documents and settings of the test, see get_permutation_test
+    in_1: np.ndarray
+        (permutations x documents) indicators of the documents in group 1
+
+    Returns
+    -------
+    statistics: np.ndarray
+        the statistic of each permutation
+    """
+    in_2 = 1 - in_1
+    if state['statistic'] == 'diff':
+        doc_totals = state['doc_totals']
+        weighted_1 = in_1.dot(state['doc_weighted_1']) / in_1.dot(doc_totals)
+        weighted_2 = in_2.dot(state['doc_weighted_2']) / in_2.dot(doc_totals)
+        return weighted_2 - weighted_1
+    # Sparse matrix products give the (types x permutations) group counts
+    counts_1 = np.asarray(state['matrix_t'].dot(in_1.T))
+    counts_2 = state['totals'].reshape(-1, 1) - counts_1
+    return get_column_jsds(counts_1, counts_2, state['base'],
+                           state['weight_1'], state['weight_2'])
+
+def _get_chunk_statistics(state, seed, size):
+    """
+    Shuffles the group labels size times and calculates the statistic of each
+    shuffle
+    """
+    rng = np.random.default_rng(seed)
+    in_1 = rng.permuted(np.tile(state['is_1'], (size, 1)), axis=1)
+    return get_permutation_statistics(state, in_1)
+
+def _init_worker(state):
+    global _worker_state
+    _worker_state = state
+
+def _get_worker_chunk_statistics(seed, size):
+    return _get_chunk_statistics(_worker_state, seed, size)
@@ -11,8 +11,13 @@ TODO:
 - Add params for explicitly setting fonts
 - Add doc strings
 """
+import warnings
 import numpy as np
+import matplotlib.pyplot as plt
 from matplotlib import rcParams
+from matplotlib.figure import Figure
+from matplotlib.ticker import FuncFormatter
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 
 def get_plot_params(plot_params, show_score_diffs):
     if 'detailed' not in plot_params:
@@ -104,6 +109,380 @@ def get_plot_params(plot_params, show_score_diffs):
 
     return plot_params
 
+def plot_shift_graph(graph_data, plot_params, figure=None):
+    """
+    Draws a shift graph on a new figure from the data collected by
+    Shift.get_shift_graph_data
+
+    Parameters
+    ----------
+    graph_data: dict
+        data of the graph, see Shift.get_shift_graph_data
+    plot_params: dict
+        plotting parameters, as set by get_plot_params
+    figure: matplotlib.figure.Figure, optional
+        empty figure with a canvas to draw the graph on, e.g. one that is not
+        managed by pyplot. If None, a new pyplot figure is created
+
+    Returns
+    -------
+    f, ax
+        Matplotlib figure and ax of the shift graph
+    """
+    top_n = graph_data['top_n']
+    type_scores = graph_data['type_scores']
+    # Get bar heights and colors
+    bar_dims = get_bar_dims(type_scores, graph_data['norm'], plot_params)
+    bar_colors = get_bar_colors(type_scores, plot_params)
+
+    # Initialize plot
+    if figure is None:
+        f,ax = plt.subplots(figsize=(plot_params['width'], plot_params['height']))
+    else:
+        f = figure
+        f.set_size_inches(plot_params['width'], plot_params['height'])
+        ax = f.subplots()
+    ax.margins(plot_params['y_margin'])
+    # Plot type contributions
+    ax = plot_contributions(ax, top_n, bar_dims, bar_colors, plot_params)
+    # Plot total sum contributions
+    bar_order = get_bar_order(plot_params)
+    ax,comp_bar_heights,bar_order = plot_total_contribution_sums(ax,
+                                                                 graph_data['comp_sums'],
+                                                                 bar_order,
+                                                                 top_n,
+                                                                 bar_dims,
+                                                                 plot_params)
+    # Get labels for bars
+    type_labels = [t for (t,_,_,_,_,_) in type_scores]
+    # Add indicator if type borrwed a score
+    m_sym = plot_params['missing_symbol']
+    type_labels = [t + m_sym if m else t
+                   for t,m in zip(type_labels, graph_data['missing'])]
+    # Get labels for total contribution bars
+    bar_labels = [plot_params['symbols'][b] for b in bar_order]
+    labels = type_labels + bar_labels
+    # Set font type
+    if plot_params['serif']:
+        set_serif()
+    if plot_params['detailed']:
+        ax = set_bar_labels(f, ax, top_n, labels, bar_dims['label_heights'],
+                            comp_bar_heights, plot_params)
+    else:
+        ax = set_bar_labels(f, ax, top_n, labels, bar_dims['total_heights'],
+                            comp_bar_heights, plot_params)
+
+    # Add center dividing line
+    ax.axvline(0, ls='-', color='black', lw=0.8, zorder=20)
+
+    # Add dividing line between words and component bars
+    ax.axhline(top_n+1, ls='-', color='black', lw=0.7, zorder=20)
+    if plot_params['show_total']:
+        ax.axhline(top_n+2.75, ls='-', color='black', lw=0.5, zorder=20)
+
+    # Set cumulative diff inset
+    if graph_data['cumulative'] is not None:
+        f = get_cumulative_inset(f, None, top_n, plot_params,
+                                 cumulative=graph_data['cumulative'])
+    if graph_data['text_sizes'] is not None:
+        f = get_text_size_inset(f, None, None, plot_params,
+                                text_sizes=graph_data['text_sizes'])
+    # Set guidance arrows (for relative plot)
+    #if guidance:
+    #    ax = get_guidance_annotations(ax, top_n, annotation_text=None)
+
+    # Make x-tick labels bigger, flip y-axis ticks and label every 5th one
+    ax = set_ticks(ax, top_n, plot_params)
+
+    # Set axis spines
+    ax = set_spines(ax, plot_params)
+
+    # Set axis labels and title
+    ax.set_xlabel(plot_params['xlabel'], fontsize=plot_params['xlabel_fontsize'])
+    ax.set_ylabel(plot_params['ylabel'], fontsize=plot_params['ylabel_fontsize'])
+    if plot_params['all_pos_contributions'] and 'title' not in plot_params:
+        plot_params['title'] = ''
+    elif 'title' not in plot_params:
+        plot_params['title'] = get_title(graph_data)
+    ax.set_title(plot_params['title'], fontsize=plot_params['title_fontsize'])
+
+    return f,ax
+
+def get_title(graph_data):
+    """
+    Returns the default title of a shift graph, the weighted scores of both
+    systems
+    """
+    s_avg_1,s_avg_2 = graph_data['weighted_scores']
+    title = r'$\Phi_{\Omega^{(2)}}$: $s_{avg}^{(1)}=$'+'{0:.2f}'\
+            .format(s_avg_1)+'\n'\
+            +r'$\Phi_{\Omega^{(1)}}$: $s_{avg}^{(2)}=$'+'{0:.2f}'\
+            .format(s_avg_2)
+    return title
+
+class ShiftGraphTemplate:
+    def __init__(self, top_n, plot_params, cumulative_inset=True,
+                 text_size_inset=True):
+        """
+        Reusable figure for drawing many shift graphs with the same top_n and
+        plotting parameters. The figure, its axes and insets, the ticks, and
+        the bars and labels of every rank are created once. Drawing a graph
+        only updates their lengths, colors, text and axis limits
+
+        The figure is drawn on an Agg canvas that pyplot does not manage. Its
+        tight layout is computed for the first graph and kept for the graphs
+        drawn after it
+
+        Parameters
+        ----------
+        top_n: int
+            number of top contributing types displayed in each graph
+        plot_params: dict
+            plotting parameters, as set by get_plot_params
+        cumulative_inset, text_size_inset: bool
+            whether the graphs have the cumulative contribution and text size
+            insets, i.e. whether their graph data holds 'cumulative' and
+            'text_sizes'
+        """
+        self.top_n = top_n
+        self.plot_params = plot_params
+        self.bar_order = get_bar_order(plot_params)
+        self._laid_out = False
+        # Set font type before any text is created
+        if plot_params['serif']:
+            set_serif()
+        f = Figure(figsize=(plot_params['width'], plot_params['height']))
+        FigureCanvasAgg(f)
+        ax = f.subplots()
+        ax.margins(plot_params['y_margin'])
+        self.figure = f
+        self.ax = ax
+
+        # Create the type contribution bars of each layer, as in
+        # plot_contributions, with (heights, bases, colors) keys of their dims
+        ys = list(range(1, top_n + 1))
+        zeros = [0] * top_n
+        width = plot_params['bar_width']
+        linewidth = plot_params['bar_linewidth']
+        edgecolor = ['black'] * top_n
+        if plot_params['detailed']:
+            layers = [('p_solid_heights', None, 'p', None),
+                      ('s_solid_heights', 's_solid_bases', 's', None),
+                      ('p_fade_heights', 'p_fade_bases', 'p',
+                       plot_params['alpha_fade']),
+                      ('s_fade_heights', 's_fade_bases', 's',
+                       plot_params['alpha_fade'])]
+        else:
+            layers = [('total_heights', None, 'total', None)]
+        self.bar_layers = []
+        for heights,bases,colors,alpha in layers:
+            bars = ax.barh(ys, zeros, width, left=zeros, align='center',
+                           zorder=10, edgecolor=edgecolor, alpha=alpha,
+                           linewidth=linewidth)
+            self.bar_layers.append((heights, bases, colors, bars.patches))
+        # Create the total contribution bars
+        comp_ys = get_comp_bar_ys(top_n, len(self.bar_order), plot_params)
+        comp_colors = [plot_params['score_colors'][b] for b in self.bar_order]
+        self.comp_bars = ax.barh(comp_ys, [0] * len(comp_ys), width,
+                                 align='center', color=comp_colors,
+                                 linewidth=linewidth,
+                                 edgecolor=['black'] * len(comp_ys)).patches
+        # Create the bar labels, as in set_bar_labels
+        self.bar_labels = [plot_params['symbols'][b] for b in self.bar_order]
+        self.labels = [ax.text(0, y, '', ha='left', va='center',
+                               fontsize=plot_params['label_fontsize'], zorder=5)
+                       for y in ys + comp_ys]
+        self.y_lim = (min(ys + comp_ys) - width/2, max(ys + comp_ys) + width/2)
+
+        # Add center dividing line
+        ax.axvline(0, ls='-', color='black', lw=0.8, zorder=20)
+        # Add dividing line between words and component bars
+        ax.axhline(top_n+1, ls='-', color='black', lw=0.7, zorder=20)
+        if plot_params['show_total']:
+            ax.axhline(top_n+2.75, ls='-', color='black', lw=0.5, zorder=20)
+
+        # Create the insets, as in get_cumulative_inset and get_text_size_inset
+        if cumulative_inset:
+            in_ax = f.add_axes(plot_params['pos_cumulative_inset'])
+            self.cumulative_line, = in_ax.semilogy([1], [1], '-o',
+                                                   color='black', linewidth=0.5,
+                                                   markersize=1.2)
+            self.top_n_line, = in_ax.plot([0, 1], [top_n, top_n], '-',
+                                          color='black', linewidth=0.5)
+            in_ax.margins(x=0, y=0)
+            in_ax.tick_params(labelsize=12)
+            in_ax.set_xlabel(r'$\sum^r \delta \Phi_{\tau}(T^{(1)}, T^{(2)})$',
+                             fontsize=12)
+            in_ax.patch.set_alpha(0)
+            self.cumulative_ax = in_ax
+        else:
+            self.cumulative_ax = None
+        if text_size_inset:
+            in_ax = f.add_axes(plot_params['pos_text_size_inset'])
+            self.text_size_bars = in_ax.barh([0.6, 0.4], [1, 1], 0.1,
+                                             color='#707070', linewidth=0.5,
+                                             edgecolor=['black']*2,
+                                             tick_label=plot_params['system_names']).patches
+            in_ax.set_ylim((0, 1))
+            # Text sizes are normalized, so the x-axis limits never change
+            in_ax.set_xlim(in_ax.get_xlim())
+            in_ax.text(0.5, 0.75, 'Text Size:', horizontalalignment='center',
+                       fontsize=14)
+            in_ax.tick_params(axis='y', length=0, labelsize=12)
+            for side in ['left', 'right', 'top', 'bottom']:
+                in_ax.spines[side].set_visible(False)
+            in_ax.get_xaxis().set_visible(False)
+            in_ax.set_alpha(0)
+        else:
+            self.text_size_bars = None
+
+        # Set ticks, as in set_ticks. The x-tick labels are formatted for the
+        # limits of each graph
+        tick_format = plot_params['tick_format']
+        if not plot_params['all_pos_contributions']:
+            formatter = FuncFormatter(lambda t,pos: tick_format.format(t))
+        else:
+            formatter = FuncFormatter(lambda t,pos: tick_format.format(abs(t)))
+        ax.xaxis.set_major_formatter(formatter)
+        ax.tick_params(axis='x', labelsize=plot_params['xtick_fontsize'])
+        ax.set_yticks(list(range(1,top_n,5))+[top_n])
+        ax.set_yticklabels([str(n) for n in (list(range(top_n,1,-5))+['1'])],
+                           fontsize=plot_params['ytick_fontsize'])
+        if plot_params['remove_xticks']:
+            ax.tick_params(axis='x', which='both', bottom=False, top=False)
+        if plot_params['remove_yticks']:
+            ax.tick_params(axis='y', which='both', left=False, right=False)
+        ax = set_spines(ax, plot_params)
+        # Set axis labels and title
+        ax.set_xlabel(plot_params['xlabel'], fontsize=plot_params['xlabel_fontsize'])
+        ax.set_ylabel(plot_params['ylabel'], fontsize=plot_params['ylabel_fontsize'])
+        if 'title' in plot_params:
+            title = plot_params['title']
+        elif plot_params['all_pos_contributions']:
+            title = ''
+        else:
+            title = None
+        self.title = ax.set_title(title or '',
+                                  fontsize=plot_params['title_fontsize'])
+        self._fixed_title = title is not None
+        # Keep the axes position without a tight layout, labels are fit to it
+        self._position = ax.get_position()
+
+    def draw(self, graph_data):
+        """
+        Draws a shift graph on the figure of the template
+
+        Parameters
+        ----------
+        graph_data: dict
+            data of the graph, see Shift.get_shift_graph_data. It must hold
+            the insets of the template
+
+        Returns
+        -------
+        f, ax
+            Matplotlib figure and ax of the shift graph
+        """
+        if (graph_data['cumulative'] is None) != (self.cumulative_ax is None)\
+        or (graph_data['text_sizes'] is None) != (self.text_size_bars is None):
+            raise ValueError('The insets of the graph data do not match the '
+                             'insets of the template')
+        plot_params = self.plot_params
+        f = self.figure
+        ax = self.ax
+        type_scores = graph_data['type_scores'][-self.top_n:]
+        n = len(type_scores)
+        bar_dims = get_bar_dims(type_scores, graph_data['norm'], plot_params)
+        bar_colors = get_bar_colors(type_scores, plot_params)
+
+        # Update the type contribution bars. Ranks without a type are hidden
+        x_ends = [0]
+        for heights,bases,colors,bars in self.bar_layers:
+            heights = bar_dims[heights]
+            bases = bar_dims[bases] if bases is not None else [0] * n
+            for i,bar in enumerate(bars):
+                bar.set_visible(i < n)
+                if i < n:
+                    bar.set_x(bases[i])
+                    bar.set_width(heights[i])
+                    bar.set_facecolor(bar_colors[colors][i])
+                    bar.sticky_edges.x[:] = [bases[i]]
+                else:
+                    bar.sticky_edges.x[:] = []
+            x_ends += bases + [b + h for b,h in zip(bases, heights)]
+        # Update the total contribution bars
+        comp_bar_heights = get_comp_bar_heights(graph_data['comp_sums'],
+                                                self.bar_order, bar_dims,
+                                                plot_params)
+        for bar,h in zip(self.comp_bars, comp_bar_heights):
+            bar.set_width(h)
+        x_ends += comp_bar_heights
+        # Autoscale the x-axis to the bars
+        ax.dataLim.intervalx = (min(x_ends), max(x_ends))
+        ax.dataLim.intervaly = self.y_lim
+        ax.set_autoscalex_on(True)
+        ax.autoscale_view(scaley=False)
+
+        # Update the bar labels and fit the x-axis to them, as in
+        # set_bar_labels, on the axes position without a tight layout
+        if plot_params['detailed']:
+            full_bar_heights = bar_dims['label_heights']
+        else:
+            full_bar_heights = bar_dims['total_heights']
+        full_bar_heights = full_bar_heights + [0] * (self.top_n - n)
+        m_sym = plot_params['missing_symbol']
+        type_labels = [t + m_sym if m else t
+                       for (t,_,_,_,_,_),m in zip(type_scores,
+                                                  graph_data['missing'][-n:])]
+        type_labels += [''] * (self.top_n - n)
+        bar_type_space = get_bar_type_space(ax, plot_params)
+        for text,width,label in zip(self.labels,
+                                    full_bar_heights + comp_bar_heights,
+                                    type_labels + self.bar_labels):
+            if width < 0:
+                text.set_ha('right')
+                space = -1 * bar_type_space
+            else:
+                text.set_ha('left')
+                space = bar_type_space
+            text.set_x(width + space)
+            text.set_text(label)
+        if self._laid_out:
+            tight_position = ax.get_position()
+            ax.set_position(self._position)
+        adjust_axes_for_labels(f, ax, full_bar_heights, comp_bar_heights,
+                               self.labels, bar_type_space, plot_params)
+        if self._laid_out:
+            ax.set_position(tight_position)
+
+        # Update the insets
+        if self.cumulative_ax is not None:
+            ranks,cum_scores = graph_data['cumulative']
+            cum_scores = 100 * cum_scores
+            self.cumulative_line.set_data(cum_scores, ranks)
+            if np.sign(cum_scores[-1]) == -1:
+                x_lim = (min(cum_scores), 0)
+            else:
+                x_lim = (0, max(cum_scores))
+            self.cumulative_ax.set_xlim(x_lim)
+            self.cumulative_ax.set_ylim((ranks[-1] + 1, 1))
+            self.top_n_line.set_data(x_lim, [self.top_n, self.top_n])
+        if self.text_size_bars is not None:
+            n1,n2 = graph_data['text_sizes']
+            n_max = max(n1, n2)
+            self.text_size_bars[0].set_width(n1 / n_max)
+            self.text_size_bars[1].set_width(n2 / n_max)
+        if not self._fixed_title:
+            self.title.set_text(get_title(graph_data))
+
+        # Lay out the figure once
+        if plot_params['tight'] and not self._laid_out:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                f.tight_layout()
+            self._laid_out = True
+        return f,ax
+
 def set_serif():
     rcParams['font.family'] = 'serif'
     rcParams['mathtext.fontset'] = 'dejavuserif'
@@ -247,6 +626,26 @@ def get_bar_order(plot_params):
 def plot_total_contribution_sums(ax, total_comp_sums, bar_order, top_n, bar_dims,
                                  plot_params):
     # Get contribution bars
+    comp_bar_heights = get_comp_bar_heights(total_comp_sums, bar_order, bar_dims,
+                                            plot_params)
+    # Get bar ys
+    ys = get_comp_bar_ys(top_n, len(comp_bar_heights), plot_params)
+    # Get other plotting params
+    comp_colors = [plot_params['score_colors'][b] for b in bar_order]
+    width = plot_params['bar_width']
+    linewidth = plot_params['bar_linewidth']
+    edgecolor = ['black'] * len(comp_bar_heights)
+    # Plot total contribution bars
+    ax.barh(ys, comp_bar_heights, width, align='center', color=comp_colors,
+            linewidth=linewidth, edgecolor=edgecolor)
+
+    return ax, comp_bar_heights, bar_order
+
+def get_comp_bar_heights(total_comp_sums, bar_order, bar_dims, plot_params):
+    """
+    Returns the heights of the total contribution bars, rescaled to the longest
+    type contribution bar
+    """
     comp_bar_heights = []
     for b in bar_order:
         if b == 'total':
@@ -280,26 +679,23 @@ def plot_total_contribution_sums(ax, total_comp_sums, bar_order, top_n, bar_dims
     comp_scaling = max_bar_height / np.max(np.abs(comp_bar_heights))
     comp_bar_heights = [comp_scaling * h for h in comp_bar_heights]
 
-    # Get bar ys
+    return comp_bar_heights
+
+def get_comp_bar_ys(top_n, n_comp_bars, plot_params):
+    """
+    Returns the heights on the y-axis of the total contribution bars, which
+    are drawn in pairs above the type contribution bars
+    """
     if plot_params['show_total']:
         min_y = top_n + 3.5
         ys = [top_n + 2]
     else:
         min_y = top_n + 2
         ys = []
-    for n_h in range(int(len(comp_bar_heights)/2)):
+    for n_h in range(int(n_comp_bars/2)):
         y = min_y + (1.5 * n_h)
         ys += [y, y]
-    # Get other plotting params
-    comp_colors = [plot_params['score_colors'][b] for b in bar_order]
-    width = plot_params['bar_width']
-    linewidth = plot_params['bar_linewidth']
-    edgecolor = ['black'] * len(comp_bar_heights)
-    # Plot total contribution bars
-    ax.barh(ys, comp_bar_heights, width, align='center', color=comp_colors,
-            linewidth=linewidth, edgecolor=edgecolor)
-
-    return ax, comp_bar_heights, bar_order
+    return ys
 
 def get_bar_type_space(ax, plot_params):
     # Estimate bar_type_space as a fraction of largest xlim
@@ -315,15 +711,7 @@ def set_bar_labels(f, ax, top_n, type_labels, full_bar_heights, comp_bar_heights
     # Estimate bar_type_space as a fraction of largest xlim
     bar_type_space = get_bar_type_space(ax, plot_params)
     # Get heights of all bars
-    if plot_params['show_total']:
-        min_y = top_n + 3.5
-        top_heights = [top_n + 2]
-    else:
-        min_y = top_n + 2
-        top_heights = []
-    for n_h in range(int(len(comp_bar_heights)/2)):
-        y = min_y + (1.5 * n_h)
-        top_heights += [y, y]
+    top_heights = get_comp_bar_ys(top_n, len(comp_bar_heights), plot_params)
     bar_heights = list(range(1, n + 1)) + top_heights
     # Set all bar labels
     text_objs = []
@@ -425,21 +813,32 @@ def remove_xaxis_ticks(ax, major=True, minor=True):
             tic.tick1line.set_visible(False)
             tic.tick2line.set_visible(False)
 
-def get_cumulative_inset(f, type2shift_score, top_n, plot_params):
+def get_cumulative_inset(f, type2shift_score, top_n, plot_params,
+                         cumulative=None):
+    """
+    cumulative: (ranks, cum_scores) as given by helper.get_cumulative_scores,
+    whose sampled ranks include the maximum and minimum of the curve. If None,
+    the cumulative scores are calculated by sorting type2shift_score
+    """
     # Get plotting params
     inset_pos = plot_params['pos_cumulative_inset']
     # Get cumulative scores
-    scores = sorted([100 * s for s in type2shift_score.values()],
-                     key=lambda x:abs(x), reverse=True)
-    cum_scores = np.cumsum(scores)
+    if cumulative is None:
+        scores = sorted([100 * s for s in type2shift_score.values()],
+                         key=lambda x:abs(x), reverse=True)
+        cum_scores = np.cumsum(scores)
+        ranks = np.arange(1, len(cum_scores) + 1)
+    else:
+        ranks,cum_scores = cumulative
+        cum_scores = 100 * cum_scores
     # Plot cumulative difference
     left, bottom, width, height = inset_pos
     in_ax = f.add_axes([left, bottom, width, height])
-    in_ax.semilogy(cum_scores, range(1, len(cum_scores) + 1), '-o', color='black',
+    in_ax.semilogy(cum_scores, ranks, '-o', color='black',
                    linewidth=0.5, markersize=1.2)
     # Remove extra space around line plot
     in_ax.set_xlim((min(cum_scores),max(cum_scores)))
-    in_ax.set_ylim((1, len(cum_scores) + 1))
+    in_ax.set_ylim((1, ranks[-1] + 1))
     in_ax.margins(x=0, y=0)
     # Reverse the y-axis
     y_min,y_max = in_ax.get_ylim()
@@ -459,19 +858,27 @@ def get_cumulative_inset(f, type2shift_score, top_n, plot_params):
         for tick in ticks:
             tick.label.set_fontsize(12)
     # Set labels
-    in_ax.set_xlabel('$\sum^r \delta \Phi_{\\tau}(T^{(1)}, T^{(2)})$', fontsize=12)
+    in_ax.set_xlabel(r'$\sum^r \delta \Phi_{\tau}(T^{(1)}, T^{(2)})$', fontsize=12)
     # Make background transparent
     in_ax.patch.set_alpha(0)
 
     return f
 
-def get_text_size_inset(f, type2freq_1, type2freq_2, plot_params):
+def get_text_size_inset(f, type2freq_1, type2freq_2, plot_params,
+                        text_sizes=None):
+    """
+    text_sizes: (total freq of system_1, total freq of system_2). If None, the
+    sizes are summed from type2freq_1 and type2freq_2
+    """
     # Get plotting params
     system_names = plot_params['system_names']
     inset_pos = plot_params['pos_text_size_inset']
     # Get size of each text
-    n1 = sum(type2freq_1.values())
-    n2 = sum(type2freq_2.values())
+    if text_sizes is None:
+        n1 = sum(type2freq_1.values())
+        n2 = sum(type2freq_2.values())
+    else:
+        n1,n2 = text_sizes
     # Normalize text sizes
     n = max(n1, n2)
     n1 = n1 / n
@@ -0,0 +1,134 @@
+"""
+reference_profile.py
+
+Frozen reference systems, filtered, aligned and scored once so that many
+comparisons against the same reference only pay for the comparison side
+"""
+import collections.abc
+from types import MappingProxyType
+import numpy as np
+
+from .helper import *
+
+# ------------------------------------------------------------------------------
+# ----------------------------- Reference profiles -----------------------------
+# ------------------------------------------------------------------------------
+class ReferenceProfile:
+    def __init__(self, reference, type2score, stop_lens=None,
+                 encoding='utf-8'):
+        """
+        Precomputed reference system that can be passed to Shift,
+        RelativeShift or SentimentShift in place of the reference. The
+        reference is filtered by the stop lens, aligned to the types it shares
+        with the lexicon, and its weighted score is calculated once
+
+        A shift built from a profile uses the lexicon and stop lens of the
+        profile for the reference. Its type2score and stop_lens arguments for
+        the reference are ignored. If the comparison has no lexicon of its own,
+        it is scored by the lexicon of the profile, and only its own types are
+        aligned for each shift
+
+        Parameters
+        ----------
+        reference: dict
+            keys are types of the reference and values are frequencies of those
+            types. May also be a pandas Series or a (types, freqs) pair of
+            arrays, see helper.get_type_mapping. The profile holds a copy, so
+            later changes to reference do not change the profile
+        type2score: dict or str
+            if dict, types are keys and values are "scores" associated with each
+            type (e.g., sentiment). If str, the name of a score dict
+        stop_lens: iterable of 2-tuples, optional
+            denotes intervals that should be excluded when calculating shift
+            scores
+        encoding: str, optional
+            encoding for reading in a lexicon included in Shifterator
+        """
+        if type2score is None:
+            raise ValueError('A reference profile requires a type2score dict')
+        self.lexicon = get_score_dictionary(type2score, encoding)
+        if isinstance(self.lexicon, collections.abc.MutableMapping):
+            # Shifts share the lexicon of the profile without copying it
+            self.lexicon = MappingProxyType(self.lexicon)
+        self.stop_lens = stop_lens
+        reference = dict(get_type_mapping(reference))
+        # Filter the reference by the stop lens once
+        if stop_lens is not None:
+            filtered = split_by_scores(reference, self.lexicon, stop_lens)
+            self.type2score = filtered['type2score']
+            self.stop_words = filtered['stop_words']
+            type2freq = filtered['type2freq']
+            self.type2freq_stopped = MappingProxyType(filtered['type2freq_stopped'])
+            self.type2score_stopped = MappingProxyType(filtered['type2score_stopped'])
+        else:
+            self.type2score = self.lexicon
+            self.stop_words = set()
+            type2freq = reference
+            self.type2freq_stopped = MappingProxyType(dict())
+            self.type2score_stopped = MappingProxyType(dict())
+        # Shifts copy the reference into a dict before updating it
+        self.type2freq = MappingProxyType(type2freq)
+
+        # Align the scored types of the reference
+        self.index2type = [t for t in type2freq if t in self.type2score]
+        self.types = frozenset(self.index2type)
+        self.type2index = get_type_index(self.index2type)
+        self.freq = get_aligned_array(type2freq, self.type2index)
+        self.scores = get_aligned_array(self.type2score, self.type2index)
+        self.freq.flags.writeable = False
+        self.scores.flags.writeable = False
+        self.total = float(self.freq.sum())
+        if self.total > 0:
+            self.reference_value = float(np.dot(self.freq, self.scores)
+                                         / self.total)
+        else:
+            self.reference_value = None
+
+    def get_filtered(self):
+        """
+        Returns the stop lens split of the reference in the form of
+        helper.split_by_scores, with copies of the dicts a shift may update
+        """
+        return {'type2freq': self.type2freq, 'type2score': self.type2score,
+                'stop_words': self.stop_words,
+                'type2freq_stopped': dict(self.type2freq_stopped),
+                'type2score_stopped': dict(self.type2score_stopped)}
+
+    def get_aligned_arrays(self, type2freq):
+        """
+        Aligns a comparison system scored by the lexicon of the profile to the
+        types of the reference. The scored types of the comparison that are not
+        in the reference are appended after the reference types
+
+        Parameters
+        ----------
+        type2freq: dict
+            keys are types of the comparison and values are frequencies of
+            those types, filtered by the stop lens of the profile
+
+        Returns
+        -------
+        type2index: dict
+            keys are the types of both systems and values are their positions.
+            A new dict, which is not shared with the profile
+        index2type: list
+            the types of both systems, ordered by position
+        freq_ref, freq, scores: np.ndarray
+            frequencies of the reference and the comparison, and the scores of
+            the types, aligned to type2index
+        """
+        new_types = [t for t in type2freq
+                     if t not in self.type2index and t in self.type2score]
+        n_ref = len(self.index2type)
+        # Shifts add the types of later updates to their own copy of the index
+        type2index = dict(self.type2index)
+        type2index.update(zip(new_types, range(n_ref, n_ref+len(new_types))))
+        index2type = self.index2type + new_types
+        n = len(index2type)
+        freq_ref = np.zeros(n)
+        freq_ref[:n_ref] = self.freq
+        scores = np.empty(n)
+        scores[:n_ref] = self.scores
+        scores[n_ref:] = [self.type2score[t] for t in new_types]
+        freq = get_system_matrix([type2freq], type2index)[:,0]
+        return type2index, index2type, freq_ref, freq, scores
@@ -10,7 +10,6 @@ import os
 import sys
 import warnings
 import numpy as np
-import matplotlib.pyplot as plt
 
 import shifterator.shifterator as shifterator
 from .helper import *
@@ -28,7 +27,9 @@ class RelativeShift(shifterator.Shift):
         Parameters
         ----------
         reference, comparison: dict
-            keys are types of a system and values are frequencies of those types
+            keys are types of a system and values are frequencies of those types.
+            reference may also be a ReferenceProfile, whose lexicon and stop
+            lens then replace type2score_ref and stop_lens
         type2score_ref, type2score_comp: dict or str, optional
             if dict, types are keys and values are "scores" associated with each
             type (e.g., sentiment). If str, the name of a score dict. If None
@@ -64,7 +65,8 @@ class SentimentShift(RelativeShift):
         ----------
         reference, comparison: dict
             keys are word types of a text and values are frequencies of those
-            types
+            types. reference may also be a ReferenceProfile, whose sentiment
+            dict and stop lens are then used for the reference
         type2score_ref, type2score_comp: dict or str, optional
             if dict, word types are keys and values are sentiment scores
             associated with each type. If str, the name of a sentiment
@@ -99,33 +101,28 @@ class EntropyShift(RelativeShift):
         the reference score from which to calculate the deviation. If None,
         defaults to the entropy of reference
     """
+    _freq_dependent_scores = True
+    _graph_plot_defaults = {'detailed': False}
+
     def __init__(self, reference, comparison, base=2, stop_lens=None):
-        # Get surprisal scores
-        type2p_ref,type2p_comp,type2s_ref,type2s_comp = get_surprisal_scores(reference,
-                                                                             comparison,
-                                                                             base=2, alpha=1)
-        # Set zero surprisal scores for types that do not appear
-        types = set(type2s_ref.keys()).union(set(type2s_comp.keys()))
-        for t in types:
-            if t not in type2s_ref:
-                type2s_ref[0] = 0
-            elif t not in type2s_comp:
-                type2s_comp[t] = 0
+        # Get surprisal scores, aligned to the types of both systems
+        type2index,type2index_ref,type2index_comp,p_ref,p_comp = get_aligned_probs(get_type_mapping(reference),
+                                                                                   get_type_mapping(comparison))
+        s_ref = -get_log_array(p_ref, base, force_zero=True)
+        s_comp = -get_log_array(p_comp, base, force_zero=True)
+        type2p_ref = TypeArrayView(type2index_ref, p_ref)
+        type2p_comp = TypeArrayView(type2index_comp, p_comp)
+        # Set zero surprisal scores for types that do not appear in the
+        # comparison. Types that do not appear in the reference borrow their
+        # comparison surprisal as a missing score
+        type2s_ref = TypeArrayView(type2index_ref, s_ref)
+        type2s_comp = TypeArrayView(type2index, s_comp)
         # Initialize shift
         RelativeShift.__init__(self, reference, comparison, type2s_ref,
                                type2s_comp, stop_lens, reference_value=0)
         self.type2p_ref = type2p_ref
         self.type2p_comp = type2p_comp
 
-    def get_shift_graph(self, top_n=50, normalize=True, text_size_inset=True,
-                        cumulative_inset=True, show_plot=True, filename=None,
-                        detailed=False, **kwargs):
-        RelativeShift.get_shift_graph(self, top_n=top_n, normalize=normalize,
-                                      text_size_inset=text_size_inset,
-                                      cumulative_inset=cumulative_inset,
-                                      show_plot=show_plot, filename=filename,
-                                      detailed=detailed, **kwargs)
-
 class KLDivergenceShift(RelativeShift):
     """
     Shift object for calculating the KL Divergence between two systems
@@ -142,6 +139,9 @@ class KLDivergenceShift(RelativeShift):
         denotes intervals that should be excluded when calculating shift
         scores
     """
+    _freq_dependent_scores = True
+    _graph_plot_defaults = {'detailed': False}
+
     def __init__(self, reference, comparison, base=2, stop_lens=None):
         # Check that KLD is well defined
         reference_types = set(reference.keys())
@@ -155,18 +155,9 @@ class KLDivergenceShift(RelativeShift):
         # Get surprisal scores
         type2p_ref,type2p_comp,type2s_ref,type2s_comp = get_surprisal_scores(reference,
                                                                              comparison,
-                                                                             base=2, alpha=1)
+                                                                             base=base, alpha=1)
         # Initialize shift
         RelativeShift.__init__(self, comparison, comparison, type2s_ref,
                                type2s_comp, stop_lens, reference_value=0)
         self.type2p_ref = type2p_ref
         self.type2p_comp = type2p_comp
-
-    def get_shift_graph(self, top_n=50, normalize=True, text_size_inset=True,
-                        cumulative_inset=True, show_plot=True, filename=None,
-                        detailed=False, **kwargs):
-        RelativeShift.get_shift_graph(self, top_n=top_n, normalize=normalize,
-                                      text_size_inset=text_size_inset,
-                                      cumulative_inset=cumulative_inset,
-                                      show_plot=show_plot, filename=filename,
-                                      detailed=detailed, **kwargs)
@@ -4,9 +4,8 @@ shifterator.py
 Requires: Python 3
 
 TODO:
-- Add funcs to shift class that allow for easy updating of type2freq dicts
-- Make it easy to remove / reset the filter. This will involve having to hold
-  onto stop words, their freqs, and their values (discarded as of now)
+- Make it easy to remove / reset the filter, using the stop words, their
+  freqs, and their values held onto by the shift
 - Make it so you can specify words as stop words instead of just a filter window
 """
 
@@ -14,16 +13,25 @@ import os
 import sys
 import warnings
 import numpy as np
-import matplotlib.pyplot as plt
 from collections import Counter
 
 from .helper import *
-from .plotting import *
+from .instrumentation import instrumented, record_stage
+from .bootstrap import get_bootstrap_intervals
+from .reference_profile import ReferenceProfile
 
 # ------------------------------------------------------------------------------
 # ---------------------------- GENERAL SHIFT CLASS -----------------------------
 # ------------------------------------------------------------------------------
 class Shift:
+    # Whether the type scores are calculated from the frequencies of the
+    # systems, so they cannot be held fixed across updates or resamples
+    _freq_dependent_scores = False
+    # Plotting parameters of the shift graphs of this type of shift: defaults
+    # for parameters that are not set, and parameters that are always used
+    _graph_plot_defaults = {}
+    _graph_plot_overrides = {}
+
     def __init__(self, system_1, system_2, type2score_1=None, type2score_2=None,
                  reference_value=None, stop_lens=None, encoding='utf-8'):
         """
@@ -32,14 +40,18 @@ class Shift:
 
         Parameters
         ----------
-        system_1, system_2: dict
+        system_1, system_2: dict, pandas.Series or tuple
             keys are types of a system and values are frequencies
-            of those types
-        type2score_1, type2score_2: dict or str, optional
+            of those types. Series (indexed by type) and (types, freqs) pairs
+            of aligned arrays are used without copying them into dicts.
+            system_1 may also be a ReferenceProfile, whose lexicon and stop
+            lens then replace type2score_1 and stop_lens
+        type2score_1, type2score_2: dict, str, pandas.Series or tuple, optional
             if dict, types are keys and values are "scores" associated with each
             type (e.g., sentiment). If str, either the name of a score dict or
             file path to a score dict, where types and scores are given on each
-            line, separated by commas. If None and other type2score is None,
+            line, separated by commas. Series and (types, scores) pairs are
+            used without a copy. If None and other type2score is None,
             defaults to uniform scores across types. Otherwise defaults to the
             other type2score dict
         reference_value: float, optional
@@ -51,14 +63,23 @@ class Shift:
         encoding: str, optional
             encoding for reading in a lexicon included in Shifterator
         """
-        # Set type2freq dictionaries
-        self.type2freq_1 = system_1
-        self.type2freq_2 = system_2
+        # Reuse the lexicon, stop lens and filtered reference of a profile
+        if isinstance(system_1, ReferenceProfile):
+            self.reference_profile = system_1
+            system_1 = self.reference_profile.type2freq
+            type2score_1 = self.reference_profile.lexicon
+            stop_lens = self.reference_profile.stop_lens
+        else:
+            self.reference_profile = None
+        # Set type2freq dictionaries, viewing Series and arrays without a copy
+        self.type2freq_1 = get_type_mapping(system_1)
+        self.type2freq_2 = get_type_mapping(system_2)
         # Set type2score dictionaries
         if type2score_1 is not None and type2score_2 is not None:
             self.type2score_1 = get_score_dictionary(type2score_1, encoding)
             self.type2score_2 = get_score_dictionary(type2score_2, encoding)
-            if type2score_1 != type2score_2:
+            if self.type2score_1 is not self.type2score_2\
+            and self.type2score_1 != self.type2score_2:
                 self.show_score_diffs = True
             else:
                 self.show_score_diffs = False
@@ -74,19 +95,50 @@ class Shift:
             self.type2score_1 = {t : 1 for t in self.type2freq_1}
             self.type2score_2 = {t : 1 for t in self.type2freq_2}
             self.show_score_diffs = False
+        self.uniform_scores = type2score_1 is None and type2score_2 is None
         # Filter type dictionaries by stop lense
         self.stop_lens = stop_lens
         if stop_lens is not None:
-            self.type2freq_1,self.type2score_1,sw_1 = filter_by_scores(self.type2freq_1,
-                                                                       self.type2score_1,
-                                                                       stop_lens)
-            self.type2freq_2,self.type2score_2,sw_2 = filter_by_scores(self.type2freq_2,
-                                                                       self.type2score_2,
-                                                                       stop_lens)
-            self.stop_words = sw_1.union(sw_2)
+            if self.reference_profile is not None:
+                filtered_1 = self.reference_profile.get_filtered()
+            else:
+                filtered_1 = split_by_scores(self.type2freq_1, self.type2score_1,
+                                             stop_lens)
+            if self.type2score_2 is self.type2score_1:
+                # Find the stop words of a shared score dict only once
+                filtered_2 = split_by_scores(self.type2freq_2, self.type2score_2,
+                                             stop_lens, filtered_1['stop_words'])
+                filtered_2['type2score'] = filtered_1['type2score']
+            else:
+                filtered_2 = split_by_scores(self.type2freq_2, self.type2score_2,
+                                             stop_lens)
+            self.type2freq_1 = filtered_1['type2freq']
+            self.type2score_1 = filtered_1['type2score']
+            self.type2freq_2 = filtered_2['type2freq']
+            self.type2score_2 = filtered_2['type2score']
+            self._stop_words = (filtered_1['stop_words'], filtered_2['stop_words'])
+            self.stop_words = self._stop_words[0].union(self._stop_words[1])
+            # Hold onto the stopped types, their freqs, and their scores
+            self.type2freq_stopped_1 = filtered_1['type2freq_stopped']
+            self.type2freq_stopped_2 = filtered_2['type2freq_stopped']
+            self.type2score_stopped_1 = filtered_1['type2score_stopped']
+            self.type2score_stopped_2 = filtered_2['type2score_stopped']
+            if self.uniform_scores:
+                # Uniform scores are owned by the shift and may gain new types
+                self.type2score_1 = self.type2score_1.copy()
+                self.type2score_2 = self.type2score_2.copy()
+        else:
+            self._stop_words = (set(), set())
+            self.stop_words = set()
+            self.type2freq_stopped_1 = dict()
+            self.type2freq_stopped_2 = dict()
+            self.type2score_stopped_1 = dict()
+            self.type2score_stopped_2 = dict()
         # Get common vocabulary
         self.types = self.get_types(self.type2freq_1, self.type2score_1,
                                     self.type2freq_2, self.type2score_2)
+        # Hold onto the scores of each system before they borrow missing scores
+        self._system_scores = (self.type2score_1, self.type2score_2)
         # Assume missing scores in each vocabulary (TODO: add options)
         missing_scores_info = get_missing_scores(self.type2score_1, self.type2score_2)
         self.type2score_1 = missing_scores_info[0]
@@ -95,18 +147,61 @@ class Shift:
         #self.missing_score_types = set()
 
         # Set reference value
+        self.default_reference_value = reference_value is None
         if reference_value is not None:
             self.reference_value = reference_value
+        elif self.reference_profile is not None\
+        and self.type2score_1 is self.reference_profile.type2score:
+            self.reference_value = self.reference_profile.reference_value
         else:
             self.reference_value = self.get_weighted_score(self.type2freq_1,
                                                            self.type2score_1)
         # Set default score shift values
         self.diff = None
+        self.type2index = None
+        self.index2type = None
+        self.shift_arrays = None
+        self.shift_totals = None
+        self._aligned = False
+        self._update_pending = False
+        # Whether the type2freq dicts are copies that updates may change
+        self._owns_systems = False
         self.type2p_diff = None
         self.type2s_diff = None
         self.type2p_avg = None
         self.type2s_ref_diff = None
         self.type2shift_score = None
+        self.comp_sums = None
+
+    @classmethod
+    def from_matrix(cls, matrix, vocabulary, rows_1, rows_2, *args, **kwargs):
+        """
+        Builds a shift between two groups of rows of a document-term matrix.
+        The rows of each group are summed without densifying the matrix, and
+        only the nonzero counts become the systems of the shift
+
+        Parameters
+        ----------
+        matrix: scipy.sparse matrix or np.ndarray
+            (documents x types) counts, e.g. a CSR document-term matrix
+        vocabulary: list or np.ndarray
+            the type of each column of matrix
+        rows_1, rows_2: np.ndarray
+            rows of system_1 and system_2, as boolean masks (e.g. labels == 'a')
+            or arrays of row positions
+        args, kwargs:
+            the remaining parameters of the shift class, e.g. type2score_1 for
+            Shift or base for JSDivergenceShift
+
+        Returns
+        -------
+        shift: Shift
+            a shift of the class it is called on
+        """
+        counts = get_group_counts(matrix, [rows_1, rows_2])
+        system_1 = get_count_dict(vocabulary, counts[:,0])
+        system_2 = get_count_dict(vocabulary, counts[:,1])
+        return cls(system_1, system_2, *args, **kwargs)
 
     def get_types(self, type2freq_1, type2score_1, type2freq_2, type2score_2):
         """
@@ -120,10 +215,22 @@ class Shift:
         type2score: dict
             keys are types and values are scores
         """
-        # Get observed types that are also in score dicts
-        types_1 = set(type2freq_1.keys()).intersection(set(type2score_1.keys()))
-        types_2 = set(type2freq_2.keys()).intersection(set(type2score_2.keys()))
-        types = types_1.union(types_2)
+        # Get observed types that are also in score dicts. Look up the types of
+        # the smaller side, so large lexicons are never copied into sets
+        types = set()
+        profile = self.reference_profile
+        for type2freq,type2score in [(type2freq_1, type2score_1),
+                                     (type2freq_2, type2score_2)]:
+            if profile is not None and type2freq is profile.type2freq\
+            and type2score is profile.type2score:
+                # The scored types of a profile are already known
+                types.update(profile.types)
+                continue
+            type2score = get_type_keys(type2score)
+            if len(type2freq) <= len(type2score):
+                types.update(t for t in type2freq if t in type2score)
+            else:
+                types.update(t for t in type2score if t in type2freq)
         return types
 
     def get_weighted_score(self, type2freq, type2score):
@@ -154,6 +261,7 @@ class Shift:
         s_avg = s_weighted / f_total
         return s_avg
 
+    @instrumented('get_shift_scores')
     def get_shift_scores(self, type2freq_1=None, type2score_1=None,
                          type2freq_2=None, type2score_2=None,
                          reference_value=None, normalize=True, details=False):
@@ -176,21 +284,22 @@ class Shift:
 
         Returns
         -------
-        type2p_diff: dict
-            if details is True, returns dict where keys are types and values are
+        type2p_diff: TypeArrayView
+            if details is True, returns dict view where keys are types and values are
             the difference in relatively frequency, i.e. p_i,2 - p_i,1 for type i
-        type2s_diff: dict,
-            if details is True, returns dict where keys are types and values are
+        type2s_diff: TypeArrayView
+            if details is True, returns dict view where keys are types and values are
             the relative differences in score, i.e. s_i,2 - s_i,1 for type i
-        type2p_avg: dict,
-            if details is True, returns dict where keys are types and values are
+        type2p_avg: TypeArrayView
+            if details is True, returns dict view where keys are types and values are
             the average relative frequencies, i.e. 0.5*(p_i,1+p_i,2) for type i
-        type2s_ref_diff: dict
-            if details is True, returns dict where keys are types and values are
+        type2s_ref_diff: TypeArrayView
+            if details is True, returns dict view where keys are types and values are
             relative deviation from reference score, i.e. 0.5*(s_i,2+s_i,1)-s_ref
             for type i
-        type2shift_score: dict
-            keys are types and values are shift scores
+        type2shift_score: TypeArrayView
+            keys are types and values are shift scores. The dict views are
+            backed by the arrays in shift_arrays, aligned to type2index
         """
         # Check input of type2freq and type2score dicts
         if type2freq_1 is None:
@@ -206,106 +315,474 @@ class Shift:
         else:
             s_avg_ref = reference_value
 
-        # Get type vocabulary
-        types = self.get_types(type2freq_1, type2score_1,
-                               type2freq_2, type2score_2)
-
-        # Get total frequencies
-        total_freq_1 = sum([freq for t,freq in type2freq_1.items() if t in types])
-        total_freq_2 = sum([freq for t,freq in type2freq_2.items() if t in types])
-        # Get relative frequency of types in both systems
-        type2p_1 = {t:type2freq_1[t]/total_freq_1 if t in type2freq_1 else 0
-                    for t in types}
-        type2p_2 = {t:type2freq_2[t]/total_freq_2 if t in type2freq_2 else 0
-                    for t in types}
+        # Align both systems and both score dicts to a shared vocabulary index.
+        # After incremental updates the aligned arrays are already up to date
+        own_systems = type2freq_1 is self.type2freq_1\
+                      and type2score_1 is self.type2score_1\
+                      and type2freq_2 is self.type2freq_2\
+                      and type2score_2 is self.type2score_2
+        profile = self.reference_profile
+        if own_systems and self._aligned and self._update_pending:
+            type2index = self.type2index
+            index2type = self.index2type
+            freq_1 = self.shift_arrays['freq_1']
+            freq_2 = self.shift_arrays['freq_2']
+            score_1 = self.shift_arrays['score_1']
+            score_2 = self.shift_arrays['score_2']
+        elif profile is not None and type2freq_1 is profile.type2freq\
+        and type2score_1 is profile.type2score and type2score_2 is type2score_1:
+            # The reference is already aligned, only align the comparison
+            arrays = profile.get_aligned_arrays(type2freq_2)
+            type2index,index2type,freq_1,freq_2,score_1 = arrays
+            score_2 = score_1
+        else:
+            types = self.get_types(type2freq_1, type2score_1,
+                                   type2freq_2, type2score_2)
+            type2index = get_type_index(types)
+            index2type = list(type2index)
+            freq_1 = get_aligned_array(type2freq_1, type2index, fill=0)
+            freq_2 = get_aligned_array(type2freq_2, type2index, fill=0)
+            score_1 = get_aligned_array(type2score_1, type2index)
+            score_2 = get_aligned_array(type2score_2, type2index)
 
         # Calculate shift components
-        type2p_avg = dict()
-        type2p_diff = dict()
-        type2s_diff = dict()
-        type2s_ref_diff = dict()
-        type2shift_score = dict()
-        for t in types:
-            type2p_avg[t] = 0.5*(type2p_1[t]+type2p_2[t])
-            type2p_diff[t] = type2p_2[t]-type2p_1[t]
-            type2s_diff[t] = type2score_2[t]-type2score_1[t]
-            type2s_ref_diff[t] = 0.5*(type2score_2[t]+type2score_1[t])-s_avg_ref
-            type2shift_score[t] = type2p_diff[t]*type2s_ref_diff[t]\
-                                  +type2s_diff[t]*type2p_avg[t]
+        p_diff,s_diff,p_avg,s_ref_diff,shift_score = get_shift_component_arrays(freq_1,
+                                                                                freq_2,
+                                                                                score_1,
+                                                                                score_2,
+                                                                                s_avg_ref)
 
         # Normalize the total shift scores
-        total_diff = sum(type2shift_score.values())
+        total_diff = float(shift_score.sum())
         self.diff = total_diff
         if normalize:
-            type2shift_score = {t : shift_score/abs(total_diff) for t,shift_score
-                                in type2shift_score.items()}
+            shift_score = shift_score / abs(total_diff)
 
         # Set results in shift object (TODO: is this unexpected behavior?)
-        self.type2p_diff = type2p_diff
-        self.type2s_diff = type2s_diff
-        self.type2p_avg = type2p_avg
-        self.type2s_ref_diff = type2s_ref_diff
-        self.type2shift_score = type2shift_score
+        self.type2index = type2index
+        self.index2type = index2type
+        self.shift_arrays = {'freq_1': freq_1, 'freq_2': freq_2,
+                             'score_1': score_1, 'score_2': score_2,
+                             'p_diff': p_diff, 's_diff': s_diff, 'p_avg': p_avg,
+                             's_ref_diff': s_ref_diff,
+                             'shift_score': shift_score}
+        self.shift_totals = {'freq_1': freq_1.sum(), 'freq_2': freq_2.sum(),
+                             'weighted_1': np.dot(freq_1, score_1),
+                             'weighted_2': np.dot(freq_2, score_2)}
+        self._aligned = own_systems
+        self._update_pending = False
+        self.comp_sums = None
+        # Expose the arrays as lazy dict views for existing callers
+        self.type2p_diff = TypeArrayView(type2index, p_diff)
+        self.type2s_diff = TypeArrayView(type2index, s_diff)
+        self.type2p_avg = TypeArrayView(type2index, p_avg)
+        self.type2s_ref_diff = TypeArrayView(type2index, s_ref_diff)
+        self.type2shift_score = TypeArrayView(type2index, shift_score)
         # Return shift scores
         if details:
-            return type2p_diff,type2s_diff,type2p_avg,type2s_ref_diff,type2shift_score
+            return (self.type2p_diff, self.type2s_diff, self.type2p_avg,
+                    self.type2s_ref_diff, self.type2shift_score)
+        else:
+            return self.type2shift_score
+
+    def update_system_1(self, type2freq):
+        """
+        Adds frequencies to system_1 and updates the shift incrementally
+
+        Parameters
+        ----------
+        type2freq: dict
+            keys are types and values are frequencies to add to system_1.
+            Negative frequencies subtract from system_1
+
+        Raises a TypeError for EntropyShift, KLDivergenceShift and
+        JSDivergenceShift, see update_systems
+        """
+        self.update_systems(type2freq_1=type2freq)
+
+    def update_system_2(self, type2freq):
+        """
+        Adds frequencies to system_2 and updates the shift incrementally
+
+        Parameters
+        ----------
+        type2freq: dict
+            keys are types and values are frequencies to add to system_2.
+            Negative frequencies subtract from system_2
+
+        Raises a TypeError for EntropyShift, KLDivergenceShift and
+        JSDivergenceShift, see update_systems
+        """
+        self.update_systems(type2freq_2=type2freq)
+
+    def update_systems(self, type2freq_1=None, type2freq_2=None):
+        """
+        Adds frequencies to the systems and updates the shift incrementally.
+        Only the changed types are looked up and re-aligned, and the total
+        shift diff (and default reference value) is kept current from running
+        totals. The per-type shift components are recomputed from the aligned
+        arrays, without re-aligning the systems, the next time they are needed
+
+        The type2freq dicts of the shift object are copied from the input
+        systems on the first update and updated in place afterwards. Types
+        whose frequencies drop to zero are removed from the type2freq dicts, but
+        stay in the vocabulary index with zero contribution
+
+        Only shifts with fixed type scores can be updated incrementally. The
+        scores of EntropyShift, KLDivergenceShift and JSDivergenceShift depend
+        on the frequencies of the systems, so they raise a TypeError and should
+        be rebuilt from the updated systems instead
+
+        Parameters
+        ----------
+        type2freq_1, type2freq_2: dict
+            keys are types and values are frequencies to add to system_1 and
+            system_2 respectively. Negative frequencies subtract from a system
+        """
+        if self._freq_dependent_scores:
+            raise TypeError('{} scores depend on the frequencies of the '
+                            'systems, so the shift cannot be updated '
+                            'incrementally'.format(type(self).__name__))
+        # Check that no frequency would become negative before changing anything
+        for system,type2freq_sys,type2freq in [(1, self.type2freq_1, type2freq_1),
+                                               (2, self.type2freq_2, type2freq_2)]:
+            if type2freq is None:
+                continue
+            for t,f in type2freq.items():
+                # Filtered systems do not hold stopped or unscored types
+                if self.stop_lens is not None and t not in type2freq_sys\
+                and not self._is_scored(t, system):
+                    continue
+                if type2freq_sys.get(t, 0) + f < 0:
+                    raise ValueError('Update makes the frequency of type {} '
+                                     'negative'.format(t))
+        # Copy the systems on the first update, so that the dicts, Series or
+        # arrays the shift was built from are never changed
+        if not self._owns_systems:
+            self.type2freq_1 = dict(self.type2freq_1)
+            self.type2freq_2 = dict(self.type2freq_2)
+            self._owns_systems = True
+        # Align the current systems once, all later updates reuse the arrays
+        if not self._aligned:
+            self.get_shift_scores()
+        if type2freq_1 is not None:
+            self._update_system(1, type2freq_1)
+        if type2freq_2 is not None:
+            self._update_system(2, type2freq_2)
+
+        # Update totals from running sums. The total shift is the difference of
+        # the weighted scores of the systems, regardless of the reference value
+        totals = self.shift_totals
+        if self.default_reference_value:
+            self.reference_value = float(totals['weighted_1'] / totals['freq_1'])
+        self.diff = float(totals['weighted_2'] / totals['freq_2']
+                          - totals['weighted_1'] / totals['freq_1'])
+        # Invalidate per-type results until they are recomputed
+        for arr in ['p_diff', 's_diff', 'p_avg', 's_ref_diff', 'shift_score']:
+            self.shift_arrays.pop(arr, None)
+        self.type2p_diff = None
+        self.type2s_diff = None
+        self.type2p_avg = None
+        self.type2s_ref_diff = None
+        self.type2shift_score = None
+        self.comp_sums = None
+        self._update_pending = True
+
+    def _update_system(self, system, type2freq):
+        """
+        Applies frequency updates to the type2freq dict, aligned arrays and
+        running totals of system 1 or 2, touching only the updated types
+        """
+        if system == 1:
+            type2freq_sys = self.type2freq_1
         else:
-            return type2shift_score
+            type2freq_sys = self.type2freq_2
+        type2index = self.type2index
+        rows = []
+        deltas = []
+        new_types = []
+        for t,f in type2freq.items():
+            if not self._is_scored(t, system):
+                # Unscored types are only kept if the system is not filtered
+                if self.stop_lens is None:
+                    f_new = type2freq_sys.get(t, 0) + f
+                    if f_new == 0:
+                        type2freq_sys.pop(t, None)
+                    else:
+                        type2freq_sys[t] = f_new
+                elif t in self._stop_words[system-1]:
+                    self._update_stopped(system, t, f)
+                continue
+            i = type2index.get(t)
+            if i is None:
+                i = len(type2index) + len(new_types)
+                new_types.append((t, self._get_new_type_scores(t)))
+            rows.append(i)
+            deltas.append(f)
+            f_new = type2freq_sys.get(t, 0) + f
+            if f_new == 0:
+                type2freq_sys.pop(t, None)
+            else:
+                type2freq_sys[t] = f_new
+        # Append new types to the vocabulary index and aligned arrays
+        if len(new_types) > 0:
+            for t,_ in new_types:
+                type2index[t] = len(type2index)
+                self.index2type.append(t)
+                self.types.add(t)
+            new_scores = np.array([scores for _,scores in new_types],
+                                  dtype=np.float64)
+            arrays = self.shift_arrays
+            arrays['freq_1'] = np.concatenate([arrays['freq_1'],
+                                               np.zeros(len(new_types))])
+            arrays['freq_2'] = np.concatenate([arrays['freq_2'],
+                                               np.zeros(len(new_types))])
+            arrays['score_1'] = np.concatenate([arrays['score_1'], new_scores[:,0]])
+            arrays['score_2'] = np.concatenate([arrays['score_2'], new_scores[:,1]])
+        # Update aligned frequencies and running totals of the changed types
+        rows = np.array(rows, dtype=np.int64)
+        deltas = np.array(deltas, dtype=np.float64)
+        freq = self.shift_arrays['freq_{}'.format(system)]
+        score = self.shift_arrays['score_{}'.format(system)]
+        freq[rows] += deltas
+        self.shift_totals['freq_{}'.format(system)] += deltas.sum()
+        self.shift_totals['weighted_{}'.format(system)] += np.dot(deltas,
+                                                                  score[rows])
+
+    def _update_stopped(self, system, t, f):
+        """
+        Applies a frequency update to a stopped type of system 1 or 2
+        """
+        if system == 1:
+            type2freq_stopped = self.type2freq_stopped_1
+            type2score_stopped = self.type2score_stopped_1
+        else:
+            type2freq_stopped = self.type2freq_stopped_2
+            type2score_stopped = self.type2score_stopped_2
+        f_new = type2freq_stopped.get(t, 0) + f
+        if f_new == 0:
+            type2freq_stopped.pop(t, None)
+            type2score_stopped.pop(t, None)
+        else:
+            type2freq_stopped[t] = f_new
+            if self.uniform_scores:
+                type2score_stopped[t] = 1
+            else:
+                # Filtered score dicts are views of the full score dicts
+                type2score_stopped[t] = self._system_scores[system-1].type2score[t]
+
+    def _is_scored(self, t, system):
+        """
+        Checks whether the frequencies of a type count towards the shift of
+        system 1 or 2, i.e. whether it has a score that is not stopped
+        """
+        if self.uniform_scores:
+            # Uniform scores cover every observed type
+            return self.stop_lens is None\
+                   or not get_stop_mask(1, self.stop_lens)
+        if self.stop_lens is not None:
+            # Filtered systems only hold types scored by their own score dict
+            return t in self._system_scores[system-1]
+        return t in self.type2score_1
+
+    def _get_new_type_scores(self, t):
+        """
+        Returns the scores of a scored type that is new to the vocabulary
+        """
+        if self.uniform_scores and t not in self.type2score_1:
+            self.type2score_1[t] = 1
+        if self.uniform_scores and t not in self.type2score_2:
+            self.type2score_2[t] = 1
+        return (self.type2score_1[t], self.type2score_2[t])
 
+    @instrumented('get_shift_component_sums')
     def get_shift_component_sums(self, type2freq_1=None, type2score_1=None,
                                  type2freq_2=None, type2score_2=None,
                                  reference_value=None, normalize=True):
         """
+        Sums the contributions of all types into the six types of contributions
+        shown in shift graphs. The sums are cached with the shift scores, and
+        are only recalculated once the shift scores or systems change
+
+        Parameters
+        ----------
+        type2freq_1, type2score_1, type2freq_2, type2score_2, reference_value:
+            see get_shift_scores. If all are None, the cached sums of the shift
+            object are returned when available
+        normalize: bool
+            passed to get_shift_scores if the shift scores are recalculated
 
+        Returns
+        -------
+        comp_sums: dict
+            'pos_s_pos_p', 'pos_s_neg_p', 'neg_s_pos_p', 'neg_s_neg_p', 'pos_s'
+            and 'neg_s', the sums of p_diff*s_ref_diff and p_avg*s_diff split by
+            the signs of their components
         """
-        # Check input of type2freq and type2score dicts
-        if type2freq_1 is None:
-            type2freq_1 = self.type2freq_1
-        if type2score_1 is None:
-            type2score_1 = self.type2score_1
-        if type2freq_2 is None:
-            type2freq_2 = self.type2freq_2
-        if type2score_2 is None:
-            type2score_2 = self.type2score_2
         # Get shift scores
+        inputs = [type2freq_1, type2score_1, type2freq_2, type2score_2,
+                  reference_value]
+        if any(arg is not None for arg in inputs):
+            self.get_shift_scores(type2freq_1, type2score_1, type2freq_2,
+                                  type2score_2, reference_value, normalize,
+                                  details=False)
+        elif self.type2shift_score is None:
+            self.get_shift_scores(normalize=normalize, details=False)
+
+        # Sum up components of shift score
+        if self.comp_sums is None:
+            arrays = self.shift_arrays
+            comp_sums = get_component_sums(arrays['p_diff'], arrays['s_diff'],
+                                           arrays['p_avg'], arrays['s_ref_diff'])
+            self.comp_sums = {comp : float(comp_sum)
+                              for comp,comp_sum in comp_sums.items()}
+        return dict(self.comp_sums)
+
+    def get_bootstrap_intervals(self, n_samples=1000, confidence=0.95,
+                                normalize=True, chunk_size=1000, n_jobs=None,
+                                seed=None):
+        """
+        Calculates bootstrap percentile intervals of the total shift and of the
+        shift score of each type, by resampling both systems from multinomial
+        distributions. Replicates are scored as batched arrays, chunk_size
+        types at a time, instead of rebuilding the shift for each replicate
+
+        The type scores are held fixed across replicates, so bootstrapping is
+        only supported by shifts with fixed scores, e.g. Shift, RelativeShift,
+        SentimentShift and ProportionShift. The scores of EntropyShift,
+        KLDivergenceShift and JSDivergenceShift depend on the frequencies of
+        the systems, and they raise a TypeError. Both systems must hold integer
+        token counts, otherwise a ValueError is raised
+
+        Parameters
+        ----------
+        n_samples: int
+            number of bootstrap replicates
+        confidence: float
+            confidence level of the percentile intervals
+        normalize: bool
+            if True, divides the per-type bounds by the absolute total shift of
+            the shift object, so they are on the scale of normalized shift
+            scores. The interval of the total shift is never normalized
+        chunk_size: int
+            number of types scored at once. Memory of intermediate arrays is
+            bounded by chunk_size x n_samples
+        n_jobs: int, optional
+            if not None, the number of worker processes to split chunks across
+        seed: int, optional
+            seed of the random number generator, for reproducible intervals
+
+        Returns
+        -------
+        intervals: dict
+            'diff' ((lower, upper) of the total shift), 'diff_samples' (total
+            shift of each replicate), and 'lower' and 'upper' (TypeArrayViews
+            where keys are types and values are the bounds of their shift
+            scores, aligned to type2index)
+        """
+        if self._freq_dependent_scores:
+            raise TypeError('{} scores depend on the frequencies of the '
+                            'systems, so they cannot be held fixed across '
+                            'resamples'.format(type(self).__name__))
         if self.type2shift_score is None:
-            shift_scores = self.get_shift_scores(type2freq_1, type2score_1,
-                                                 type2freq_2, type2score_2,
-                                                 reference_value, normalize,
-                                                 details=True)
+            self.get_shift_scores(normalize=normalize, details=False)
+        arrays = self.shift_arrays
+        # Resample the reference value along with system 1 if it is its default
+        if self.default_reference_value:
+            reference_value = None
         else:
-            shift_scores = [(t, self.type2p_diff[t], self.type2s_diff[t],
-                             self.type2p_avg[t], self.type2s_ref_diff[t],
-                             self.type2shift_score[t]) for t in self.type2s_diff]
+            reference_value = self.reference_value
+        intervals = get_bootstrap_intervals(arrays['freq_1'], arrays['freq_2'],
+                                            arrays['score_1'], arrays['score_2'],
+                                            reference_value, n_samples,
+                                            confidence, chunk_size, n_jobs,
+                                            seed)
+        lower = intervals['lower']
+        upper = intervals['upper']
+        if normalize:
+            lower = lower / abs(self.diff)
+            upper = upper / abs(self.diff)
+        intervals['lower'] = TypeArrayView(self.type2index, lower)
+        intervals['upper'] = TypeArrayView(self.type2index, upper)
+        return intervals
+
+    def get_shift_graph_data(self, top_n=50, normalize=True,
+                             text_size_inset=True, cumulative_inset=True):
+        """
+        Collects the data drawn in a shift graph. The data only holds the top_n
+        types and a few totals, so graphs can be drawn without the full shift,
+        e.g. by worker processes
 
-        # Sum up components of shift score
-        pos_s_pos_p = 0
-        pos_s_neg_p = 0
-        neg_s_pos_p = 0
-        neg_s_neg_p = 0
-        pos_s = 0
-        neg_s = 0
-        for t,p_diff,s_diff,p_avg,s_ref_diff, _ in shift_scores:
-            # Get contribution of p_diff*s_ref_diff term
-            if s_ref_diff > 0:
-                if p_diff > 0:
-                    pos_s_pos_p += p_diff * s_ref_diff
-                else:
-                    pos_s_neg_p += p_diff * s_ref_diff
-            else:
-                if p_diff > 0:
-                    neg_s_pos_p += p_diff * s_ref_diff
-                else:
-                    neg_s_neg_p += p_diff * s_ref_diff
-            # Get contribution of s_diff term
-            if s_diff > 0:
-                pos_s += p_avg * s_diff
-            else:
-                neg_s += p_avg * s_diff
+        Parameters
+        ----------
+        top_n, normalize, text_size_inset, cumulative_inset:
+            see get_shift_graph
 
-        return {'pos_s_pos_p': pos_s_pos_p, 'pos_s_neg_p': pos_s_neg_p,
-                'neg_s_pos_p': neg_s_pos_p, 'neg_s_neg_p': neg_s_neg_p,
-                'pos_s': pos_s, 'neg_s': neg_s}
+        Returns
+        -------
+        graph_data: dict
+            'top_n', 'type_scores' (list of (type, p_diff, s_diff, p_avg,
+            s_ref_diff, shift_score) tuples of the top_n types, in plotting
+            order), 'missing' (whether each top type borrowed a score), 'norm',
+            'comp_sums', 'cumulative' ((ranks, cum_scores) or None),
+            'text_sizes' ((total freq of system_1, of system_2) or None),
+            'weighted_scores' and 'show_score_diffs'
+        """
+        # Get type score components
+        if self.type2shift_score is None:
+            self.get_shift_scores(details=False)
+        # Rank the top n types with a partial selection, shared with the inset
+        arrays = self.shift_arrays
+        top_indices = get_top_n_indices(arrays['shift_score'], top_n)
+        # Reverse top n for plotting
+        type_scores = list(zip([self.index2type[i] for i in top_indices[::-1]],
+                               *[arrays[arr][top_indices[::-1]].tolist()
+                                 for arr in ['p_diff', 's_diff', 'p_avg',
+                                             's_ref_diff', 'shift_score']]))
+        missing = [t in self.missing_score_types for t,_,_,_,_,_ in type_scores]
+
+        if normalize:
+            norm = abs(self.diff)
+        else:
+            norm = 1
+        if cumulative_inset:
+            cumulative = get_cumulative_scores(arrays['shift_score'], top_indices)
+        else:
+            cumulative = None
+        if text_size_inset:
+            text_sizes = (sum(self.type2freq_1.values()),
+                          sum(self.type2freq_2.values()))
+        else:
+            text_sizes = None
+        weighted_scores = (self.get_weighted_score(self.type2freq_1,
+                                                   self.type2score_1),
+                           self.get_weighted_score(self.type2freq_2,
+                                                   self.type2score_2))
+        return {'top_n': top_n, 'type_scores': type_scores, 'missing': missing,
+                'norm': norm, 'comp_sums': self.get_shift_component_sums(),
+                'cumulative': cumulative, 'text_sizes': text_sizes,
+                'weighted_scores': weighted_scores,
+                'show_score_diffs': self.show_score_diffs}
+
+    def get_graph_plot_params(self, kwargs):
+        """
+        Returns the plotting parameters of the shift graph of the shift, with
+        the graph defaults of this type of shift for unset parameters
+
+        Parameters
+        ----------
+        kwargs: dict
+            plotting parameters set for the graph
+
+        Returns
+        -------
+        plot_params: dict
+            kwargs with the defaults and fixed parameters of this type of shift
+        """
+        plot_params = dict(self._graph_plot_defaults)
+        plot_params.update(kwargs)
+        plot_params.update(self._graph_plot_overrides)
+        return plot_params
 
     def get_shift_graph(self, top_n=50, normalize=True, text_size_inset=True,
                         cumulative_inset=True, show_plot=True, filename=None,
@@ -331,103 +808,30 @@ class Shift:
         ax
             Matplotlib ax of shift graph. Displays shift graph if show_plot=True
         """
-        # Set plotting parameters
-        kwargs = get_plot_params(kwargs, self.show_score_diffs)
-
-        # Get type score components
-        if self.type2shift_score is None:
-            self.get_shift_scores(details=False)
-        type_scores = [(t, self.type2p_diff[t], self.type2s_diff[t],
-                        self.type2p_avg[t], self.type2s_ref_diff[t],
-                        self.type2shift_score[t]) for t in self.type2s_diff]
-        # Reverse sorting to get highest scores, then reverse top n for plotting
-        type_scores = sorted(type_scores, key=lambda x:abs(x[-1]),
-                             reverse=True)[:top_n]
-        type_scores.reverse()
-
-        # Get bar heights and colors
-        if normalize:
-            norm = abs(self.diff)
-        else:
-            norm = 1
-        bar_dims = get_bar_dims(type_scores, norm, kwargs)
-        bar_colors = get_bar_colors(type_scores, kwargs)
-
-        # Initialize plot
-        f,ax = plt.subplots(figsize=(kwargs['width'], kwargs['height']))
-        ax.margins(kwargs['y_margin'])
-        # Plot type contributions
-        ax = plot_contributions(ax, top_n, bar_dims, bar_colors, kwargs)
-        # Plot total sum contributions
-        total_comp_sums = self.get_shift_component_sums()
-        bar_order = get_bar_order(kwargs)
-        ax,comp_bar_heights,bar_order = plot_total_contribution_sums(ax, total_comp_sums,
-                                                                     bar_order, top_n,
-                                                                     bar_dims, kwargs)
-        # Get labels for bars
-        type_labels = [t for (t,_,_,_,_,_) in type_scores]
-        # Add indicator if type borrwed a score
-        m_sym = kwargs['missing_symbol']
-        type_labels = [t + m_sym if t in self.missing_score_types else t
-                       for t in type_labels]
-        # Get labels for total contribution bars
-        bar_labels = [kwargs['symbols'][b] for b in bar_order]
-        labels = type_labels + bar_labels
-        # Set font type
-        if kwargs['serif']:
-            set_serif()
-        if kwargs['detailed']:
-            ax = set_bar_labels(f, ax, top_n, labels, bar_dims['label_heights'],
-                                comp_bar_heights, kwargs)
-        else:
-            ax = set_bar_labels(f, ax, top_n, labels, bar_dims['total_heights'],
-                                comp_bar_heights, kwargs)
-
-        # Add center dividing line
-        ax.axvline(0, ls='-', color='black', lw=0.8, zorder=20)
+        # Load plotting modules on first use so scoring does not need matplotlib
+        import matplotlib.pyplot as plt
+        from . import plotting
 
-        # Add dividing line between words and component bars
-        ax.axhline(top_n+1, ls='-', color='black', lw=0.7, zorder=20)
-        if kwargs['show_total']:
-            ax.axhline(top_n+2.75, ls='-', color='black', lw=0.5, zorder=20)
-
-        # Set cumulative diff inset
-        if cumulative_inset:
-            f = get_cumulative_inset(f, self.type2shift_score, top_n, kwargs)
-        if text_size_inset:
-            f = get_text_size_inset(f, self.type2freq_1, self.type2freq_2, kwargs)
-        # Set guidance arrows (for relative plot)
-        #if guidance:
-        #    ax = get_guidance_annotations(ax, top_n, annotation_text=None)
-
-        # Make x-tick labels bigger, flip y-axis ticks and label every 5th one
-        ax = set_ticks(ax, top_n, kwargs)
-
-        # Set axis spines 
-        ax = set_spines(ax, kwargs)
-
-        # Set axis labels and title
-        ax.set_xlabel(kwargs['xlabel'], fontsize=kwargs['xlabel_fontsize'])
-        ax.set_ylabel(kwargs['ylabel'], fontsize=kwargs['ylabel_fontsize'])
-        if kwargs['all_pos_contributions'] and 'title' not in kwargs:
-            kwargs['title'] = ''
-        elif 'title' not in kwargs:
-            s_avg_1 = self.get_weighted_score(self.type2freq_1,self.type2score_1)
-            s_avg_2 = self.get_weighted_score(self.type2freq_2,self.type2score_2)
-            title = r'$\Phi_{\Omega^{(2)}}$: $s_{avg}^{(1)}=$'+'{0:.2f}'\
-                    .format(s_avg_1)+'\n'\
-                    +r'$\Phi_{\Omega^{(1)}}$: $s_{avg}^{(2)}=$'+'{0:.2f}'\
-                    .format(s_avg_2)
-            kwargs['title'] = title
-        ax.set_title(kwargs['title'], fontsize=kwargs['title_fontsize'])
+        # Set plotting parameters
+        kwargs = plotting.get_plot_params(self.get_graph_plot_params(kwargs),
+                                          self.show_score_diffs)
+        # Get the compact data drawn in the graph and draw it
+        with record_stage('get_shift_graph_data'):
+            graph_data = self.get_shift_graph_data(top_n=top_n,
+                                                   normalize=normalize,
+                                                   text_size_inset=text_size_inset,
+                                                   cumulative_inset=cumulative_inset)
+        with record_stage('build_figure'):
+            f,ax = plotting.plot_shift_graph(graph_data, kwargs)
+            if kwargs['tight']:
+                with warnings.catch_warnings():
+                    warnings.simplefilter('ignore')
+                    plt.tight_layout()
 
         # Show and return plot
-        if kwargs['tight']:
-            with warnings.catch_warnings():
-                warnings.simplefilter('ignore')
-                plt.tight_layout()
         if filename is not None:
-            plt.savefig(filename, dpi=kwargs['dpi'])
+            with record_stage('savefig'):
+                plt.savefig(filename, dpi=kwargs['dpi'])
         if show_plot:
             plt.show()
         return ax
@@ -0,0 +1,243 @@
+"""
+stream_shift.py
+
+Sliding-window shifts over a stream of types, e.g. hourly windows of messages
+compared against a trailing reference window
+"""
+from collections import Counter, deque
+import numpy as np
+
+import shifterator.shifterator as shifterator
+from .helper import *
+
+# ------------------------------------------------------------------------------
+# ------------------------------- Stream monitor -------------------------------
+# ------------------------------------------------------------------------------
+class ShiftMonitor:
+    def __init__(self, window=1, reference_window=168, type2score_ref=None,
+                 type2score_comp=None, reference_value=None, stop_lens=None,
+                 top_n=10, encoding='utf-8'):
+        """
+        Monitor for calculating the shift of a sliding comparison window of a
+        stream from the trailing reference window that precedes it
+
+        The stream is consumed in buckets (e.g. one bucket per hour). The
+        comparison window holds the last `window` buckets and the reference
+        window holds the `reference_window` buckets before them. As a bucket
+        closes, the windows slide by adding and evicting only the counts of the
+        buckets that move, and the shift is updated incrementally. Memory is
+        bounded by the buckets within the windows, not by the stream length
+
+        Parameters
+        ----------
+        window: int
+            number of buckets in the comparison window
+        reference_window: int
+            number of buckets in the reference window
+        type2score_ref, type2score_comp: dict or str, optional
+            if dict, types are keys and values are "scores" associated with each
+            type (e.g., sentiment). If str, the name of a score dict. If None
+            and other type2score is None, defaults to uniform scores across
+            types. Otherwise defaults to the other type2score dict
+        reference_value: float, optional
+            the reference score from which to calculate the deviation. If None,
+            defaults to the weighted score of the reference window
+        stop_lens: iterable of 2-tuples, optional
+            denotes intervals that should be excluded when calculating shift
+            scores
+        top_n: int
+            number of top contributing types reported for each window
+        encoding: str, optional
+            encoding for reading in a lexicon included in Shifterator
+        """
+        self.window = window
+        self.reference_window = reference_window
+        # Load lexicons once and share them across rebuilt shifts
+        if type2score_ref is not None:
+            type2score_ref = get_score_dictionary(type2score_ref, encoding)
+        if type2score_comp is not None:
+            type2score_comp = get_score_dictionary(type2score_comp, encoding)
+        self.type2score_ref = type2score_ref
+        self.type2score_comp = type2score_comp
+        self.reference_value = reference_value
+        self.stop_lens = stop_lens
+        self.top_n = top_n
+        self.buckets = deque()
+        self.open_bucket = Counter()
+        self.n_buckets = 0
+        self.shift = None
+
+    def add(self, types):
+        """
+        Adds types to the open bucket
+
+        Parameters
+        ----------
+        types: dict or iterable
+            if dict, keys are types and values are their frequencies. Otherwise
+            an iterable of types, e.g. the tokens of a message
+        """
+        self.open_bucket.update(types)
+
+    def close_bucket(self):
+        """
+        Closes the open bucket and slides the windows forward by one bucket
+
+        Returns
+        -------
+        result: dict or None
+            the shift of the comparison window from the reference window (see
+            get_result), or None while no bucket has reached the reference
+            window yet
+        """
+        bucket = self.open_bucket
+        self.open_bucket = Counter()
+        self.buckets.append(bucket)
+        self.n_buckets += 1
+        # Get the counts that move between windows
+        delta_ref = Counter()
+        delta_comp = Counter(bucket)
+        if len(self.buckets) > self.window:
+            # The oldest comparison bucket moves into the reference window
+            moved = self.buckets[-(self.window+1)]
+            delta_comp.subtract(moved)
+            delta_ref.update(moved)
+        if len(self.buckets) > self.window + self.reference_window:
+            # The oldest reference bucket is evicted
+            delta_ref.subtract(self.buckets.popleft())
+        n_ref = len(self.buckets) - self.window
+        if n_ref <= 0:
+            return None
+
+        if self.shift is None:
+            self.shift = self.get_shift(self.get_window_counts(0, n_ref),
+                                        self.get_window_counts(n_ref, None))
+        else:
+            # Windows without scored types give undefined totals until they
+            # fill again, which get_result reports as an empty result
+            with np.errstate(divide='ignore', invalid='ignore'):
+                self.shift.update_systems(type2freq_1=_drop_zeros(delta_ref),
+                                          type2freq_2=_drop_zeros(delta_comp))
+            self.compact()
+        return self.get_result()
+
+    def consume(self, buckets):
+        """
+        Consumes a stream of buckets, yielding the shift after each one
+
+        Parameters
+        ----------
+        buckets: iterable
+            each item is the dict of type frequencies (or iterable of types) of
+            one bucket
+
+        Yields
+        ------
+        result: dict
+            the shift after each bucket once a bucket has reached the reference
+            window, see get_result
+        """
+        for bucket in buckets:
+            self.add(bucket)
+            result = self.close_bucket()
+            if result is not None:
+                yield result
+
+    def get_window_counts(self, start, stop):
+        """
+        Sums the counts of a range of closed buckets
+        """
+        counts = Counter()
+        for bucket in list(self.buckets)[start:stop]:
+            counts.update(bucket)
+        return dict(counts)
+
+    def get_shift(self, type2freq_ref, type2freq_comp):
+        """
+        Builds the shift of the comparison window from the reference window,
+        aligned so that later windows are applied as incremental updates
+        """
+        shift = shifterator.Shift(type2freq_ref, type2freq_comp,
+                                  type2score_1=self.type2score_ref,
+                                  type2score_2=self.type2score_comp,
+                                  reference_value=self.reference_value,
+                                  stop_lens=self.stop_lens)
+        # A reference window without scored types has no default reference
+        # value yet. Results only use the aligned arrays and running totals, so
+        # any reference value aligns the shift
+        reference_value = 0 if shift.reference_value is None else None
+        with np.errstate(divide='ignore', invalid='ignore'):
+            shift.get_shift_scores(reference_value=reference_value)
+        return shift
+
+    def compact(self):
+        """
+        Rebuilds the shift once types that left both windows make up most of its
+        vocabulary index, so the index does not grow with the stream
+        """
+        n_live = len(self.shift.type2freq_1) + len(self.shift.type2freq_2)
+        if len(self.shift.type2index) > 2 * n_live + 1024:
+            self.shift = self.get_shift(dict(self.shift.type2freq_1),
+                                        dict(self.shift.type2freq_2))
+
+    def get_result(self):
+        """
+        Reads the shift of the current windows from the running totals kept by
+        the incremental updates. Only the shift scores needed to rank the top
+        types are calculated, from the aligned arrays of the shift
+
+        Returns
+        -------
+        result: dict
+            'bucket' (number of buckets consumed), 'diff' (total shift),
+            'reference_value', 'weighted_score_ref' and 'weighted_score_comp'
+            (weighted scores of the windows), 'warm' (whether the reference
+            window is full) and 'top_types' (list of (type, normalized shift
+            score) tuples of the top_n contributing types). If either window
+            has no scored types, the result is empty: 'diff' is None, the
+            weighted score of an empty window and a default reference value
+            are None, and 'top_types' is an empty list
+        """
+        shift = self.shift
+        totals = shift.shift_totals
+        total_ref = float(totals['freq_1'])
+        total_comp = float(totals['freq_2'])
+        weighted_score_ref = None
+        weighted_score_comp = None
+        if total_ref > 0:
+            weighted_score_ref = float(totals['weighted_1'] / total_ref)
+        if total_comp > 0:
+            weighted_score_comp = float(totals['weighted_2'] / total_comp)
+        n_ref = len(self.buckets) - self.window
+        result = {'bucket': self.n_buckets, 'diff': None,
+                  'reference_value': self.reference_value,
+                  'weighted_score_ref': weighted_score_ref,
+                  'weighted_score_comp': weighted_score_comp,
+                  'warm': n_ref >= self.reference_window, 'top_types': []}
+        if total_ref <= 0 or total_comp <= 0:
+            return result
+
+        if self.reference_value is None:
+            reference_value = weighted_score_ref
+        else:
+            reference_value = self.reference_value
+        diff = weighted_score_comp - weighted_score_ref
+        arrays = shift.shift_arrays
+        shift_score = get_shift_component_arrays(arrays['freq_1'],
+                                                 arrays['freq_2'],
+                                                 arrays['score_1'],
+                                                 arrays['score_2'],
+                                                 reference_value,
+                                                 totals=(total_ref,
+                                                         total_comp))[-1]
+        if diff != 0:
+            shift_score = shift_score / abs(diff)
+        top_indices = get_top_n_indices(shift_score, self.top_n)
+        result['top_types'] = [(shift.index2type[i], float(shift_score[i]))
+                               for i in top_indices]
+        result['diff'] = diff
+        result['reference_value'] = reference_value
+        return result
+
+def _drop_zeros(type2freq):
+    return {t:f for t,f in type2freq.items() if f != 0}
@@ -8,7 +8,6 @@ import os
 import sys
 import warnings
 import numpy as np
-import matplotlib.pyplot as plt
 
 import shifterator.shifterator as shifterator
 from .helper import *
@@ -28,14 +27,11 @@ class ProportionShift(shifterator.Shift):
     stop_lens: list
         currently not implemented, but left for later updates
     """
+    _graph_plot_defaults = {'detailed': False}
+
     def __init__(self, system_1, system_2, stop_lens=None):
-        # Set relative frequency to 0 for types that don't appear
-        types = set(system_1.keys()).union(system_2.keys())
-        for t in types:
-            if t not in system_1:
-                system_1[t] = 0
-            elif t not in system_2:
-                system_2[t] = 0
+        # Types that don't appear in a system are aligned with a relative
+        # frequency of 0, without adding them to the input dicts
         # Initialize shift object
         shifterator.Shift.__init__(self, system_1=system_1, system_2=system_2,
                                    type2score_1=None, type2score_2=None,
@@ -43,12 +39,12 @@ class ProportionShift(shifterator.Shift):
 
     def get_shift_graph(self, top_n=50, normalize=False, text_size_inset=True,
                         cumulative_inset=False, show_plot=True, filename=None,
-                        detailed=False, **kwargs):
+                        **kwargs):
         shifterator.Shift.get_shift_graph(self, top_n=top_n, normalize=normalize,
                                           text_size_inset=text_size_inset,
                                           cumulative_inset=cumulative_inset,
                                           show_plot=show_plot, filename=filename,
-                                          detailed=detailed, **kwargs)
+                                          **kwargs)
 
 
 class JSDivergenceShift(shifterator.Shift):
@@ -68,6 +64,10 @@ class JSDivergenceShift(shifterator.Shift):
     alpha: float
         currently not implemented, but left for later updates
     """
+    _freq_dependent_scores = True
+    _graph_plot_defaults = {'detailed': False, 'show_total': False}
+    _graph_plot_overrides = {'all_pos_contributions': True}
+
     def __init__(self, system_1, system_2, base=2, weight_1=0.5, weight_2=0.5,
                  alpha=1, stop_lens=None):
         # Check weights
@@ -87,12 +87,3 @@ class JSDivergenceShift(shifterator.Shift):
         self.type2p_2 = type2q
         self.type2p_mixed = type2m
 
-    def get_shift_graph(self, top_n=50, normalize=True, text_size_inset=True,
-                        cumulative_inset=True, show_plot=True, filename=None,
-                        detailed=False, show_total=False, **kwargs):
-        shifterator.Shift.get_shift_graph(self, top_n=top_n, normalize=normalize,
-                                          text_size_inset=text_size_inset,
-                                          cumulative_inset=cumulative_inset,
-                                          show_plot=show_plot, filename=filename,
-                                          detailed=detailed, show_total=show_total,
-                                          all_pos_contributions=True, **kwargs)
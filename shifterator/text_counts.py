@@ -0,0 +1,186 @@
+"""
+text_counts.py
+
+Counts the types of raw text into type2freq dicts for shifts. Texts are read
+in chunks and can be tokenized and counted across a pool of worker processes,
+whose partial counts are merged as they finish
+"""
+import re
+import collections
+from concurrent.futures import ProcessPoolExecutor
+
+from .helper import *
+
+# Words, keeping inner apostrophes and hyphens (e.g. "don't", "well-known")
+TOKEN_PATTERN = re.compile(r"\w+(?:['\-]\w+)*")
+
+# State shared with worker processes, set once per worker by _init_worker
+_worker_state = None
+
+# ------------------------------------------------------------------------------
+# --------------------------------- Count Funcs --------------------------------
+# ------------------------------------------------------------------------------
+def tokenize(text, lower=True):
+    """
+    Splits a text into word tokens
+
+    Parameters
+    ----------
+    text: str
+        the text to tokenize
+    lower: bool
+        if True lowercases the text before tokenizing, to match the lexicons
+        included in Shifterator
+
+    Returns
+    -------
+    tokens: list of str
+    """
+    if lower:
+        text = text.lower()
+    return TOKEN_PATTERN.findall(text)
+
+def get_type_counts(texts, tokenizer=tokenize, vocabulary=None, n_jobs=None,
+                    chunk_size=1000, encoding='utf-8'):
+    """
+    Counts the types of a stream of texts
+
+    Parameters
+    ----------
+    texts: iterable of str
+        the texts to count, e.g. documents or lines of a file. The texts are
+        consumed in chunks, so they are never all held in memory
+    tokenizer: callable
+        splits a text into a list of types. Must be a module-level function if
+        n_jobs is not None, so that it can be sent to worker processes
+    vocabulary: str or iterable, optional
+        if str, the name of a lexicon included in Shifterator, and only types
+        scored by the lexicon are counted. If an iterable, only types within it
+        are counted. If None, all types are counted
+    n_jobs: int, optional
+        if not None, the number of worker processes to tokenize and count with
+    chunk_size: int
+        number of texts tokenized and counted at once
+    encoding: str, optional
+        encoding for reading in a lexicon included in Shifterator
+
+    Returns
+    -------
+    type2freq: dict
+        keys are types and values are their frequencies, e.g. system_1 or
+        system_2 of a Shift
+    """
+    vocabulary = get_vocabulary(vocabulary, encoding)
+    chunks = get_chunks(texts, chunk_size)
+    type2freq = collections.Counter()
+    if n_jobs is None:
+        for chunk in chunks:
+            type2freq.update(count_types(chunk, tokenizer, vocabulary))
+        return dict(type2freq)
+    with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                             initargs=(tokenizer, vocabulary)) as executor:
+        # Bound the chunks in flight so the stream is not read all at once
+        pending = collections.deque()
+        for chunk in chunks:
+            pending.append(executor.submit(_count_worker_types, chunk))
+            if len(pending) >= 2 * n_jobs:
+                type2freq.update(pending.popleft().result())
+        while len(pending) > 0:
+            type2freq.update(pending.popleft().result())
+    return dict(type2freq)
+
+def get_file_type_counts(filenames, tokenizer=tokenize, vocabulary=None,
+                         n_jobs=None, chunk_size=1000, encoding='utf-8'):
+    """
+    Counts the types of one or more text files, reading them line by line
+
+    Parameters
+    ----------
+    filenames: str or list of str
+        paths of the files to count. Counts are summed across files
+    tokenizer, vocabulary, n_jobs, chunk_size:
+        see get_type_counts. Chunks are chunk_size lines long
+    encoding: str, optional
+        encoding of the files, and for reading in a lexicon included in
+        Shifterator
+
+    Returns
+    -------
+    type2freq: dict
+        keys are types and values are their frequencies across the files
+    """
+    if isinstance(filenames, str):
+        filenames = [filenames]
+    return get_type_counts(_read_lines(filenames, encoding), tokenizer,
+                           vocabulary, n_jobs, chunk_size, encoding)
+
+def count_types(texts, tokenizer=tokenize, vocabulary=None):
+    """
+    Counts the types of a list of texts
+
+    Parameters
+    ----------
+    texts: list of str
+        the texts to count
+    tokenizer: callable
+        splits a text into a list of types
+    vocabulary: set, optional
+        if not None, only types within it are counted
+
+    Returns
+    -------
+    type2freq: collections.Counter
+        keys are types and values are their frequencies
+    """
+    type2freq = collections.Counter()
+    for text in texts:
+        type2freq.update(tokenizer(text))
+    if vocabulary is not None:
+        type2freq = collections.Counter({t:f for t,f in type2freq.items()
+                                         if t in vocabulary})
+    return type2freq
+
+def get_vocabulary(vocabulary, encoding='utf-8'):
+    """
+    Returns the set of types to restrict counting to, or None
+
+    Parameters
+    ----------
+    vocabulary: str or iterable, optional
+        if str, the name of a lexicon included in Shifterator. Otherwise an
+        iterable of types, or None
+    encoding: str, optional
+        encoding for reading in a lexicon included in Shifterator
+    """
+    if vocabulary is None:
+        return None
+    if isinstance(vocabulary, str):
+        vocabulary = get_score_dictionary(vocabulary, encoding)
+    return frozenset(vocabulary)
+
+def get_chunks(texts, chunk_size):
+    """
+    Groups a stream of texts into lists of chunk_size texts
+    """
+    chunk = []
+    for text in texts:
+        chunk.append(text)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if len(chunk) > 0:
+        yield chunk
+
+def _read_lines(filenames, encoding):
+    for filename in filenames:
+        with open(filename, 'r', encoding=encoding) as f:
+            for line in f:
+                yield line
+
+def _init_worker(tokenizer, vocabulary):
+    global _worker_state
+    _worker_state = (tokenizer, vocabulary)
+
+def _count_worker_types(chunk):
+    tokenizer,vocabulary = _worker_state
+    return count_types(chunk, tokenizer, vocabulary)
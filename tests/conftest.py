@@ -0,0 +1,11 @@
+import pytest
+
+from shifterator.lexicon_cache import lexicon_cache
+
+
+@pytest.fixture(autouse=True)
+def clear_lexicon_cache():
+    # Lexicons cached by one test would otherwise change what later tests load
+    lexicon_cache.clear()
+    yield
+    lexicon_cache.clear()
@@ -0,0 +1,110 @@
+import io
+import random
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+
+from shifterator import plotting
+from shifterator import relative_shift as rs
+from shifterator import symmetric_shift as ss
+from shifterator.batch_graph import (ShiftGraphRenderer, get_graph_task,
+                                     render_shift_graphs)
+from shifterator.graph_service import get_shift_graph_bytes
+
+random.seed(2)
+TYPES = ['t{}'.format(i) for i in range(300)]
+TYPE2SCORE = {t: random.uniform(1, 9) for t in TYPES}
+
+
+def get_system():
+    return {t: random.randint(1, 30) for t in random.sample(TYPES, 200)}
+
+
+def get_pixels(graph):
+    return plt.imread(io.BytesIO(graph))
+
+
+def render_fresh(shift, top_n=50, **kwargs):
+    graph_data,plot_params = get_graph_task(shift, top_n, kwargs)
+    return get_shift_graph_bytes(graph_data, plot_params)
+
+
+def get_drawn_graph(monkeypatch, shift, top_n, **kwargs):
+    # Capture the graph data and plotting parameters get_shift_graph draws
+    drawn = []
+    def plot_shift_graph(graph_data, plot_params):
+        drawn.append((graph_data, plot_params))
+        return plt.subplots()
+    monkeypatch.setattr(plotting, 'plot_shift_graph', plot_shift_graph)
+    shift.get_shift_graph(top_n=top_n, show_plot=False, **kwargs)
+    plt.close('all')
+    return drawn[0]
+
+
+def assert_same_graph_data(graph_data_1, graph_data_2):
+    assert graph_data_1.keys() == graph_data_2.keys()
+    for key,value in graph_data_1.items():
+        if key == 'type_scores':
+            assert [t for t,*scores in value] \
+                   == [t for t,*scores in graph_data_2[key]]
+            assert np.allclose([scores for t,*scores in value],
+                               [scores for t,*scores in graph_data_2[key]])
+        elif key == 'cumulative':
+            assert np.allclose(value[0], graph_data_2[key][0])
+            assert np.allclose(value[1], graph_data_2[key][1])
+        else:
+            assert value == pytest.approx(graph_data_2[key])
+
+
+@pytest.mark.parametrize('kwargs', [{}, {'show_total': True, 'title': 'JSD'}])
+def test_jsd_graph_task_matches_get_shift_graph(monkeypatch, kwargs):
+    shift = ss.JSDivergenceShift(get_system(), get_system())
+    graph_data,plot_params = get_graph_task(shift, 20, kwargs)
+    drawn_data,drawn_params = get_drawn_graph(monkeypatch, shift, 20, **kwargs)
+    assert_same_graph_data(graph_data, drawn_data)
+    plot_params = plotting.get_plot_params(plot_params,
+                                           graph_data['show_score_diffs'])
+    assert plot_params == drawn_params
+    assert plot_params['all_pos_contributions']
+    assert not plot_params['detailed']
+    assert plot_params['show_total'] == kwargs.get('show_total', False)
+
+
+@pytest.mark.parametrize('kwargs', [{}, {'cumulative_inset': False,
+                                         'detailed': False}])
+def test_first_template_graph_matches_fresh(kwargs):
+    shift = rs.SentimentShift(get_system(), get_system(), TYPE2SCORE)
+    renderer = ShiftGraphRenderer(top_n=20, **kwargs)
+    template_graph = get_pixels(renderer.render(shift))
+    fresh_graph = get_pixels(render_fresh(shift, top_n=20, **kwargs))
+    assert np.array_equal(template_graph, fresh_graph)
+
+
+def test_reused_templates_match_fresh():
+    shifts = [rs.SentimentShift(get_system(), get_system(), TYPE2SCORE)
+              for i in range(3)]
+    shifts.append(ss.JSDivergenceShift(get_system(), get_system()))
+    renderer = ShiftGraphRenderer(top_n=20)
+    for shift in shifts:
+        template_graph = get_pixels(renderer.render(shift))
+        fresh_graph = get_pixels(render_fresh(shift, top_n=20))
+        assert template_graph.shape == fresh_graph.shape
+        # Later graphs keep the layout of the first graph of their template
+        differs = np.abs(template_graph - fresh_graph).sum(axis=2) > 0
+        assert differs.mean() < 0.1
+    assert len(renderer.templates) == 2
+
+
+def test_render_shift_graphs_reports(tmp_path):
+    shifts = [rs.SentimentShift(get_system(), get_system(), TYPE2SCORE)
+              for i in range(2)]
+    filenames = [str(tmp_path / 'graph_{}.png'.format(i)) for i in range(2)]
+    reports = render_shift_graphs(shifts + [None], filenames + ['bad.png'],
+                                  top_n=10, reuse_figures=True)
+    assert [r['error'] for r in reports[:2]] == [None, None]
+    assert reports[2]['error'] is not None
+    for filename in filenames:
+        assert get_pixels(open(filename, 'rb').read()).size > 0
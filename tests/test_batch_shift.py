@@ -0,0 +1,57 @@
+import random
+
+import pytest
+
+from shifterator import relative_shift as rs
+from shifterator.batch_shift import BatchShift
+
+random.seed(5)
+TYPES = ['t{}'.format(i) for i in range(300)]
+TYPE2SCORE_REF = {t: random.uniform(1, 9) for t in TYPES[:240]}
+# Scores some types differently and others that the reference lexicon does not
+TYPE2SCORE_COMP = {t: random.uniform(1, 9) for t in TYPES[60:280]}
+REFERENCE = {t: random.randint(1, 20) for t in random.sample(TYPES, 180)}
+COMPARISONS = {'c{}'.format(i): {t: random.randint(1, 20)
+                                 for t in random.sample(TYPES, 150)}
+               for i in range(7)}
+
+
+def assert_columns_match_shifts(batch, get_shift):
+    shift_scores = batch.get_shift_scores(chunk_size=3)
+    result_table = batch.get_result_table(chunk_size=3)
+    assert list(result_table['name']) == list(COMPARISONS)
+    for j,(name,comparison) in enumerate(COMPARISONS.items()):
+        shift = get_shift(comparison)
+        type2shift_score = shift.get_shift_scores()
+        column = {t: s for t,s in zip(batch.types, shift_scores[:,j])}
+        # Types of other comparisons do not contribute to this one
+        assert {t for t,s in column.items() if s != 0}\
+               <= set(type2shift_score)
+        for t,s in type2shift_score.items():
+            assert column.get(t, 0) == pytest.approx(s, abs=1e-12)
+        assert result_table['diff'][j] == pytest.approx(shift.diff)
+        assert result_table['weighted_score'][j] == pytest.approx(
+            shift.get_weighted_score(shift.type2freq_2, shift.type2score_2))
+        for comp,comp_sum in shift.get_shift_component_sums().items():
+            assert result_table[comp][j] == pytest.approx(comp_sum, abs=1e-12)
+
+
+@pytest.mark.parametrize('stop_lens', [None, [(4, 6)]])
+def test_shared_lexicon_matches_separate_shifts(stop_lens):
+    batch = BatchShift(REFERENCE, COMPARISONS, TYPE2SCORE_REF,
+                       stop_lens=stop_lens)
+    assert_columns_match_shifts(batch, lambda comparison: rs.SentimentShift(
+        REFERENCE, comparison, TYPE2SCORE_REF, stop_lens=stop_lens))
+
+
+def test_lexicon_per_system_matches_separate_shifts():
+    batch = BatchShift(REFERENCE, COMPARISONS, TYPE2SCORE_REF, TYPE2SCORE_COMP)
+    assert_columns_match_shifts(batch, lambda comparison: rs.SentimentShift(
+        REFERENCE, comparison, TYPE2SCORE_REF, TYPE2SCORE_COMP))
+
+
+def test_reference_value_is_shared():
+    batch = BatchShift(REFERENCE, COMPARISONS, TYPE2SCORE_REF,
+                       reference_value=5)
+    assert_columns_match_shifts(batch, lambda comparison: rs.SentimentShift(
+        REFERENCE, comparison, TYPE2SCORE_REF, reference_value=5))
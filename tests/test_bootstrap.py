@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from shifterator import relative_shift as rs
+from shifterator import symmetric_shift as ss
+from shifterator.bootstrap import get_bootstrap_intervals
+
+TYPE2SCORE = {'happy': 8.3, 'sad': 2.4, 'the': 5.0, 'war': 1.8, 'love': 8.4}
+REFERENCE = {'happy': 10, 'sad': 4, 'the': 50, 'war': 2}
+COMPARISON = {'happy': 3, 'sad': 9, 'the': 40, 'love': 5}
+
+
+def get_shift(reference=REFERENCE, comparison=COMPARISON):
+    return rs.SentimentShift(dict(reference), dict(comparison), TYPE2SCORE)
+
+
+@pytest.mark.parametrize('n_jobs', [None, 2])
+def test_same_seed_same_intervals(n_jobs):
+    first = get_shift().get_bootstrap_intervals(n_samples=200, chunk_size=2,
+                                                seed=7, n_jobs=n_jobs)
+    second = get_shift().get_bootstrap_intervals(n_samples=200, chunk_size=2,
+                                                 seed=7)
+    assert first['diff'] == second['diff']
+    assert np.array_equal(first['diff_samples'], second['diff_samples'])
+    for t in first['lower']:
+        assert first['lower'][t] == second['lower'][t]
+        assert first['upper'][t] == second['upper'][t]
+
+
+def test_interval_contains_diff():
+    shift = get_shift()
+    intervals = shift.get_bootstrap_intervals(n_samples=500, seed=0)
+    lower,upper = intervals['diff']
+    assert lower <= shift.diff <= upper
+
+
+def test_proportions_are_rejected():
+    total = sum(REFERENCE.values())
+    reference = {t: f / total for t,f in REFERENCE.items()}
+    with pytest.raises(ValueError):
+        get_shift(reference=reference).get_bootstrap_intervals(n_samples=10)
+
+
+def test_empty_system_is_rejected():
+    freq = np.ones(3)
+    with pytest.raises(ValueError):
+        get_bootstrap_intervals(np.zeros(3), freq, freq, freq, n_samples=10)
+
+
+@pytest.mark.parametrize('shift_class', [rs.EntropyShift, rs.KLDivergenceShift,
+                                         ss.JSDivergenceShift])
+def test_frequency_dependent_shifts_are_rejected(shift_class):
+    shift = shift_class({'a': 2, 'b': 3}, {'a': 1, 'b': 4})
+    with pytest.raises(TypeError, match=shift_class.__name__):
+        shift.get_bootstrap_intervals(n_samples=10)
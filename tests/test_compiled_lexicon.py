@@ -0,0 +1,129 @@
+import os
+import random
+import shutil
+import time
+import warnings
+
+import pytest
+
+from shifterator import compiled_lexicon as cl
+from shifterator import relative_shift as rs
+from shifterator.helper import load_score_dictionary, load_vocabulary_scores
+
+LEXICONS = ['labMT_English', 'NRC-VAD_valence_English']
+
+
+@pytest.fixture
+def compiled_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(cl, 'COMPILED_DIR', str(tmp_path))
+    cl.compile_lexicons(LEXICONS)
+    return tmp_path
+
+
+@pytest.mark.parametrize('name', LEXICONS)
+def test_compiled_matches_tsv(compiled_dir, name):
+    type2score = load_score_dictionary(name, compiled=False)
+    assert load_score_dictionary(name) == type2score
+    with cl.load_compiled_lexicon(name) as lexicon:
+        assert len(lexicon) == len(type2score)
+        assert dict(lexicon.items()) == type2score
+        for t,score in list(type2score.items())[::97]:
+            assert t in lexicon
+            assert lexicon[t] == score
+            assert lexicon.get_types()[lexicon.get_index(t)] == t
+        assert 'not a word in any lexicon' not in lexicon
+        assert lexicon.get_index('not a word in any lexicon') == -1
+        with pytest.raises(KeyError):
+            lexicon['not a word in any lexicon']
+
+
+@pytest.mark.parametrize('name', LEXICONS)
+def test_compiled_vocabulary_matches_tsv(compiled_dir, monkeypatch, name):
+    type2score = load_score_dictionary(name, compiled=False)
+    types = sorted(type2score)
+    # Types before, between and after the types of the lexicon
+    vocabulary = types[::50] + ['', '￿', types[0][:-1], types[-1] + 'z',
+                                'not a word in any lexicon', 7]
+    compiled_scores = load_vocabulary_scores(name, vocabulary)
+    monkeypatch.setattr(cl, 'COMPILED_DIR', str(compiled_dir / 'missing'))
+    tsv_scores = load_vocabulary_scores(name, vocabulary)
+    assert compiled_scores == tsv_scores
+    assert tsv_scores == {t: type2score[t] for t in vocabulary
+                          if t in type2score}
+
+
+def get_scoring_seconds(type2score, reference, comparison):
+    seconds = []
+    for i in range(5):
+        start = time.perf_counter()
+        shift = rs.SentimentShift(reference, comparison, type2score,
+                                  stop_lens=[(4, 6)])
+        shift.get_shift_scores()
+        seconds.append(time.perf_counter() - start)
+    return min(seconds)
+
+
+def test_compiled_scoring_is_as_fast_as_tsv(compiled_dir):
+    tsv_lexicon = load_score_dictionary(LEXICONS[0], compiled=False)
+    compiled_lexicon = load_score_dictionary(LEXICONS[0])
+    rng = random.Random(0)
+    types = list(tsv_lexicon)
+    reference = {t: rng.randint(1, 9) for t in rng.sample(types, 5000)}
+    comparison = {t: rng.randint(1, 9) for t in rng.sample(types, 5000)}
+    tsv_seconds = get_scoring_seconds(tsv_lexicon, reference, comparison)
+    compiled_seconds = get_scoring_seconds(compiled_lexicon, reference,
+                                           comparison)
+    # Allow for timing noise, a per-type search would be many times slower
+    assert compiled_seconds < 1.5 * tsv_seconds
+
+
+@pytest.fixture
+def source_dir(tmp_path, monkeypatch):
+    # Compile from a copy of the TSV, so its modification time can change
+    name = LEXICONS[0]
+    source_path = tmp_path / 'lexicons' / 'labMT' / (name + '.tsv')
+    source_path.parent.mkdir(parents=True)
+    shutil.copyfile(cl.get_source_path(name), source_path)
+    monkeypatch.setattr(cl, 'LEXICON_DIR', str(tmp_path / 'lexicons'))
+    monkeypatch.setattr(cl, 'COMPILED_DIR', str(tmp_path / 'compiled'))
+    cl.compile_lexicons([name])
+    return source_path
+
+
+def test_stale_compiled_lexicon_is_not_used(source_dir):
+    name = LEXICONS[0]
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        type2score = load_score_dictionary(name)
+    stat = os.stat(source_dir)
+    os.utime(source_dir, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    with pytest.warns(UserWarning, match='out of date'):
+        assert load_score_dictionary(name) == type2score
+    with pytest.warns(UserWarning, match='out of date'):
+        type2score_happy = load_vocabulary_scores(name, ['happy'])
+    assert type2score_happy == {'happy': type2score['happy']}
+    # Recompiling brings the compiled lexicon up to date
+    cl.compile_lexicons([name])
+    with cl.load_compiled_lexicon(name) as lexicon:
+        assert len(lexicon) == len(type2score)
+
+
+def test_compiled_lexicon_is_only_used_with_its_encoding(source_dir):
+    name = LEXICONS[0]
+    with cl.load_compiled_lexicon(name, encoding='UTF8') as lexicon:
+        assert len(lexicon) > 0
+    assert cl.load_compiled_lexicon(name, encoding='latin-1') is None
+    assert isinstance(load_score_dictionary(name, encoding='latin-1'), dict)
+
+
+def test_missing_lexicon_is_reported():
+    with pytest.raises(FileNotFoundError):
+        load_score_dictionary('labMT_Klingon', compiled=False)
+    with pytest.raises(FileNotFoundError):
+        load_vocabulary_scores('labMT_Klingon', ['happy'])
+
+
+def test_context_manager_closes_lexicon(compiled_dir):
+    with cl.load_compiled_lexicon(LEXICONS[0]) as lexicon:
+        assert len(lexicon) > 0
+    assert lexicon._mm.closed
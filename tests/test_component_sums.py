@@ -0,0 +1,78 @@
+import random
+
+import pytest
+
+import shifterator.shifterator as sh
+
+random.seed(6)
+TYPES = ['t{}'.format(i) for i in range(120)]
+TYPE2SCORE_1 = {t: random.uniform(1, 9) for t in TYPES[:100]}
+TYPE2SCORE_2 = {t: random.uniform(1, 9) for t in TYPES[10:110]}
+SYSTEM_1 = {t: random.randint(1, 20) for t in random.sample(TYPES, 70)}
+SYSTEM_2 = {t: random.randint(1, 20) for t in random.sample(TYPES, 70)}
+
+
+def get_loop_sums(shift):
+    # Split each contribution by the signs of its components, one type at a time
+    comp_sums = dict.fromkeys(['pos_s_pos_p', 'pos_s_neg_p', 'neg_s_pos_p',
+                               'neg_s_neg_p', 'pos_s', 'neg_s'], 0)
+    for t in shift.type2s_diff:
+        p_diff = shift.type2p_diff[t]
+        s_diff = shift.type2s_diff[t]
+        p_avg = shift.type2p_avg[t]
+        s_ref_diff = shift.type2s_ref_diff[t]
+        if s_ref_diff > 0:
+            comp = 'pos_s_pos_p' if p_diff > 0 else 'pos_s_neg_p'
+        else:
+            comp = 'neg_s_pos_p' if p_diff > 0 else 'neg_s_neg_p'
+        comp_sums[comp] += p_diff * s_ref_diff
+        comp_sums['pos_s' if s_diff > 0 else 'neg_s'] += p_avg * s_diff
+    return comp_sums
+
+
+def assert_sums_match_loop(comp_sums, shift):
+    expected = get_loop_sums(shift)
+    assert comp_sums.keys() == expected.keys()
+    for comp,comp_sum in expected.items():
+        assert comp_sums[comp] == pytest.approx(comp_sum, abs=1e-12)
+
+
+@pytest.mark.parametrize('stop_lens', [None, [(4, 6)]])
+def test_component_sums_match_loop(stop_lens):
+    shift = sh.Shift(SYSTEM_1, SYSTEM_2, TYPE2SCORE_1, TYPE2SCORE_2,
+                     stop_lens=stop_lens)
+    comp_sums = shift.get_shift_component_sums()
+    assert_sums_match_loop(comp_sums, shift)
+    assert sum(comp_sums.values()) == pytest.approx(shift.diff)
+
+
+def test_component_sums_are_cached():
+    shift = sh.Shift(SYSTEM_1, SYSTEM_2, TYPE2SCORE_1)
+    comp_sums = shift.get_shift_component_sums()
+    cached = shift.comp_sums
+    assert shift.get_shift_component_sums() == comp_sums
+    assert shift.comp_sums is cached
+    # Callers get copies, so they cannot change the cached sums
+    comp_sums['pos_s'] = None
+    assert shift.get_shift_component_sums()['pos_s'] is not None
+
+
+def test_component_sums_follow_new_scores():
+    shift = sh.Shift(SYSTEM_1, SYSTEM_2, TYPE2SCORE_1)
+    comp_sums = shift.get_shift_component_sums()
+    shift.get_shift_scores(reference_value=7)
+    assert shift.comp_sums is None
+    assert_sums_match_loop(shift.get_shift_component_sums(), shift)
+    assert shift.get_shift_component_sums(reference_value=5) != comp_sums
+
+
+def test_component_sums_follow_updates():
+    shift = sh.Shift(dict(SYSTEM_1), dict(SYSTEM_2), TYPE2SCORE_1)
+    comp_sums = shift.get_shift_component_sums()
+    shift.update_system_2({'t0': 30, 't5': 12, 't99': 4})
+    assert shift.comp_sums is None
+    updated_sums = shift.get_shift_component_sums()
+    assert updated_sums != comp_sums
+    rebuilt = sh.Shift(shift.type2freq_1, shift.type2freq_2, TYPE2SCORE_1)
+    for comp,comp_sum in rebuilt.get_shift_component_sums().items():
+        assert updated_sums[comp] == pytest.approx(comp_sum, abs=1e-12)
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+import shifterator.shifterator as sh
+from shifterator.helper import get_cumulative_scores, get_top_n_indices
+
+rng = np.random.default_rng(12)
+
+
+def get_full_curve(shift_scores):
+    return np.cumsum(shift_scores[np.argsort(-np.abs(shift_scores),
+                                             kind='stable')])
+
+
+def assert_curve_is_kept(shift_scores, top_n, n_tail):
+    top_indices = get_top_n_indices(shift_scores, top_n)
+    ranks,cum_scores = get_cumulative_scores(shift_scores, top_indices, n_tail)
+    full_curve = get_full_curve(shift_scores)
+    assert np.all(np.diff(ranks) > 0)
+    assert np.allclose(cum_scores, full_curve[ranks - 1])
+    # The top ranks are exact, and the curve keeps its end and extremes
+    assert ranks[:top_n].tolist() == list(range(1, top_n + 1))
+    assert ranks[-1] == len(shift_scores)
+    assert cum_scores.max() == pytest.approx(full_curve.max())
+    assert cum_scores.min() == pytest.approx(full_curve.min())
+
+
+@pytest.mark.parametrize('drift', [0, 0.2, -0.5])
+@pytest.mark.parametrize('top_n,n_tail', [(1, 5), (20, 10), (50, 200)])
+def test_sampled_curve_keeps_extremes(drift, top_n, n_tail):
+    for i in range(20):
+        shift_scores = rng.normal(drift, 1, size=rng.integers(60, 2000))
+        assert_curve_is_kept(shift_scores, top_n, n_tail)
+
+
+def test_peak_between_sampled_ranks_is_kept():
+    # Positive scores between ranks 101 and 300 lift the curve, which then
+    # falls back before the next sampled rank
+    magnitudes = np.linspace(10, 0.01, 1000)
+    signs = np.where(np.arange(1000) % 2 == 0, 1.0, -1.0)
+    signs[100:300] = 1
+    signs[300:500] = -1
+    shift_scores = rng.permutation(magnitudes * signs)
+    assert_curve_is_kept(shift_scores, 10, 2)
+
+
+def test_top_n_covering_all_types_is_exact():
+    shift_scores = rng.normal(size=30)
+    ranks,cum_scores = get_cumulative_scores(shift_scores,
+                                             get_top_n_indices(shift_scores, 30))
+    assert ranks.tolist() == list(range(1, 31))
+    assert np.allclose(cum_scores, get_full_curve(shift_scores))
+
+
+def test_graph_data_keeps_extremes():
+    types = ['t{}'.format(i) for i in range(3000)]
+    system_1 = {t: int(f) for t,f in zip(types, rng.integers(1, 50, 3000))}
+    system_2 = {t: int(f) for t,f in zip(types, rng.integers(1, 50, 3000))}
+    type2score = {t: float(s) for t,s in zip(types, rng.uniform(1, 9, 3000))}
+    shift = sh.Shift(system_1, system_2, type2score)
+    ranks,cum_scores = shift.get_shift_graph_data(top_n=20)['cumulative']
+    full_curve = get_full_curve(np.array(list(shift.get_shift_scores().values())))
+    assert ranks[-1] == len(full_curve)
+    assert cum_scores[-1] == pytest.approx(full_curve[-1])
+    assert cum_scores.max() == pytest.approx(full_curve.max())
+    assert cum_scores.min() == pytest.approx(full_curve.min())
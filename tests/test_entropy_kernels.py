@@ -0,0 +1,95 @@
+import math
+import random
+
+import numpy as np
+import pytest
+
+from shifterator import helper
+
+random.seed(11)
+TYPES = ['t{}'.format(i) for i in range(120)]
+SYSTEM_1 = {t: random.randint(1, 30) for t in random.sample(TYPES, 80)}
+SYSTEM_2 = {t: random.randint(1, 30) for t in random.sample(TYPES, 70)}
+
+
+# Per-type loops of the dict-based kernels, as the scores were computed before
+def get_loop_probs(type2freq):
+    n = sum(type2freq.values())
+    return {t: f / n for t,f in type2freq.items()}
+
+
+def get_loop_log(p, base, force_zero=False):
+    try:
+        return math.log(p, base)
+    except ValueError:
+        if force_zero:
+            return 0
+        raise
+
+
+def get_loop_jsd_scores(type2freq_1, type2freq_2, base, weight_1, weight_2):
+    type2p = get_loop_probs(type2freq_1)
+    type2q = get_loop_probs(type2freq_2)
+    type2m = {t: weight_1 * type2p.get(t, 0) + weight_2 * type2q.get(t, 0)
+              for t in set(type2p).union(type2q)}
+    type2score_1 = {t: 0.5 * (get_loop_log(m, base) - get_loop_log(type2p[t], base))
+                    if t in type2p else 0 for t,m in type2m.items()}
+    type2score_2 = {t: 0.5 * (get_loop_log(type2q[t], base) - get_loop_log(m, base))
+                    if t in type2q else 0 for t,m in type2m.items()}
+    return type2p,type2q,type2m,type2score_1,type2score_2
+
+
+def assert_same_values(type2value, expected):
+    assert set(type2value.keys()) == set(expected)
+    for t,value in expected.items():
+        assert type2value[t] == pytest.approx(value, rel=1e-12, abs=1e-15)
+
+
+@pytest.mark.parametrize('normalize', [True, False])
+def test_aligned_probs_match_loop(normalize):
+    type2index,type2index_1,type2index_2,p_1,p_2 = helper.get_aligned_probs(SYSTEM_1,
+                                                                            SYSTEM_2,
+                                                                            normalize)
+    # System 1 keeps its positions, and the new types of system 2 follow
+    assert list(type2index) == list(SYSTEM_1)\
+           + [t for t in SYSTEM_2 if t not in SYSTEM_1]
+    assert set(type2index_1) == set(SYSTEM_1)
+    assert set(type2index_2) == set(SYSTEM_2)
+    expected_1 = get_loop_probs(SYSTEM_1) if normalize else SYSTEM_1
+    expected_2 = get_loop_probs(SYSTEM_2) if normalize else SYSTEM_2
+    for t,i in type2index.items():
+        assert p_1[i] == pytest.approx(expected_1.get(t, 0), rel=1e-12)
+        assert p_2[i] == pytest.approx(expected_2.get(t, 0), rel=1e-12)
+    assert_same_values(helper.TypeArrayView(type2index_2, p_2), expected_2)
+
+
+@pytest.mark.parametrize('base', [2, math.e, 10])
+def test_log_array_matches_loop(base):
+    probs = np.array(list(get_loop_probs(SYSTEM_1).values()) + [0.0, 1.0])
+    logs = helper.get_log_array(probs, base, force_zero=True)
+    assert logs.tolist() == pytest.approx([get_loop_log(p, base, force_zero=True)
+                                           for p in probs], rel=1e-12)
+    with pytest.raises(ValueError):
+        helper.get_log_array(probs, base)
+    assert helper.get_log_array(probs[:-2], base).tolist()\
+           == pytest.approx(logs[:-2].tolist(), rel=1e-12)
+
+
+@pytest.mark.parametrize('base,weights', [(2, (0.5, 0.5)), (10, (0.3, 0.7))])
+def test_jsd_scores_match_loop(base, weights):
+    scores = helper.get_jsd_scores(SYSTEM_1, SYSTEM_2, base=base,
+                                   weight_1=weights[0], weight_2=weights[1])
+    expected = get_loop_jsd_scores(SYSTEM_1, SYSTEM_2, base, *weights)
+    for type2value,expected_values in zip(scores, expected):
+        assert_same_values(type2value, expected_values)
+
+
+def test_surprisals_and_mixed_distribution_match_loop():
+    type2p_1,type2p_2,type2s_1,type2s_2 = helper.get_surprisal_scores(SYSTEM_1,
+                                                                      SYSTEM_2)
+    assert_same_values(type2p_1, get_loop_probs(SYSTEM_1))
+    assert_same_values(type2s_2, {t: -math.log(p, 2) for t,p
+                                  in get_loop_probs(SYSTEM_2).items()})
+    type2m = helper.get_mixed_distribution(type2p_1, type2p_2, 0.25, 0.75)
+    assert_same_values(type2m, get_loop_jsd_scores(SYSTEM_1, SYSTEM_2, 2,
+                                                   0.25, 0.75)[2])
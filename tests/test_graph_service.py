@@ -0,0 +1,43 @@
+import asyncio
+import io
+import random
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+
+from shifterator import relative_shift as rs
+from shifterator import symmetric_shift as ss
+from shifterator.graph_service import ShiftGraphService
+
+random.seed(3)
+TYPES = ['t{}'.format(i) for i in range(300)]
+TYPE2SCORE = {t: random.uniform(1, 9) for t in TYPES}
+
+
+def get_system():
+    return {t: random.randint(1, 30) for t in random.sample(TYPES, 200)}
+
+
+def get_service_graph(shift, **kwargs):
+    async def main():
+        async with ShiftGraphService() as service:
+            return await service.get_shift_graph(shift, top_n=20, **kwargs)
+    return plt.imread(io.BytesIO(asyncio.run(main())))
+
+
+@pytest.mark.parametrize('get_shift', [
+    lambda: ss.JSDivergenceShift(get_system(), get_system()),
+    lambda: rs.SentimentShift(get_system(), get_system(), TYPE2SCORE),
+])
+@pytest.mark.parametrize('kwargs', [{}, {'show_total': True}])
+def test_service_graph_matches_get_shift_graph(tmp_path, get_shift, kwargs):
+    shift = get_shift()
+    filename = str(tmp_path / 'graph.png')
+    shift.get_shift_graph(top_n=20, show_plot=False, filename=filename,
+                          **kwargs)
+    plt.close('all')
+    assert np.array_equal(get_service_graph(shift, **kwargs),
+                          plt.imread(filename))
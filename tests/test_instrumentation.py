@@ -0,0 +1,63 @@
+import asyncio
+import threading
+
+from shifterator import relative_shift as rs
+from shifterator.graph_service import ShiftGraphService
+from shifterator.instrumentation import StageRecorder, record_stage
+
+TYPE2SCORE = {'happy': 8.3, 'sad': 2.4, 'the': 5.0, 'war': 1.8, 'love': 8.4}
+REFERENCE = {'happy': 10, 'sad': 4, 'the': 50, 'war': 2}
+COMPARISON = {'happy': 3, 'sad': 9, 'the': 40, 'love': 5}
+
+
+def test_recorder_records_stages():
+    with StageRecorder() as recorder:
+        with record_stage('outer'):
+            with record_stage('inner'):
+                pass
+    with record_stage('outer'):
+        pass
+    stats = recorder.get_stats()
+    assert stats['outer']['calls'] == 1
+    assert stats['inner']['calls'] == 1
+
+
+def test_threads_record_their_own_stages():
+    barrier = threading.Barrier(2)
+    recorders = dict()
+
+    def run(name):
+        with StageRecorder() as recorder:
+            # Both recorders are active while both threads run their stages
+            barrier.wait()
+            with record_stage(name):
+                pass
+            barrier.wait()
+        recorders[name] = recorder
+
+    threads = [threading.Thread(target=run, args=(name,))
+               for name in ['first', 'second']]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert set(recorders['first'].get_stats()) == {'first'}
+    assert set(recorders['second'].get_stats()) == {'second'}
+
+
+def test_service_reports_stages_to_its_request():
+    async def request(service, shift):
+        with StageRecorder() as recorder:
+            await service.get_shift_graph(shift, top_n=5)
+        return recorder.get_stats()
+
+    async def main():
+        shifts = [rs.SentimentShift(dict(REFERENCE), dict(COMPARISON),
+                                    TYPE2SCORE) for i in range(2)]
+        async with ShiftGraphService(max_workers=2) as service:
+            return await asyncio.gather(*[request(service, shift)
+                                          for shift in shifts])
+
+    for stats in asyncio.run(main()):
+        assert stats['savefig']['calls'] == 1
+        assert stats['build_figure']['calls'] == 1
@@ -0,0 +1,81 @@
+import pytest
+
+from shifterator import helper
+from shifterator.lexicon_cache import (LexiconCache, get_lexicon_nbytes,
+                                       lexicon_cache)
+
+LEXICONS = {name: {'{}_{}'.format(name, i): float(i) for i in range(10)}
+            for name in ['a', 'b', 'c', 'd']}
+
+
+def get(cache, name, loads=None):
+    def load_lexicon():
+        if loads is not None:
+            loads.append(name)
+        return dict(LEXICONS[name])
+    return cache.get(name, load_lexicon)
+
+
+def test_least_recently_used_lexicon_is_evicted():
+    cache = LexiconCache(max_entries=2)
+    loads = []
+    get(cache, 'a', loads)
+    get(cache, 'b', loads)
+    # Using a makes b the least recently used lexicon
+    get(cache, 'a', loads)
+    get(cache, 'c', loads)
+    assert 'a' in cache and 'c' in cache and 'b' not in cache
+    assert len(cache) == 2
+    get(cache, 'b', loads)
+    assert loads == ['a', 'b', 'c', 'b']
+    assert 'a' not in cache
+
+
+def test_statistics_count_hits_misses_evictions_and_bytes():
+    cache = LexiconCache(max_entries=2)
+    for name in ['a', 'a', 'b', 'c', 'c', 'd']:
+        get(cache, name)
+    nbytes = get_lexicon_nbytes(LEXICONS['c']) + get_lexicon_nbytes(LEXICONS['d'])
+    assert cache.stats() == {'hits': 2, 'misses': 4, 'evictions': 2,
+                             'entries': 2, 'bytes': nbytes, 'max_entries': 2,
+                             'max_bytes': None}
+    cache.set_limits(max_entries=1)
+    assert cache.stats()['evictions'] == 3
+    assert cache.nbytes == get_lexicon_nbytes(LEXICONS['d'])
+    cache.clear()
+    assert cache.stats() == {'hits': 0, 'misses': 0, 'evictions': 0,
+                             'entries': 0, 'bytes': 0, 'max_entries': 1,
+                             'max_bytes': None}
+
+
+def test_lexicons_larger_than_max_bytes_are_not_cached():
+    nbytes = get_lexicon_nbytes(LEXICONS['a'])
+    cache = LexiconCache(max_entries=None, max_bytes=nbytes)
+    get(cache, 'a')
+    assert 'a' in cache
+    # A second lexicon exceeds the bound, so the older one is evicted
+    get(cache, 'b')
+    assert len(cache) == 1 and 'b' in cache
+    cache.set_limits(max_bytes=nbytes - 1)
+    assert len(cache) == 0
+    assert get(cache, 'c') == LEXICONS['c']
+    assert len(cache) == 0 and cache.nbytes == 0
+
+
+def test_cached_lexicons_are_shared_read_only_views():
+    cache = LexiconCache()
+    type2score = get(cache, 'a')
+    assert get(cache, 'a') is type2score
+    assert type2score == LEXICONS['a']
+    with pytest.raises(TypeError):
+        type2score['a_0'] = 5.0
+    with pytest.raises(TypeError):
+        del type2score['a_0']
+
+
+def test_shifts_share_the_cached_lexicon():
+    type2score = helper.get_score_dictionary('labMT_English')
+    assert helper.get_score_dictionary('labMT_English') is type2score
+    assert lexicon_cache.stats()['hits'] == 1
+    with pytest.raises(TypeError):
+        type2score['happy'] = 0.0
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+import shifterator.shifterator as sh
+from shifterator import symmetric_shift as ss
+from shifterator.matrix_shift import GroupShift
+
+rng = np.random.default_rng(8)
+VOCABULARY = ['t{}'.format(i) for i in range(40)]
+TYPE2SCORE_1 = {t: float(s) for t,s in zip(VOCABULARY[:32],
+                                           rng.uniform(1, 9, 32))}
+TYPE2SCORE_2 = {t: float(s) for t,s in zip(VOCABULARY[4:36],
+                                           rng.uniform(1, 9, 32))}
+MATRIX = rng.integers(0, 3, size=(15, 40))
+# The last type is never observed
+MATRIX[:,-1] = 0
+LABELS = np.array(['b', 'a', 'c'] * 5)
+COMPS = ['pos_s_pos_p', 'pos_s_neg_p', 'neg_s_pos_p', 'neg_s_neg_p', 'pos_s',
+         'neg_s']
+
+
+def get_system(label):
+    counts = MATRIX[LABELS == label].sum(axis=0)
+    return {t: int(c) for t,c in zip(VOCABULARY, counts) if c > 0}
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'type2score_1': TYPE2SCORE_1},
+    {'type2score_1': TYPE2SCORE_1, 'stop_lens': [(4, 6)]},
+    {'type2score_1': TYPE2SCORE_1, 'type2score_2': TYPE2SCORE_2},
+    {'type2score_1': TYPE2SCORE_1, 'reference_value': 5},
+])
+def test_pair_table_matches_shifts(kwargs):
+    group_shift = GroupShift(MATRIX, VOCABULARY, labels=LABELS, **kwargs)
+    pair_table = group_shift.get_pair_table(chunk_size=2)
+    assert list(pair_table['name']) == ['a', 'b', 'c']
+    for i,name_1 in enumerate(pair_table['name']):
+        for j,name_2 in enumerate(pair_table['name']):
+            shift = sh.Shift(get_system(name_1), get_system(name_2), **kwargs)
+            # Shifts of a group with itself have no total to normalize by
+            shift.get_shift_scores(normalize=False)
+            assert pair_table['diff'][i,j] == pytest.approx(shift.diff)
+            comp_sums = shift.get_shift_component_sums()
+            for comp in COMPS:
+                assert pair_table[comp][i,j] == pytest.approx(comp_sums[comp],
+                                                              abs=1e-12)
+        assert pair_table['weighted_score'][i] == pytest.approx(
+            shift.get_weighted_score(shift.type2freq_1, shift.type2score_2))
+
+
+def test_get_shift_matches_shift_of_summed_rows():
+    rows = {'first': np.arange(7), 'rest': np.arange(15) >= 7}
+    group_shift = GroupShift(MATRIX, VOCABULARY, rows=rows,
+                             type2score_1=TYPE2SCORE_1)
+    system_1 = {t: int(c) for t,c in zip(VOCABULARY, MATRIX[:7].sum(axis=0))
+                if c > 0}
+    system_2 = {t: int(c) for t,c in zip(VOCABULARY, MATRIX[7:].sum(axis=0))
+                if c > 0}
+    shift = group_shift.get_shift('first', 'rest')
+    expected = sh.Shift(system_1, system_2, TYPE2SCORE_1)
+    type2shift_score = shift.get_shift_scores()
+    for t,score in expected.get_shift_scores().items():
+        assert type2shift_score[t] == pytest.approx(score)
+    jsd_shift = group_shift.get_shift('first', 'rest',
+                                      shift_class=ss.JSDivergenceShift)
+    assert jsd_shift.get_shift_scores() is not None
+    assert group_shift.get_jsd_matrix()[0,1] == pytest.approx(jsd_shift.diff)
+
+
+def test_sparse_matrix_matches_dense():
+    sparse = pytest.importorskip('scipy.sparse')
+    dense_table = GroupShift(MATRIX, VOCABULARY, labels=LABELS,
+                             type2score_1=TYPE2SCORE_1).get_pair_table()
+    sparse_table = GroupShift(sparse.csr_matrix(MATRIX), VOCABULARY,
+                              labels=LABELS,
+                              type2score_1=TYPE2SCORE_1).get_pair_table()
+    for column,values in dense_table.items():
+        if column == 'name':
+            assert list(sparse_table[column]) == list(values)
+        else:
+            assert np.allclose(sparse_table[column], values)
@@ -0,0 +1,67 @@
+import random
+
+import pytest
+
+import shifterator.shifterator as sh
+from shifterator.multi_shift import MultiShift
+
+random.seed(10)
+TYPES = ['t{}'.format(i) for i in range(150)]
+# Lexicons with overlapping, partial coverage of the vocabulary
+LEXICONS = {'low': {t: random.uniform(1, 5) for t in TYPES[:60]},
+            'wide': {t: random.uniform(1, 9) for t in TYPES[20:140]},
+            'sparse': {t: random.uniform(3, 7) for t in TYPES[::3]}}
+SYSTEM_1 = {t: random.randint(1, 20) for t in random.sample(TYPES, 100)}
+SYSTEM_2 = {t: random.randint(1, 20) for t in random.sample(TYPES, 100)}
+COMPS = ['pos_s_pos_p', 'pos_s_neg_p', 'neg_s_pos_p', 'neg_s_neg_p', 'pos_s',
+         'neg_s']
+
+
+@pytest.mark.parametrize('kwargs', [{}, {'stop_lens': [(4, 6)]},
+                                    {'reference_value': 5},
+                                    {'reference_value': {'low': 2, 'wide': 5,
+                                                         'sparse': 4}}])
+def test_result_table_matches_shift_per_lexicon(kwargs):
+    multi_shift = MultiShift(SYSTEM_1, SYSTEM_2, LEXICONS, **kwargs)
+    result_table = multi_shift.get_result_table()
+    shift_scores = multi_shift.get_shift_scores()
+    assert list(result_table['name']) == list(LEXICONS)
+    for j,(name,type2score) in enumerate(LEXICONS.items()):
+        reference_value = kwargs.get('reference_value')
+        if isinstance(reference_value, dict):
+            reference_value = reference_value[name]
+        shift = sh.Shift(SYSTEM_1, SYSTEM_2, type2score,
+                         reference_value=reference_value,
+                         stop_lens=kwargs.get('stop_lens'))
+        type2shift_score = shift.get_shift_scores()
+        assert result_table['diff'][j] == pytest.approx(shift.diff)
+        assert result_table['reference_value'][j]\
+               == pytest.approx(shift.reference_value)
+        assert result_table['weighted_score_1'][j] == pytest.approx(
+            shift.get_weighted_score(shift.type2freq_1, shift.type2score_1))
+        assert result_table['weighted_score_2'][j] == pytest.approx(
+            shift.get_weighted_score(shift.type2freq_2, shift.type2score_2))
+        comp_sums = shift.get_shift_component_sums()
+        for comp in COMPS:
+            assert result_table[comp][j] == pytest.approx(comp_sums[comp],
+                                                          abs=1e-12)
+        # Types the lexicon does not score or stops have no contribution
+        for t,i in multi_shift.type2index.items():
+            assert shift_scores[i,j] == pytest.approx(type2shift_score.get(t, 0),
+                                                      abs=1e-12)
+
+
+def test_result_table_is_not_shared():
+    multi_shift = MultiShift(SYSTEM_1, SYSTEM_2, list(LEXICONS.values()))
+    result_table = multi_shift.get_result_table()
+    assert list(result_table['name']) == [0, 1, 2]
+    result_table['diff'][:] = 0
+    assert multi_shift.get_result_table()['diff'].any()
+
+
+def test_get_shift_matches_lexicon_column():
+    multi_shift = MultiShift(SYSTEM_1, SYSTEM_2, LEXICONS, stop_lens=[(4, 6)])
+    result_table = multi_shift.get_result_table()
+    shift = multi_shift.get_shift('wide')
+    shift.get_shift_scores()
+    assert shift.diff == pytest.approx(result_table['diff'][1])
@@ -0,0 +1,43 @@
+import random
+
+import numpy as np
+import pytest
+
+from shifterator import symmetric_shift as ss
+from shifterator.pairwise_shift import get_jsd_matrix
+
+random.seed(3)
+TYPES = ['t{}'.format(i) for i in range(80)]
+SYSTEMS = {'s{}'.format(i): {t: random.randint(1, 10)
+                             for t in random.sample(TYPES, 40)}
+           for i in range(5)}
+
+
+def test_matrix_matches_jsd_shifts():
+    jsd = get_jsd_matrix(SYSTEMS, chunk_size=2)
+    names = list(SYSTEMS)
+    for i,name_i in enumerate(names):
+        assert jsd[i,i] == 0
+        for j,name_j in enumerate(names[i+1:], i+1):
+            shift = ss.JSDivergenceShift(SYSTEMS[name_i], SYSTEMS[name_j])
+            shift.get_shift_scores()
+            assert jsd[i,j] == pytest.approx(shift.diff)
+            assert jsd[j,i] == jsd[i,j]
+
+
+@pytest.mark.parametrize('weights', [(0.5, 0.5), (0.3, 0.7)])
+def test_workers_match_one_process(weights):
+    kwargs = {'weight_1': weights[0], 'weight_2': weights[1], 'top_n': 5,
+              'chunk_size': 2}
+    jsd,pair2top_types = get_jsd_matrix(SYSTEMS, **kwargs)
+    jsd_workers,pair2top_types_workers = get_jsd_matrix(SYSTEMS, n_jobs=2,
+                                                        **kwargs)
+    assert np.allclose(jsd, jsd_workers)
+    assert pair2top_types == pair2top_types_workers
+
+
+def test_top_types_are_sorted_by_absolute_contribution():
+    jsd,pair2top_types = get_jsd_matrix(SYSTEMS, top_n=10)
+    for top_types in pair2top_types.values():
+        contributions = [abs(c) for _,c in top_types]
+        assert contributions == sorted(contributions, reverse=True)
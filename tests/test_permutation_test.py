@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+import shifterator.shifterator as sh
+from shifterator import symmetric_shift as ss
+from shifterator.permutation_test import get_permutation_test
+
+rng = np.random.default_rng(0)
+VOCABULARY = ['t{}'.format(i) for i in range(30)]
+TYPE2SCORE = {t: float(s) for t,s in zip(VOCABULARY[:25],
+                                         rng.uniform(1, 9, 25))}
+MATRIX = rng.integers(0, 4, size=(12, 30))
+LABELS = ['a']*5 + ['b']*7
+
+
+def get_group_counts(label):
+    counts = MATRIX[[l == label for l in LABELS]].sum(axis=0)
+    return {t: int(c) for t,c in zip(VOCABULARY, counts) if c > 0}
+
+
+@pytest.mark.parametrize('statistic', ['diff', 'jsd'])
+def test_same_seed_same_null_distribution(statistic):
+    kwargs = {'statistic': statistic, 'vocabulary': VOCABULARY,
+              'type2score_1': TYPE2SCORE, 'n_permutations': 50,
+              'chunk_size': 16, 'seed': 3}
+    first = get_permutation_test(MATRIX, LABELS, **kwargs)
+    second = get_permutation_test(MATRIX, LABELS, **kwargs)
+    in_workers = get_permutation_test(MATRIX, LABELS, n_jobs=2, **kwargs)
+    assert np.array_equal(first['null_distribution'],
+                          second['null_distribution'])
+    assert np.array_equal(first['null_distribution'],
+                          in_workers['null_distribution'])
+    assert first['p_value'] == in_workers['p_value']
+    assert 0 < first['p_value'] <= 1
+
+
+def test_observed_statistics_match_shifts():
+    diff = get_permutation_test(MATRIX, LABELS, vocabulary=VOCABULARY,
+                                type2score_1=TYPE2SCORE, n_permutations=10)
+    shift = sh.Shift(get_group_counts('a'), get_group_counts('b'), TYPE2SCORE)
+    shift.get_shift_scores()
+    assert diff['statistic'] == pytest.approx(shift.diff)
+    assert diff['groups'] == ('a', 'b')
+
+    jsd = get_permutation_test(MATRIX, LABELS, statistic='jsd',
+                               n_permutations=10)
+    shift = ss.JSDivergenceShift(get_group_counts('a'), get_group_counts('b'))
+    shift.get_shift_scores()
+    assert jsd['statistic'] == pytest.approx(shift.diff)
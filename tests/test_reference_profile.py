@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from shifterator import relative_shift as rs
+from shifterator.reference_profile import ReferenceProfile
+
+TYPE2SCORE = {'happy': 8.3, 'sad': 2.4, 'the': 5.0, 'war': 1.8, 'love': 8.4,
+              'cat': 6.0, 'rain': 4.5, 'sun': 7.2}
+REFERENCE = {'happy': 10, 'sad': 4, 'the': 50, 'war': 2, 'unscored': 7}
+COMPARISON = {'happy': 3, 'sad': 9, 'the': 40, 'love': 5, 'other': 2}
+# Only holds scored types of the reference
+SUBSET = {'happy': 3, 'sad': 9, 'the': 40, 'other': 2}
+
+
+def assert_same_shift(shift, expected):
+    shift.get_shift_scores()
+    expected.get_shift_scores()
+    assert shift.diff == pytest.approx(expected.diff)
+    assert shift.reference_value == pytest.approx(expected.reference_value)
+    assert set(shift.type2shift_score) == set(expected.type2shift_score)
+    for t,score in expected.type2shift_score.items():
+        assert shift.type2shift_score[t] == pytest.approx(score)
+
+
+@pytest.mark.parametrize('stop_lens', [None, [(4, 6)]])
+def test_profile_matches_plain_shift(stop_lens):
+    profile = ReferenceProfile(REFERENCE, TYPE2SCORE, stop_lens=stop_lens)
+    shift = rs.SentimentShift(profile, dict(COMPARISON))
+    expected = rs.SentimentShift(dict(REFERENCE), dict(COMPARISON), TYPE2SCORE,
+                                 stop_lens=stop_lens)
+    assert_same_shift(shift, expected)
+
+
+def test_profile_requires_scores():
+    with pytest.raises(ValueError):
+        ReferenceProfile(REFERENCE, None)
+
+
+@pytest.mark.parametrize('comparison', [COMPARISON, SUBSET])
+@pytest.mark.parametrize('update', [{'the': 2}, {'cat': 2, 'rain': 1}])
+def test_updates_do_not_change_profile(update, comparison):
+    profile = ReferenceProfile(REFERENCE, TYPE2SCORE)
+    n_types = len(profile.type2index)
+    shift = rs.SentimentShift(profile, dict(comparison))
+    shift.get_shift_scores()
+    assert shift.type2index is not profile.type2index
+    shift.update_system_2(update)
+    shift.update_system_1({'sun': 4})
+    assert len(profile.type2index) == n_types
+    assert len(profile.index2type) == n_types
+    assert 'sun' not in profile.type2freq
+
+    # A second shift from the same profile is unaffected by the first
+    again = rs.SentimentShift(profile, dict(comparison))
+    expected = rs.SentimentShift(dict(REFERENCE), dict(comparison), TYPE2SCORE)
+    assert_same_shift(again, expected)
+
+    # The updated shift matches a shift rebuilt from the updated systems
+    updated = dict(comparison)
+    for t,f in update.items():
+        updated[t] = updated.get(t, 0) + f
+    reference = dict(REFERENCE, sun=4)
+    shift.get_shift_scores()
+    rebuilt = rs.SentimentShift(reference, updated, TYPE2SCORE)
+    rebuilt.get_shift_scores()
+    assert shift.diff == pytest.approx(rebuilt.diff)
+    for t,score in rebuilt.type2shift_score.items():
+        assert shift.type2shift_score[t] == pytest.approx(score)
+    assert np.isfinite(shift.diff)
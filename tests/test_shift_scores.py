@@ -0,0 +1,104 @@
+import math
+import random
+
+import numpy as np
+import pytest
+
+import shifterator.shifterator as sh
+from shifterator import relative_shift as rs
+from shifterator import symmetric_shift as ss
+
+random.seed(0)
+TYPES = ['t{}'.format(i) for i in range(200)]
+TYPE2SCORE = {t: random.uniform(1, 9) for t in TYPES[:150]}
+SYSTEM_1 = {t: random.randint(1, 20) for t in random.sample(TYPES, 120)}
+SYSTEM_2 = {t: random.randint(1, 20) for t in random.sample(TYPES, 120)}
+
+
+def get_loop_shift_scores(shift, reference_value):
+    """
+    Shift scores calculated type by type with dicts, as they were calculated
+    before the shift components were vectorized
+    """
+    type2freq_1 = shift.type2freq_1
+    type2freq_2 = shift.type2freq_2
+    type2score_1 = shift.type2score_1
+    type2score_2 = shift.type2score_2
+    types = shift.get_types(type2freq_1, type2score_1, type2freq_2,
+                            type2score_2)
+    total_1 = sum(f for t,f in type2freq_1.items() if t in types)
+    total_2 = sum(f for t,f in type2freq_2.items() if t in types)
+    type2shift_score = dict()
+    for t in types:
+        p_1 = type2freq_1.get(t, 0) / total_1
+        p_2 = type2freq_2.get(t, 0) / total_2
+        s_ref_diff = 0.5*(type2score_2[t]+type2score_1[t]) - reference_value
+        type2shift_score[t] = (p_2-p_1)*s_ref_diff\
+                              + (type2score_2[t]-type2score_1[t])*0.5*(p_1+p_2)
+    return type2shift_score
+
+
+def get_loop_jsd_scores(type2freq_1, type2freq_2):
+    total_1 = sum(type2freq_1.values())
+    total_2 = sum(type2freq_2.values())
+    type2score_1 = dict()
+    type2score_2 = dict()
+    for t in set(type2freq_1).union(type2freq_2):
+        p = type2freq_1.get(t, 0) / total_1
+        q = type2freq_2.get(t, 0) / total_2
+        log_m = math.log2(0.5*p + 0.5*q)
+        type2score_1[t] = 0.5*(log_m - math.log2(p)) if p > 0 else 0
+        type2score_2[t] = 0.5*(math.log2(q) - log_m) if q > 0 else 0
+    return type2score_1, type2score_2
+
+
+def assert_matches_loop(shift):
+    type2shift_score = shift.get_shift_scores(normalize=False)
+    expected = get_loop_shift_scores(shift, shift.reference_value)
+    assert set(type2shift_score) == set(expected)
+    for t,score in expected.items():
+        assert type2shift_score[t] == pytest.approx(score, abs=1e-12)
+    assert shift.diff == pytest.approx(sum(expected.values()))
+
+
+@pytest.mark.parametrize('stop_lens', [None, [(4, 6)]])
+def test_scored_shift_matches_loop(stop_lens):
+    shift = sh.Shift(SYSTEM_1, SYSTEM_2, TYPE2SCORE, stop_lens=stop_lens)
+    assert_matches_loop(shift)
+
+
+def test_uniform_shift_matches_loop():
+    assert_matches_loop(sh.Shift(SYSTEM_1, SYSTEM_2))
+
+
+def test_proportion_shift_matches_loop():
+    assert_matches_loop(ss.ProportionShift(SYSTEM_1, SYSTEM_2))
+
+
+def test_entropy_shift_matches_loop():
+    assert_matches_loop(rs.EntropyShift(SYSTEM_1, SYSTEM_2))
+
+
+def test_jsd_shift_matches_loop():
+    shift = ss.JSDivergenceShift(SYSTEM_1, SYSTEM_2)
+    assert_matches_loop(shift)
+    type2score_1,type2score_2 = get_loop_jsd_scores(SYSTEM_1, SYSTEM_2)
+    for t in type2score_1:
+        assert shift.type2score_1[t] == pytest.approx(type2score_1[t])
+        assert shift.type2score_2[t] == pytest.approx(type2score_2[t])
+
+
+def test_normalized_scores_sum_to_one():
+    shift = sh.Shift(SYSTEM_1, SYSTEM_2, TYPE2SCORE)
+    type2shift_score = shift.get_shift_scores()
+    total = sum(type2shift_score.values())
+    assert abs(total) == pytest.approx(1)
+    assert np.sign(total) == np.sign(shift.diff)
+
+
+def test_weighted_score_matches_loop():
+    shift = sh.Shift(SYSTEM_1, SYSTEM_2, TYPE2SCORE)
+    types = [t for t in SYSTEM_1 if t in TYPE2SCORE]
+    expected = sum(SYSTEM_1[t]*TYPE2SCORE[t] for t in types)\
+               / sum(SYSTEM_1[t] for t in types)
+    assert shift.reference_value == pytest.approx(expected)
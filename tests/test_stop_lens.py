@@ -0,0 +1,48 @@
+import random
+
+import numpy as np
+import pytest
+
+from shifterator.helper import get_stop_mask, split_by_scores
+
+random.seed(4)
+TYPES = ['t{}'.format(i) for i in range(200)]
+# Scores on a half-point grid, so some fall exactly on interval bounds
+TYPE2SCORE = {t: random.randint(2, 18) / 2 for t in TYPES[:160]}
+TYPE2FREQ = {t: random.randint(1, 9) for t in random.sample(TYPES, 150)}
+STOP_LENS = [
+    [(4, 6)],
+    [(4, 6), (5, 7)],
+    [(3, 4), (6, 6.5)],
+    [(2, 3), (7, 9), (2.5, 5), (8, 8)],
+    [(6, 4)],
+]
+
+
+def is_stopped(score, stop_lens):
+    for lower_stop,upper_stop in stop_lens:
+        if lower_stop <= score <= upper_stop:
+            return True
+    return False
+
+
+@pytest.mark.parametrize('stop_lens', STOP_LENS)
+def test_stop_mask_is_union_of_intervals(stop_lens):
+    scores = np.array(list(TYPE2SCORE.values()) + [np.nan])
+    expected = [is_stopped(s, stop_lens) for s in scores]
+    assert get_stop_mask(scores, stop_lens).tolist() == expected
+
+
+@pytest.mark.parametrize('stop_lens', STOP_LENS)
+def test_split_by_scores_matches_loop(stop_lens):
+    filtered = split_by_scores(TYPE2FREQ, TYPE2SCORE, stop_lens)
+    stop_words = {t for t,s in TYPE2SCORE.items() if is_stopped(s, stop_lens)}
+    assert filtered['stop_words'] == stop_words
+    assert filtered['type2freq'] == {t: f for t,f in TYPE2FREQ.items()
+                                     if t in TYPE2SCORE and t not in stop_words}
+    assert filtered['type2freq_stopped'] == {t: f for t,f in TYPE2FREQ.items()
+                                             if t in stop_words}
+    assert filtered['type2score_stopped'] == {t: TYPE2SCORE[t] for t
+                                              in filtered['type2freq_stopped']}
+    assert dict(filtered['type2score']) == {t: s for t,s in TYPE2SCORE.items()
+                                            if t not in stop_words}
@@ -0,0 +1,52 @@
+import warnings
+
+import pytest
+
+import shifterator.shifterator as sh
+from shifterator import stream_shift as st
+
+TYPE2SCORE = {'happy': 8.3, 'sad': 2.4, 'the': 5.0, 'war': 1.8, 'love': 8.4}
+BUCKETS = [{}, {'happy': 2, 'unscored': 3}, {}, {'unscored': 1}, {'sad': 4},
+           {'the': 3, 'war': 1}, {'love': 2, 'happy': 1}, {'sad': 1, 'the': 2}]
+
+
+def get_rebuilt_shift(monitor):
+    n_ref = len(monitor.buckets) - monitor.window
+    shift = sh.Shift(monitor.get_window_counts(0, n_ref),
+                     monitor.get_window_counts(n_ref, None), TYPE2SCORE)
+    shift.get_shift_scores()
+    return shift
+
+
+def test_empty_windows_give_empty_results():
+    monitor = st.ShiftMonitor(window=1, reference_window=2,
+                              type2score_ref=TYPE2SCORE, top_n=3)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        results = [monitor.close_bucket() for i in range(3)]
+        monitor.add({'unscored': 2})
+        results.append(monitor.close_bucket())
+    assert results[0] is None
+    for result in results[1:]:
+        assert result['diff'] is None
+        assert result['reference_value'] is None
+        assert result['top_types'] == []
+
+
+def test_windows_match_rebuilt_shift():
+    monitor = st.ShiftMonitor(window=1, reference_window=2,
+                              type2score_ref=TYPE2SCORE, top_n=3)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        for bucket in BUCKETS:
+            monitor.add(bucket)
+            result = monitor.close_bucket()
+            if result is None or result['diff'] is None:
+                continue
+            shift = get_rebuilt_shift(monitor)
+            assert result['diff'] == pytest.approx(shift.diff)
+            assert result['reference_value'] == pytest.approx(shift.reference_value)
+            for t,score in result['top_types']:
+                assert score == pytest.approx(shift.type2shift_score.get(t, 0))
+    # The last windows are both scored
+    assert result['diff'] is not None
@@ -0,0 +1,65 @@
+import collections
+import random
+
+import pytest
+
+from shifterator import text_counts
+
+random.seed(7)
+WORDS = ['happy', 'sad', 'the', "don't", 'well-known', 'Laughter', 'zyzzyva',
+         'rain', 'sun', 'HAPPY']
+TEXTS = [' '.join(random.choices(WORDS, k=random.randint(0, 12)))
+         for i in range(250)]
+VOCABULARY = ['happy', 'sad', 'rain', 'laughter']
+
+
+def get_loop_counts(texts, vocabulary=None):
+    type2freq = collections.Counter()
+    for text in texts:
+        for t in text_counts.tokenize(text):
+            if vocabulary is None or t in vocabulary:
+                type2freq[t] += 1
+    return dict(type2freq)
+
+
+def split_words(text):
+    return text.split()
+
+
+@pytest.mark.parametrize('vocabulary', [None, VOCABULARY])
+@pytest.mark.parametrize('chunk_size', [1, 7, 1000])
+def test_serial_counts_match_loop(vocabulary, chunk_size):
+    type2freq = text_counts.get_type_counts(iter(TEXTS), vocabulary=vocabulary,
+                                            chunk_size=chunk_size)
+    assert type2freq == get_loop_counts(TEXTS, vocabulary)
+
+
+@pytest.mark.parametrize('vocabulary', [None, VOCABULARY])
+def test_parallel_counts_match_serial(vocabulary):
+    serial = text_counts.get_type_counts(TEXTS, vocabulary=vocabulary,
+                                         chunk_size=9)
+    parallel = text_counts.get_type_counts(iter(TEXTS), vocabulary=vocabulary,
+                                           n_jobs=2, chunk_size=9)
+    assert parallel == serial
+    # Module-level tokenizers are sent to the workers
+    parallel = text_counts.get_type_counts(TEXTS, tokenizer=split_words,
+                                           n_jobs=2, chunk_size=9)
+    assert parallel == collections.Counter(' '.join(TEXTS).split())
+
+
+def test_file_counts_match_text_counts(tmp_path):
+    filenames = []
+    for i in range(2):
+        filename = tmp_path / 'texts_{}.txt'.format(i)
+        filename.write_text('\n'.join(TEXTS[i::2]), encoding='utf-8')
+        filenames.append(str(filename))
+    serial = text_counts.get_file_type_counts(filenames, chunk_size=10)
+    parallel = text_counts.get_file_type_counts(filenames, n_jobs=2,
+                                                chunk_size=10)
+    assert serial == parallel == get_loop_counts(TEXTS)
+
+
+def test_lexicon_vocabulary_counts_only_scored_types():
+    type2freq = text_counts.get_type_counts(TEXTS, vocabulary='labMT_English')
+    assert 'zyzzyva' not in type2freq
+    assert type2freq['happy'] == get_loop_counts(TEXTS)['happy']
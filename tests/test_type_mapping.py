@@ -0,0 +1,75 @@
+import random
+
+import numpy as np
+import pytest
+
+import shifterator.shifterator as sh
+from shifterator import relative_shift as rs
+from shifterator.helper import get_type_mapping
+
+random.seed(9)
+TYPES = ['t{}'.format(i) for i in range(80)]
+TYPE2SCORE = {t: random.uniform(1, 9) for t in TYPES[:70]}
+SYSTEM_1 = {t: random.randint(1, 20) for t in random.sample(TYPES, 50)}
+SYSTEM_2 = {t: random.randint(1, 20) for t in random.sample(TYPES, 50)}
+
+
+def as_pair(type2value):
+    return (list(type2value), np.array(list(type2value.values())))
+
+
+def as_series(type2value):
+    pd = pytest.importorskip('pandas')
+    return pd.Series(type2value)
+
+
+@pytest.mark.parametrize('convert', [as_pair, as_series])
+def test_type_mapping_views_values(convert):
+    type2value = convert(SYSTEM_1)
+    mapping = get_type_mapping(type2value)
+    assert dict(mapping) == SYSTEM_1
+    assert len(mapping) == len(SYSTEM_1)
+    assert 'not a type' not in mapping
+    # Values are viewed, not copied
+    values = type2value[1] if isinstance(type2value, tuple)\
+             else type2value.to_numpy()
+    assert np.shares_memory(mapping.array, values)
+
+
+def test_dicts_are_returned_as_they_are():
+    assert get_type_mapping(SYSTEM_1) is SYSTEM_1
+
+
+@pytest.mark.parametrize('type2value', [
+    (['a', 'a'], np.array([1, 2])),
+    (['a', 'b'], np.array([1, 2, 3])),
+])
+def test_unaligned_or_repeated_types_are_rejected(type2value):
+    with pytest.raises(ValueError):
+        get_type_mapping(type2value)
+
+
+def test_other_inputs_are_rejected():
+    with pytest.raises(TypeError):
+        get_type_mapping([('a', 1)])
+
+
+@pytest.mark.parametrize('convert', [as_pair, as_series])
+@pytest.mark.parametrize('stop_lens', [None, [(4, 6)]])
+def test_shift_of_mappings_matches_dicts(convert, stop_lens):
+    shift = rs.SentimentShift(convert(SYSTEM_1), convert(SYSTEM_2),
+                              convert(TYPE2SCORE), stop_lens=stop_lens)
+    expected = rs.SentimentShift(SYSTEM_1, SYSTEM_2, TYPE2SCORE,
+                                 stop_lens=stop_lens)
+    type2shift_score = shift.get_shift_scores()
+    expected_scores = expected.get_shift_scores()
+    assert shift.diff == pytest.approx(expected.diff)
+    assert shift.reference_value == pytest.approx(expected.reference_value)
+    assert type2shift_score.keys() == expected_scores.keys()
+    for t,score in expected_scores.items():
+        assert type2shift_score[t] == pytest.approx(score)
+    # Uniform scores cover the types of both systems, with a total shift of 0
+    uniform = sh.Shift(convert(SYSTEM_1), convert(SYSTEM_2))
+    expected = sh.Shift(SYSTEM_1, SYSTEM_2)
+    assert uniform.get_shift_scores(normalize=False).keys()\
+           == expected.get_shift_scores(normalize=False).keys()
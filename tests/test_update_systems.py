@@ -0,0 +1,108 @@
+import random
+
+import pytest
+
+import shifterator.shifterator as sh
+from shifterator import relative_shift as rs
+from shifterator import symmetric_shift as ss
+
+random.seed(1)
+TYPES = ['t{}'.format(i) for i in range(100)]
+TYPE2SCORE = {t: random.uniform(1, 9) for t in TYPES[:80]}
+SYSTEM_1 = {t: random.randint(1, 20) for t in random.sample(TYPES[:60], 40)}
+SYSTEM_2 = {t: random.randint(1, 20) for t in random.sample(TYPES[:60], 40)}
+# Adds new scored, stopped and unscored types, and removes some types
+UPDATE_1 = {'t70': 3, 't95': 2, list(SYSTEM_1)[0]: -SYSTEM_1[list(SYSTEM_1)[0]]}
+UPDATE_2 = {'t61': 5, 't75': 1, 't99': 4, list(SYSTEM_2)[1]: 2}
+
+
+def apply_update(type2freq, update):
+    updated = dict(type2freq)
+    for t,f in update.items():
+        updated[t] = updated.get(t, 0) + f
+        if updated[t] == 0:
+            del updated[t]
+    return updated
+
+
+def assert_same_scores(shift, rebuilt):
+    type2shift_score = shift.get_shift_scores()
+    expected = rebuilt.get_shift_scores()
+    assert shift.diff == pytest.approx(rebuilt.diff)
+    assert shift.reference_value == pytest.approx(rebuilt.reference_value)
+    for t,score in expected.items():
+        assert type2shift_score[t] == pytest.approx(score)
+    # Types that left both systems stay in the index without contribution
+    for t in set(type2shift_score).difference(expected):
+        assert type2shift_score[t] == 0
+
+
+@pytest.mark.parametrize('stop_lens', [None, [(4, 6)]])
+def test_update_matches_rebuild(stop_lens):
+    shift = sh.Shift(dict(SYSTEM_1), dict(SYSTEM_2), TYPE2SCORE,
+                     stop_lens=stop_lens)
+    shift.get_shift_scores()
+    shift.update_system_1(UPDATE_1)
+    # The total shift is current before the scores are recomputed
+    rebuilt = sh.Shift(apply_update(SYSTEM_1, UPDATE_1), dict(SYSTEM_2),
+                       TYPE2SCORE, stop_lens=stop_lens)
+    rebuilt.get_shift_scores()
+    assert shift.diff == pytest.approx(rebuilt.diff)
+    shift.update_system_2(UPDATE_2)
+    rebuilt = sh.Shift(apply_update(SYSTEM_1, UPDATE_1),
+                       apply_update(SYSTEM_2, UPDATE_2), TYPE2SCORE,
+                       stop_lens=stop_lens)
+    assert_same_scores(shift, rebuilt)
+
+
+def test_update_before_scoring_matches_rebuild():
+    shift = sh.Shift(dict(SYSTEM_1), dict(SYSTEM_2), TYPE2SCORE)
+    shift.update_systems(type2freq_1=UPDATE_1, type2freq_2=UPDATE_2)
+    rebuilt = sh.Shift(apply_update(SYSTEM_1, UPDATE_1),
+                       apply_update(SYSTEM_2, UPDATE_2), TYPE2SCORE)
+    assert_same_scores(shift, rebuilt)
+
+
+def test_negative_frequency_is_rejected():
+    shift = sh.Shift(dict(SYSTEM_1), dict(SYSTEM_2), TYPE2SCORE)
+    t = list(SYSTEM_2)[0]
+    with pytest.raises(ValueError):
+        shift.update_system_2({t: -SYSTEM_2[t] - 1})
+    assert shift.type2freq_2[t] == SYSTEM_2[t]
+
+
+@pytest.mark.parametrize('stop_lens', [None, [(4, 6)]])
+def test_update_does_not_change_input_systems(stop_lens):
+    system_1 = dict(SYSTEM_1)
+    system_2 = dict(SYSTEM_2)
+    shift = sh.Shift(system_1, system_2, TYPE2SCORE, stop_lens=stop_lens)
+    shift.update_systems(type2freq_1=UPDATE_1, type2freq_2=UPDATE_2)
+    shift.update_system_1(UPDATE_2)
+    assert system_1 == SYSTEM_1
+    assert system_2 == SYSTEM_2
+    rebuilt = sh.Shift(apply_update(apply_update(SYSTEM_1, UPDATE_1), UPDATE_2),
+                       apply_update(SYSTEM_2, UPDATE_2), TYPE2SCORE,
+                       stop_lens=stop_lens)
+    assert shift.type2freq_1 == rebuilt.type2freq_1
+
+
+def test_update_does_not_change_a_system_shared_by_both_sides():
+    system = dict(SYSTEM_1)
+    shift = sh.Shift(system, system, TYPE2SCORE)
+    shift.update_system_2(UPDATE_2)
+    assert system == SYSTEM_1
+    assert shift.type2freq_1 == SYSTEM_1
+    rebuilt = sh.Shift(dict(SYSTEM_1), apply_update(SYSTEM_1, UPDATE_2),
+                       TYPE2SCORE)
+    assert_same_scores(shift, rebuilt)
+
+
+@pytest.mark.parametrize('shift_class', [rs.EntropyShift, rs.KLDivergenceShift,
+                                         ss.JSDivergenceShift])
+def test_frequency_dependent_shifts_are_rejected(shift_class):
+    shift = shift_class({'a': 2, 'b': 3}, {'a': 1, 'b': 4})
+    with pytest.raises(TypeError, match=shift_class.__name__):
+        shift.update_system_2({'a': 1})
+    with pytest.raises(TypeError, match=shift_class.__name__):
+        shift.update_system_1({'b': 1})
+    assert shift.type2freq_2['a'] == 1